@@ -1,43 +1,79 @@
 from pathlib import Path
 import threading
-import uvicorn
 from .config import AppCfg
-from .indexer import Library, start_watcher
-from .server import app as fastapi_app
+from .indexer import Library, IndexWorker, start_watcher
 from .viewer import Viewer
 from .sync import Syncer
+from .transcode import ProxyTranscoder
+from .changelog import change_log
+from .prewarm import DerivativeWarmer
+from . import stats
 
 CFG_PATH = Path("config/leanframe.yaml")
 
-# server.cfg is set inside server.startup via global; we inject once before run
-import photoframe.server as server_module
+# the API comes up once the first slide is on screen (or after this long):
+# FastAPI/Pydantic/uvicorn take seconds to import on a Pi with an SD card
+SERVER_AFTER_FIRST_FRAME_MAX_S = 15.0
+
+
+def start_server_after_first_frame(cfg: AppCfg, presented: threading.Event,
+                                   warmer: DerivativeWarmer | None = None) -> threading.Thread:
+    def run_server():
+        presented.wait(SERVER_AFTER_FIRST_FRAME_MAX_S)
+        import uvicorn
+        # server.cfg is read by the endpoints; inject before serving
+        import photoframe.server as server_module
+        server_module.cfg = cfg
+        if warmer is not None:
+            warmer.start(server_module.prewarm)  # renders with the API's code and cache
+        uvicorn.run(server_module.app, host=cfg.server.host, port=cfg.server.port, log_level="warning")
+
+    t = threading.Thread(target=run_server, daemon=True, name="api")
+    t.start()
+    return t
 
 
 def main():
     cfg = AppCfg.load(CFG_PATH)
-    server_module.cfg = cfg
 
     lib = Library(cfg.paths.db, cfg.paths.library)
+    # persistent adds/deletes/edits for the app's delta sync (/library/changes)
+    changes = change_log(cfg.paths.db, cfg.paths.library)
+    lib.subscribe(changes.on_index_change)
+    stats.register("changes", changes.stats)
     lib.scan_once(recursive=cfg.indexer.recursive, ignore_hidden=cfg.indexer.ignore_hidden)
 
+    # screen-sized proxies for heavy videos, made in the background
+    transcoder = ProxyTranscoder(cfg).start()
+    lib.subscribe(transcoder.on_library_change)
+    stats.register("proxies", transcoder.report)
+
+    # later rescans (watcher bursts, empty library) run on their own thread
     watch_flag = None
     if cfg.indexer.watch:
         _, watch_flag = start_watcher(cfg.paths.library, recursive=cfg.indexer.recursive)
+    indexer = IndexWorker(cfg.paths.db, cfg.paths.library, recursive=cfg.indexer.recursive,
+                          ignore_hidden=cfg.indexer.ignore_hidden, flag=watch_flag)
+    indexer.subscribe(transcoder.on_library_change)
+    stats.register("indexer", indexer.stats)
+    indexer.subscribe(changes.on_index_change)
 
     # Optional: run one sync before starting viewer
     syncer = Syncer(cfg, lib)
     syncer.run_all()
 
-    def run_server():
-        uvicorn.run("photoframe.server:app", host=cfg.server.host, port=cfg.server.port, log_level="warning")
-
-    t = threading.Thread(target=run_server, daemon=True)
-    t.start()
-
     # Start viewer loop (blocking)
     # purge viewer cache
     lib.purge_missing()
-    viewer = Viewer(cfg, lib, watch_flag=watch_flag)
+    viewer = Viewer(cfg, lib, indexer=indexer)
+    warmer = None
+    if cfg.server.prewarm:
+        # fed by the change log: indexer adds, uploads and crop edits
+        warmer = DerivativeWarmer(cfg.paths.library, idle=viewer.engine.idle)
+        changes.subscribe(warmer.on_change)
+        stats.register("prewarm", warmer.report)
+    start_server_after_first_frame(cfg, viewer.engine.presented, warmer)
+    indexer.start()
     viewer.loop()
 
 if __name__ == "__main__":
@@ -0,0 +1,563 @@
+# photoframe/bench.py
+"""
+Micro-benchmarks for the frame pipeline. Each subcommand prints JSON so runs
+can be diffed across releases and devices.
+
+    python -m photoframe.bench playlist [--sizes 1000,10000,100000,200000]
+    python -m photoframe.bench transitions [--size 1920x1080] [--backend auto]
+    python -m photoframe.bench viewer [--slides 60] [--library DIR] [--padding blur,mirror]
+    python -m photoframe.bench startup [--runs 3] [--top 15]
+    python -m photoframe.bench thumbs [--burst 60] [--width 360] [--library DIR]
+    python -m photoframe.bench grid [--count 200] [--cold] [--library DIR]
+
+Anything touching the display runs headless (SDL_VIDEODRIVER=dummy) unless a
+driver is set in the environment.
+"""
+from __future__ import annotations
+import argparse, contextlib, json, os, shutil, statistics, subprocess, sys, tempfile, time, tracemalloc
+from pathlib import Path
+from .stats import percentile as _pct
+
+def summarize(samples_s: list[float]) -> dict:
+    """Percentiles in milliseconds."""
+    ms = [x * 1000.0 for x in samples_s]
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4) if ms else 0.0,
+        "p50_ms": round(_pct(ms, 0.50), 4),
+        "p90_ms": round(_pct(ms, 0.90), 4),
+        "p99_ms": round(_pct(ms, 0.99), 4),
+        "max_ms": round(max(ms), 4) if ms else 0.0,
+    }
+
+# ---- playlist ----
+class _SyntheticLibrary:
+    """Row source shaped like indexer.Library, computing rows instead of querying."""
+    root = Path("/library")
+
+    def __init__(self, n: int):
+        self.n = n
+
+    def iter_id_kinds(self):
+        return ((i, "video" if i % 20 == 0 else "image") for i in range(1, self.n + 1))
+
+    def get_by_id(self, mid: int):
+        return (mid, f"/library/images/{mid:07d}.jpg", "video" if mid % 20 == 0 else "image")
+
+    def id_for_path(self, path: str):
+        return int(Path(path).stem)
+
+def _traced_bytes(build) -> tuple[object, int]:
+    """Net bytes still allocated by build() once it returns (peak scratch excluded)."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        obj = build()
+        return obj, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+def _build_playlist(lib, meta: dict, shuffle: bool):
+    from .playlist import Playlist
+    pl = Playlist(lib, shuffle=shuffle, loop=True)
+    pl.reset(lib.iter_id_kinds(), meta)
+    return pl
+
+def _row_list(lib):
+    """The old representation: every row in a list plus an id -> index dict."""
+    rows = [lib.get_by_id(mid) for mid, _ in lib.iter_id_kinds()]
+    return rows, {r[0]: i for i, r in enumerate(rows)}
+
+def bench_playlist(sizes: list[int], slides: int, shuffle: bool) -> dict:
+    """
+    Per-slide cost of advance() plus a trickle of deltas, at several library
+    sizes, and the memory the playlist holds compared with keeping every
+    (id, path, kind) row plus an id index.
+    """
+    out = {}
+    for n in sizes:
+        lib = _SyntheticLibrary(n)
+        meta = {f"images/{i:07d}.jpg": {"exclude_from_slideshow": True} for i in range(1, n + 1, 50)}
+        # memory first, on its own instances: tracing slows the build down a lot
+        _, held = _traced_bytes(lambda: _build_playlist(lib, meta, shuffle))
+        _, rows_bytes = _traced_bytes(lambda: _row_list(lib))
+        t0 = time.perf_counter()
+        pl = _build_playlist(lib, meta, shuffle)
+        build_s = time.perf_counter() - t0
+        per_slide = []
+        next_id = n + 1
+        for k in range(slides):
+            t0 = time.perf_counter()
+            # one delta every few slides, like a sync trickling in
+            if k % 10 == 0:
+                pl.add(next_id, f"/library/images/{next_id:07d}.jpg", "image"); next_id += 1
+            if k % 25 == 0:
+                pl.remove(1 + (k * 7919) % n)
+            if k % 40 == 0:
+                pl.set_flags(f"images/{1 + (k * 104729) % n:07d}.jpg", {"exclude_from_slideshow": True})
+            pl.advance()
+            per_slide.append(time.perf_counter() - t0)
+        out[str(n)] = {
+            "build_ms": round(build_s * 1000.0, 2),
+            "per_slide": summarize(per_slide),
+            "memory": {"playlist_kb": round(held / 1024, 1), "arrays_kb": round(pl.nbytes() / 1024, 1),
+                       "row_list_kb": round(rows_bytes / 1024, 1)},
+        }
+    return out
+
+# ---- transitions ----
+def bench_transitions(size: tuple[int, int], backend: str, duration_ms: int, count: int) -> dict:
+    """Frame times and drops of back-to-back crossfades between two full-screen frames."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from .transitions import TransitionEngine
+    pygame.init()
+    try:
+        eng = TransitionEngine(size, backend=backend)
+        frames = []
+        for color in ((200, 40, 40), (40, 40, 200)):
+            s = pygame.Surface(size)
+            s.fill(color)
+            frames.append(s.convert() if eng.screen is not None else s)
+        eng.show(frames[0])
+        runs = [eng.crossfade(frames[(i + 1) % 2], frames[0].get_rect(), duration_ms) for i in range(count)]
+        return {
+            "backend": eng.backend,
+            "size": list(size),
+            "duration_ms": duration_ms,
+            "transition_ms": summarize([r["duration_ms"] / 1000.0 for r in runs]),
+            "frame_p95_ms": round(_pct([r["frame_p95_ms"] for r in runs], 0.5), 3),
+            "totals": eng.stats()["totals"],
+        }
+    finally:
+        pygame.quit()
+
+# ---- viewer ----
+VIEWER_STAGES = ("crop_lookup_s", "load_wait_s", "decode_s", "compose_s", "convert_s",
+                 "transition_s", "flip_s", "time_to_pixel_s")
+# phone-ish mix: landscape, portrait, panorama, square
+_SYNTH_SIZES = ((4032, 3024), (3024, 4032), (1920, 1080), (6000, 2000), (2048, 2048))
+
+def _synthetic_images(dst: Path, n: int) -> None:
+    """n noisy JPEGs (noise keeps decode cost honest), sizes cycling through _SYNTH_SIZES."""
+    from PIL import Image
+    dst.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        w, h = _SYNTH_SIZES[i % len(_SYNTH_SIZES)]
+        noise = Image.effect_noise((w // 4, h // 4), 48 + i % 5 * 8)
+        im = Image.merge("RGB", (noise, noise.rotate(90, expand=False), noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+        im.resize((w, h), Image.Resampling.BILINEAR).save(dst / f"synth_{i:04d}.jpg", quality=88)
+
+def bench_viewer(config: Path, slides: int, library: Path | None, count: int, size: tuple[int, int] | None,
+                 styles: list[str], mode: str | None, crossfade_ms: int | None) -> dict:
+    """
+    Viewer.loop() headless at zero hold time, over a synthetic or real library,
+    with per-stage timings of every image slide. Runs in a throw-away state
+    dir and index, so the device's own resume state is never touched; the
+    decoder calibration is reused from the configured state dir if present.
+    Videos are left out (they would measure mpv, not the slide pipeline).
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from . import calibrate
+    from .config import AppCfg
+    from .indexer import Library
+    from .viewer import Viewer
+    cfg = AppCfg.load(Path(config))
+    with tempfile.TemporaryDirectory(prefix="leanframe-bench-") as tmp:
+        tmp = Path(tmp)
+        if library is None:
+            library = tmp / "library"
+            _synthetic_images(library / "images", count)
+        routing = calibrate.routing_path(cfg.paths.state)
+        cfg.paths.state = tmp / "state" / "state.json"
+        cfg.paths.state.parent.mkdir(parents=True)
+        if routing.exists():
+            shutil.copy(routing, calibrate.routing_path(cfg.paths.state))
+        cfg.paths.db = tmp / "index.db"
+        cfg.paths.library = Path(library)
+        if size is not None:
+            cfg.screen.width, cfg.screen.height = size
+        cfg.screen.fullscreen = False
+        cfg.playback.shuffle = False  # same order every run
+        cfg.playback.resume_on_start = False
+        if mode:
+            cfg.render.mode = mode
+        lib = Library(cfg.paths.db, cfg.paths.library)
+        lib.scan_once(recursive=True, ignore_hidden=cfg.indexer.ignore_hidden)
+        lib.conn.execute("DELETE FROM media WHERE kind='video'")
+        lib.conn.commit()
+        viewer = Viewer(cfg, lib)
+        try:
+            # no hold; the adaptive-quality budget keeps following the configured duration
+            cfg.playback.slide_duration_s = 0.0
+            if crossfade_ms is not None:
+                viewer.crossfade_ms = crossfade_ms
+            runs = {}
+            for style in styles or [cfg.render.padding.style]:
+                cfg.render.padding.style = style
+                with viewer.loader.cache.lock:
+                    viewer.loader.cache.clear()  # every style starts cold
+                viewer.slide_trace = []
+                viewer.playlist.rewind()
+                t0 = time.perf_counter()
+                viewer.loop(max_slides=slides)
+                wall = time.perf_counter() - t0
+                trace, viewer.slide_trace = viewer.slide_trace, None
+                runs[style] = {
+                    "slides": len(trace),
+                    "wall_s": round(wall, 3),
+                    "slides_per_s": round(len(trace) / wall, 2) if wall else 0.0,
+                    "prefetched": sum(1 for t in trace if t["prefetched"]),
+                    **{k[:-2]: summarize([t[k] for t in trace]) for k in VIEWER_STAGES},
+                }
+            return {
+                "size": list(viewer.engine.size),
+                "backend": viewer.engine.backend,
+                "mode": cfg.render.mode,
+                "crossfade_ms": viewer.crossfade_ms,
+                "images": len(viewer.playlist),
+                "loader": viewer.loader.stats(),
+                "runs": runs,
+            }
+        finally:
+            viewer.loader.pool.shutdown(wait=True)
+            viewer.state.flush()  # nothing left for atexit to write into the deleted dir
+            lib.close()
+            pygame.quit()
+
+# ---- startup ----
+# present in sys.modules at the first frame = paid for before the first pixel
+_HEAVY_MODULES = ("fastapi", "pydantic", "uvicorn", "starlette", "pyvips", "turbojpeg",
+                  "numpy", "PIL", "pygame", "yaml", "watchdog")
+
+def first_frame(config: Path, library: Path, state_dir: Path, spawned_at: float) -> dict:
+    """
+    Child side of `startup`: the frame process's imports, Viewer() and its
+    first slide, timed from when the parent spawned this interpreter.
+    """
+    t0 = time.perf_counter()
+    import photoframe.__main__  # what `python -m photoframe` imports before main()
+    from .config import AppCfg
+    from .indexer import Library
+    from .viewer import Viewer
+    t1 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="leanframe-bench-") as tmp:
+        tmp = Path(tmp)
+        cfg = AppCfg.load(Path(config))
+        cfg.paths.state = Path(state_dir) / "state.json"  # shared: holds the decoder calibration
+        cfg.paths.db = tmp / "index.db"
+        cfg.paths.library = Path(library)
+        cfg.screen.fullscreen = False
+        cfg.playback.resume_on_start = False
+        lib = Library(cfg.paths.db, cfg.paths.library)
+        lib.scan_once()
+        viewer = Viewer(cfg, lib)
+        t2 = time.perf_counter()
+        viewer.crossfade_ms = 0
+        cfg.playback.slide_duration_s = 0.0
+        viewer.loop(max_slides=1)
+        first = viewer.engine.first_pixel_at or time.perf_counter()
+        since_spawn = time.time() - (time.perf_counter() - first) - spawned_at
+        loaded = {m: m in sys.modules for m in _HEAVY_MODULES}
+        viewer.loader.pool.shutdown(wait=True)
+        viewer.state.flush()
+        lib.close()
+    return {
+        "spawn_to_first_frame_s": round(since_spawn, 3),
+        "imports_s": round(t1 - t0, 3),
+        "viewer_init_s": round(t2 - t1, 3),
+        "first_slide_s": round(first - t2, 3),
+        "loaded_at_first_frame": loaded,
+    }
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """`-X importtime` lines -> (module, self_us, cumulative_us, depth)."""
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|")
+            depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+            out.append((name.strip(), int(self_us), int(cum_us), depth))
+        except ValueError:
+            continue  # the header line
+    return out
+
+def bench_startup(config: Path, runs: int, top: int) -> dict:
+    """
+    Cold-ish start of the frame process, headless: `-X importtime` breakdown
+    plus time to the first pixel, over a one-image synthetic library.
+    The first run warms the page cache (and calibrates the decoders unless
+    the configured state dir already has a calibration), so it is reported
+    separately.
+    """
+    from . import calibrate
+    from .config import AppCfg
+    results = []
+    imports = []
+    with tempfile.TemporaryDirectory(prefix="leanframe-bench-") as tmp:
+        library = Path(tmp) / "library"
+        _synthetic_images(library / "images", 1)
+        state_dir = Path(tmp) / "state"
+        state_dir.mkdir()
+        routing = calibrate.routing_path(AppCfg.load(Path(config)).paths.state)
+        if routing.exists():
+            shutil.copy(routing, calibrate.routing_path(state_dir / "state.json"))
+        env = dict(os.environ)
+        env.setdefault("SDL_VIDEODRIVER", "dummy")
+        for _ in range(max(1, runs)):
+            t0 = time.time()
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-m", "photoframe.bench", "first-frame",
+                 "--config", str(config), "--library", str(library), "--state-dir", str(state_dir),
+                 "--spawned-at", repr(t0)],
+                env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"first-frame run failed:\n{proc.stderr[-2000:]}")
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            imports.append(_parse_importtime(proc.stderr))
+    last = imports[-1]
+    top_level = sorted((m for m in last if m[3] == 0), key=lambda m: -m[2])
+    warm = results[1:] or results
+    return {
+        "runs": len(results),
+        "first_run": results[0],
+        "spawn_to_first_frame_s": summarize([r["spawn_to_first_frame_s"] for r in warm]),
+        "imports_s": summarize([r["imports_s"] for r in warm]),
+        "viewer_init_s": summarize([r["viewer_init_s"] for r in warm]),
+        "first_slide_s": summarize([r["first_slide_s"] for r in warm]),
+        "import_total_ms": round(sum(m[1] for m in last) / 1000.0, 1),
+        "import_top_level_ms": {m[0]: round(m[2] / 1000.0, 1) for m in top_level[:top]},
+        "import_self_ms": {m[0]: round(m[1] / 1000.0, 1) for m in sorted(last, key=lambda m: -m[1])[:top]},
+        "loaded_at_first_frame": results[-1]["loaded_at_first_frame"],
+    }
+
+# ---- API ----
+@contextlib.contextmanager
+def _api_server(cfg):
+    """The API app on an ephemeral localhost port, in a thread; yields (base_url, token)."""
+    import socket, threading
+    import uvicorn
+    from . import server as server_module
+    server_module.cfg = cfg
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    srv = uvicorn.Server(uvicorn.Config(server_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    t = threading.Thread(target=srv.run, daemon=True, name="bench-api")
+    t.start()
+    while not srv.started:
+        time.sleep(0.02)
+    try:
+        yield f"http://127.0.0.1:{port}", cfg.server.auth_token
+    finally:
+        srv.should_exit = True
+        t.join(5)
+
+def _get(url: str, token: str) -> tuple[int, float, int]:
+    """(status, seconds, body bytes) of one GET."""
+    import urllib.error, urllib.request
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers={"X-Auth-Token": token}),
+                                    timeout=120) as r:
+            n = len(r.read())
+            return r.status, time.perf_counter() - t0, n
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - t0, 0
+
+def bench_thumbs(config: Path, library: Path | None, count: int, burst: int, width: int) -> dict:
+    """
+    A grid opening: `burst` concurrent /thumb requests (cold derivative cache,
+    then warm), while /library/rev is polled to see how long other requests
+    wait behind the rendering. Runs on a throw-away copy of the library, so
+    no derivatives land in the device's .cache.
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from urllib.parse import quote
+    from . import stats
+    from .config import AppCfg
+    cfg = AppCfg.load(Path(config))
+    with tempfile.TemporaryDirectory(prefix="leanframe-bench-") as tmp:
+        tmp = Path(tmp)
+        if library is None:
+            library = tmp / "library"
+            _synthetic_images(library / "images", count)
+        else:
+            # derivatives go to <library>/.cache; keep them off the real one
+            shutil.copytree(Path(library) / "images", tmp / "library" / "images")
+            library = tmp / "library"
+        cfg.paths.library = library
+        cfg.paths.db = tmp / "index.db"
+        ids = sorted(p.relative_to(library).as_posix() for p in (library / "images").rglob("*.jpg"))
+        ids = (ids * (burst // max(1, len(ids)) + 1))[:burst]
+        with _api_server(cfg) as (base, token):
+            def run():
+                probes, stop = [], threading.Event()
+                def probe():
+                    while not stop.is_set():
+                        probes.append(_get(f"{base}/library/rev", token)[1])
+                        time.sleep(0.02)
+                pt = threading.Thread(target=probe)
+                pt.start()
+                t0 = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=burst) as pool:
+                    res = list(pool.map(lambda i: _get(f"{base}/thumb/{quote(i)}?w={width}", token), ids))
+                wall = time.perf_counter() - t0
+                stop.set(); pt.join()
+                codes = {}
+                for code, _, _ in res:
+                    codes[str(code)] = codes.get(str(code), 0) + 1
+                return {"wall_s": round(wall, 3), "status": codes,
+                        "thumb_ms": summarize([r[1] for r in res if r[0] == 200]),
+                        "library_rev_ms": summarize(probes)}
+            cold = run()
+            warm = run()
+            return {"burst": burst, "distinct": len(set(ids)), "width": width,
+                    "cold": cold, "warm": warm, "renders": stats.snapshot("renders")}
+
+def bench_grid(config: Path, library: Path | None, count: int, width: int, tile_concurrency: int,
+               cold: bool) -> dict:
+    """
+    Loading a grid of `count` thumbnails: one /thumb request per tile
+    (tile_concurrency at a time, like an HTTP/1.1 client per host) against
+    one POST /thumbs. Warm derivative cache by default; cold clears it
+    before each run. Last, a cold batch is dropped after its first byte
+    while the tiles load: every tile should still come back 200.
+    """
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from urllib.parse import quote
+    from .config import AppCfg
+    cfg = AppCfg.load(Path(config))
+    with tempfile.TemporaryDirectory(prefix="leanframe-bench-") as tmp:
+        tmp = Path(tmp)
+        if library is None:
+            library = tmp / "library"
+            _synthetic_images(library / "images", count)
+        else:
+            shutil.copytree(Path(library) / "images", tmp / "library" / "images")
+            library = tmp / "library"
+        cfg.paths.library = library
+        cfg.paths.db = tmp / "index.db"
+        ids = sorted(p.relative_to(library).as_posix() for p in (library / "images").rglob("*.jpg"))[:count]
+        cache = library / ".cache" / "derivatives"
+        with _api_server(cfg) as (base, token):
+            def tiles():
+                with ThreadPoolExecutor(max_workers=tile_concurrency) as pool:
+                    res = list(pool.map(lambda i: _get(f"{base}/thumb/{quote(i)}?w={width}", token), ids))
+                return sum(1 for r in res if r[0] == 200), sum(r[2] for r in res)
+
+            def batch():
+                req = urllib.request.Request(
+                    f"{base}/thumbs", data=json.dumps({"ids": ids, "w": width}).encode(),
+                    headers={"X-Auth-Token": token, "Content-Type": "application/json"})
+                with urllib.request.urlopen(req, timeout=600) as r:
+                    body = r.read()
+                return body.count(b"X-Status: 200"), len(body)
+
+            out = {"items": len(ids), "width": width, "cold": cold, "tile_concurrency": tile_concurrency}
+            if not cold:
+                tiles()  # fill the cache once
+            for name, fn in (("per_tile", tiles), ("batch", batch)):
+                if cold:
+                    shutil.rmtree(cache, ignore_errors=True)
+                t0 = time.perf_counter()
+                ok, nbytes = fn()
+                out[name] = {"wall_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+                             "ok": ok, "bytes": nbytes}
+
+            # a batch dropped mid-stream must not fail /thumb requests sharing its renders
+            shutil.rmtree(cache, ignore_errors=True)
+            req = urllib.request.Request(
+                f"{base}/thumbs", data=json.dumps({"ids": ids, "w": width}).encode(),
+                headers={"X-Auth-Token": token, "Content-Type": "application/json"})
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                with urllib.request.urlopen(req, timeout=600) as r:
+                    pending = pool.submit(tiles)
+                    r.read(1)
+                ok, _ = pending.result()
+            out["batch_dropped"] = {"tiles_ok": ok, "items": len(ids)}
+            return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m photoframe.bench")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("playlist", help="per-slide playlist cost vs library size")
+    p.add_argument("--sizes", default="1000,10000,100000,200000")
+    p.add_argument("--slides", type=int, default=5000)
+    p.add_argument("--no-shuffle", action="store_true")
+    p = sub.add_parser("transitions", help="crossfade frame pacing, headless by default")
+    p.add_argument("--size", default="1920x1080")
+    p.add_argument("--backend", default="auto", choices=["auto", "sdl2", "software"])
+    p.add_argument("--duration-ms", type=int, default=350)
+    p.add_argument("--count", type=int, default=10)
+    p = sub.add_parser("viewer", help="headless slideshow, per-stage time-to-pixel")
+    p.add_argument("--config", default="config/leanframe.yaml")
+    p.add_argument("--slides", type=int, default=60)
+    p.add_argument("--library", default=None, help="real library dir (default: synthetic)")
+    p.add_argument("--count", type=int, default=20, help="synthetic images to generate")
+    p.add_argument("--size", default=None, help="WxH (default: screen from config)")
+    p.add_argument("--padding", default="", help="comma-separated padding styles to compare")
+    p.add_argument("--mode", default=None, choices=["cover", "contain"])
+    p.add_argument("--crossfade-ms", type=int, default=None)
+    p = sub.add_parser("startup", help="import-time report and time to first frame")
+    p.add_argument("--config", default="config/leanframe.yaml")
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--top", type=int, default=15)
+    p = sub.add_parser("thumbs", help="/thumb latency under a grid-sized burst")
+    p.add_argument("--config", default="config/leanframe.yaml")
+    p.add_argument("--library", default=None, help="real library dir (default: synthetic)")
+    p.add_argument("--count", type=int, default=20, help="synthetic images to generate")
+    p.add_argument("--burst", type=int, default=60)
+    p.add_argument("--width", type=int, default=360)
+    p = sub.add_parser("grid", help="grid load: per-tile /thumb vs one POST /thumbs")
+    p.add_argument("--config", default="config/leanframe.yaml")
+    p.add_argument("--library", default=None, help="real library dir (default: synthetic)")
+    p.add_argument("--count", type=int, default=200)
+    p.add_argument("--width", type=int, default=360)
+    p.add_argument("--tile-concurrency", type=int, default=6)
+    p.add_argument("--cold", action="store_true", help="empty derivative cache before each run")
+    p = sub.add_parser("first-frame", help="(child process of `startup`)")
+    p.add_argument("--config", default="config/leanframe.yaml")
+    p.add_argument("--library", required=True)
+    p.add_argument("--state-dir", required=True)
+    p.add_argument("--spawned-at", type=float, required=True)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "playlist":
+        res = bench_playlist([int(x) for x in args.sizes.split(",") if x],
+                             args.slides, shuffle=not args.no_shuffle)
+    elif args.cmd == "transitions":
+        w, h = (int(x) for x in args.size.lower().split("x"))
+        res = bench_transitions((w, h), args.backend, args.duration_ms, args.count)
+    elif args.cmd == "viewer":
+        size = tuple(int(x) for x in args.size.lower().split("x")) if args.size else None
+        with contextlib.redirect_stdout(sys.stderr):  # the viewer logs per slide; stdout is for JSON
+            res = bench_viewer(Path(args.config), args.slides, Path(args.library) if args.library else None,
+                               args.count, size, [x for x in args.padding.split(",") if x],
+                               args.mode, args.crossfade_ms)
+    elif args.cmd == "startup":
+        with contextlib.redirect_stdout(sys.stderr):  # config loading logs to stdout
+            res = bench_startup(Path(args.config), args.runs, args.top)
+    elif args.cmd == "thumbs":
+        with contextlib.redirect_stdout(sys.stderr):
+            res = bench_thumbs(Path(args.config), Path(args.library) if args.library else None,
+                               args.count, args.burst, args.width)
+    elif args.cmd == "grid":
+        with contextlib.redirect_stdout(sys.stderr):
+            res = bench_grid(Path(args.config), Path(args.library) if args.library else None,
+                             args.count, args.width, args.tile_concurrency, args.cold)
+    elif args.cmd == "first-frame":
+        with contextlib.redirect_stdout(sys.stderr):
+            res = first_frame(Path(args.config), Path(args.library), Path(args.state_dir), args.spawned_at)
+        print(json.dumps(res))  # one line, parsed by `startup`
+        return
+    json.dump(res, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
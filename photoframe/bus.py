@@ -0,0 +1,38 @@
+# photoframe/bus.py
+"""
+In-process pub/sub between the API server and the viewer.
+
+Kept out of server.py so the frame process can subscribe without importing
+FastAPI/Pydantic, which it only loads once the first slide is on screen.
+"""
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, List
+
+# In-process pub/sub (dynamic reconfigure)
+class RuntimeBus:
+    def __init__(self) -> None:
+        self._subs: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.RLock()
+        self.last: Dict[str, Any] | None = None  # for late subscribers (the API starts after the first frame)
+
+    def subscribe(self, cb: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            self._subs.append(cb)
+
+    def publish(self, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subs)
+            self.last = payload
+        for cb in subs:
+            try:
+                cb(payload)
+            except Exception:
+                pass
+
+runtime_bus = RuntimeBus()
+# library changes from the API: {"event": "flags"|"delete", "id": item_id, ...}
+# (the persistent record of every change is changelog.ChangeLog)
+library_bus = RuntimeBus()
+# what the viewer shows: {"event": "now_playing", "id": item_id, "kind": ..., "at": epoch s}
+playback_bus = RuntimeBus()
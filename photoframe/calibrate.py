@@ -0,0 +1,145 @@
+# photoframe/calibrate.py
+"""
+Per-format decoder calibration.
+
+Times every available backend (TurboJPEG / pyvips / Pillow) on sample images
+decoded to the configured screen size and persists the fastest backend per
+format. FastImageLoader.load_surface then routes by this table instead of by
+import order. Runs once at first start (or when the screen size or the set of
+installed backends changes); run on demand with:
+
+    python -m photoframe.calibrate [--config config/leanframe.yaml]
+"""
+from __future__ import annotations
+import json, os, statistics, time
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from .fast_image_loader import FastImageLoader, available_backends, backend_supports, installed_backends
+
+# formats we can write samples for with stock Pillow
+SAMPLE_FORMATS = {"jpeg": ".jpg", "png": ".png", "webp": ".webp"}
+SAMPLE_SIZE = (3000, 2000)  # ~6 MP, a typical downsized phone photo
+REPEATS = 3
+
+def routing_path(state_path: Path) -> Path:
+    return Path(state_path).parent / "decoders.json"
+
+def samples_dir(state_path: Path) -> Path:
+    return Path(state_path).parent / ".calibration"
+
+def _make_sample(dst: Path, fmt: str) -> Path:
+    """Deterministic photo-like sample (smooth gradients + sensor-ish noise)."""
+    W, H = SAMPLE_SIZE
+    y, x = np.mgrid[0:H, 0:W].astype(np.float32)
+    rng = np.random.default_rng(7)
+    arr = np.stack([
+        127 + 100 * np.sin(x / 211.0) * np.cos(y / 173.0),
+        127 + 90 * np.sin((x + y) / 301.0),
+        127 + 80 * np.cos(x / 97.0 - y / 143.0),
+    ], axis=-1)
+    arr += rng.normal(0, 6, arr.shape)
+    im = Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8), "RGB")
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "jpeg":
+        im.save(dst, "JPEG", quality=90)
+    elif fmt == "webp":
+        im.save(dst, "WEBP", quality=85)
+    else:
+        im.save(dst, "PNG", compress_level=6)
+    return dst
+
+def ensure_samples(state_path: Path) -> dict[str, Path]:
+    d = samples_dir(state_path)
+    out = {}
+    for fmt, ext in SAMPLE_FORMATS.items():
+        p = d / f"sample-{SAMPLE_SIZE[0]}x{SAMPLE_SIZE[1]}{ext}"
+        if not p.exists():
+            try:
+                _make_sample(p, fmt)
+            except Exception as e:
+                print(f"[calibrate] cannot write {fmt} sample: {e}")
+                continue
+        out[fmt] = p
+    return out
+
+def run(screen_size: tuple[int, int], state_path: Path, repeats: int = REPEATS) -> dict:
+    """Time each backend per format and persist the winners."""
+    loader = FastImageLoader(screen_size)
+    backends = available_backends()
+    timings: dict[str, dict[str, float]] = {}
+    routes: dict[str, str] = {}
+    samples = ensure_samples(state_path) if len(backends) > 1 else {fmt: None for fmt in SAMPLE_FORMATS}
+    for fmt, sample in samples.items():
+        timings[fmt] = {}
+        candidates = [b for b in backends if backend_supports(b, fmt)]
+        if len(candidates) == 1:
+            routes[fmt] = candidates[0]  # nothing to choose between
+            continue
+        for b in candidates:
+            runs = []
+            try:
+                loader.decode(b, sample)  # warm-up (imports, caches)
+                for _ in range(repeats):
+                    t0 = time.perf_counter()
+                    loader.decode(b, sample)
+                    runs.append(time.perf_counter() - t0)
+            except Exception as e:
+                print(f"[calibrate] {b} failed on {fmt}: {e}")
+                continue
+            timings[fmt][b] = round(statistics.median(runs) * 1000.0, 2)
+        if timings[fmt]:
+            routes[fmt] = min(timings[fmt], key=timings[fmt].get)
+    table = {
+        "screen": list(screen_size),
+        "backends": available_backends(),  # minus any that failed to load just now
+        "installed": installed_backends(),
+        "routes": routes,
+        "timings_ms": timings,
+        "created": time.time(),
+    }
+    p = routing_path(state_path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(table, indent=2))
+    tmp.replace(p)
+    print(f"[calibrate] routes={routes} timings_ms={timings}")
+    return table
+
+def load(state_path: Path) -> dict | None:
+    try:
+        return json.loads(routing_path(state_path).read_text())
+    except Exception:
+        return None
+
+def load_or_calibrate(screen_size: tuple[int, int], state_path: Path) -> dict | None:
+    """Reuse the persisted table unless it is missing, stale or a rerun is forced."""
+    table = load(state_path)
+    stale = (
+        table is None
+        or list(table.get("screen") or []) != list(screen_size)
+        # installed, not loaded: checking this must not import the accelerators
+        or list(table.get("installed") or []) != installed_backends()
+        or os.environ.get("LEANFRAME_CALIBRATE") == "1"
+    )
+    if not stale:
+        return table
+    try:
+        return run(screen_size, state_path)
+    except Exception as e:
+        print(f"[calibrate] skipped: {e}")
+        return table
+
+def main():
+    import argparse
+    from .config import AppCfg
+    ap = argparse.ArgumentParser(description="Calibrate image decoder backends per format")
+    ap.add_argument("--config", default="config/leanframe.yaml")
+    ap.add_argument("--repeats", type=int, default=REPEATS)
+    args = ap.parse_args()
+    cfg = AppCfg.load(Path(args.config))
+    table = run((cfg.screen.width, cfg.screen.height), cfg.paths.state, repeats=args.repeats)
+    print(json.dumps(table, indent=2))
+
+if __name__ == "__main__":
+    main()
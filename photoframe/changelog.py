@@ -0,0 +1,250 @@
+# photoframe/changelog.py
+"""
+Persistent, monotonic library change log for delta sync.
+
+Every add / delete / flag edit / crop edit gets a row with a revision number
+(sqlite AUTOINCREMENT, so revisions never go backwards and survive restarts).
+The app keeps the last revision it saw and asks for what happened since:
+
+    GET /library/changes?since=<rev>
+
+changes_since() folds the rows of one item into a single entry carrying
+everything the client needs to patch its listing in place:
+
+    {"id", "rev", "op": "add"|"update"|"delete", "kind"?, "bytes"?, "v"?,
+     "flags"?, "crop"?}
+
+"add" and "update" are both upserts of the fields present; "delete" drops
+the item.
+
+Compaction applies the same folding inside the table (one row per item) and,
+past MAX_ROWS, drops the oldest rows; clients older than that floor, or from
+another log (epoch), are told to reset and refetch /library.
+
+The log lives in its own sqlite file next to the index, so appends never
+wait behind a long indexer transaction.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+from urllib.parse import quote, unquote
+from .crops import crop_store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes(
+  rev INTEGER PRIMARY KEY AUTOINCREMENT,
+  item_id TEXT NOT NULL,
+  op TEXT NOT NULL,
+  data TEXT,
+  ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_item ON changes(item_id, rev);
+CREATE TABLE IF NOT EXISTS changes_meta(key TEXT PRIMARY KEY, value TEXT);
+"""
+
+MAX_ROWS = 50_000        # after folding: roughly one row per item of a big library
+COMPACT_EVERY = 1_000    # appends between compactions
+# only these library subfolders are listed by the API
+MEDIA_DIRS = ("images", "videos")
+
+def item_id_for(root: Path, path: str | Path) -> str | None:
+    """API item id (quoted, library-relative) of path; None outside the media folders."""
+    try:
+        rel = Path(path).relative_to(root).as_posix()
+    except ValueError:
+        return None
+    if rel.split("/", 1)[0] not in MEDIA_DIRS:
+        return None
+    return quote(rel, safe="/-._~")
+
+def item_version(root: Path, item_id: str, path: Path, st: os.stat_result | None = None,
+                 cropped: bool = True) -> str:
+    """Changes whenever the file or (if cropped) its crop changes; the ?v= token of derivative URLs."""
+    st = st or Path(path).stat()
+    rec = crop_store(root).get(item_id) if cropped else None
+    h = hashlib.sha1(f"{st.st_mtime_ns}-{st.st_size}-{json.dumps(rec, sort_keys=True)}".encode())
+    return h.hexdigest()[:16]
+
+def fold(entries: Dict[str, dict], item_id: str, rev: int, op: str, data: dict) -> None:
+    """Fold one row (taken in rev order) into the per-item entries."""
+    cur = entries.get(item_id)
+    if op in ("add", "delete"):
+        entries[item_id] = {"id": item_id, "rev": rev, "op": op, **data}
+        return
+    if cur is None:
+        cur = entries[item_id] = {"id": item_id, "rev": rev, "op": "update"}
+    cur["rev"] = rev
+    if cur["op"] != "delete":  # a late crop/flag edit doesn't bring a deleted item back
+        cur.update(data)
+
+class ChangeLog:
+    def __init__(self, db_path: Path, library_root: Path):
+        self.db_path = Path(db_path)
+        self.root = Path(library_root)
+        self._lock = threading.RLock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # shared by the API, indexer and viewer threads; every use is under _lock
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.executescript(SCHEMA)
+        self.epoch = self._meta("epoch") or self._set_meta("epoch", os.urandom(6).hex())
+        self.floor = int(self._meta("floor") or 0)
+        row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name='changes'").fetchone()
+        self.rev = int(row[0]) if row else 0
+        self._since_compact = 0
+        self._listeners: List[Callable[[dict], None]] = []
+        crop_store(self.root).subscribe(self._on_crop)
+
+    def _meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM changes_meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> str:
+        self.conn.execute("INSERT OR REPLACE INTO changes_meta(key,value) VALUES(?,?)", (key, str(value)))
+        self.conn.commit()
+        return value
+
+    def subscribe(self, cb: Callable[[dict], None]) -> None:
+        """cb(entry) after each appended row, on the appending thread; entry as in changes_since()."""
+        self._listeners.append(cb)
+
+    # ---- writing ----
+    def append(self, op: str, item_id: str, data: dict | None = None) -> int:
+        """Log one change; returns the new revision (the current one if it repeats the last row)."""
+        data = data or {}
+        blob = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        with self._lock:
+            last = self.conn.execute(
+                "SELECT op, data FROM changes WHERE item_id=? ORDER BY rev DESC LIMIT 1",
+                (item_id,)).fetchone()
+            if last is not None and last[0] == op and (last[1] or "{}") == blob:
+                return self.rev  # e.g. the upload and then the indexer both reporting the add
+            cur = self.conn.execute(
+                "INSERT INTO changes(item_id, op, data, ts) VALUES(?,?,?,?)",
+                (item_id, op, blob, time.time()))
+            self.conn.commit()
+            self.rev = int(cur.lastrowid)
+            self._since_compact += 1
+            if self._since_compact >= COMPACT_EVERY:
+                self.compact()
+            rev = self.rev
+        entries: Dict[str, dict] = {}
+        fold(entries, item_id, rev, op, data)
+        entry = entries[item_id]
+        for cb in list(self._listeners):
+            try:
+                cb(entry)
+            except Exception as e:
+                print("[changes] listener error", e)
+        return rev
+
+    def on_index_change(self, op: str, mid: int, path: str, kind: str) -> None:
+        """Library/IndexWorker listener: add / update (edited in place) / remove."""
+        item_id = item_id_for(self.root, path)
+        if item_id is None:
+            return
+        if op == "remove":
+            self.append("delete", item_id)
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return  # gone again already; its remove follows
+        data = {"bytes": int(st.st_size),
+                "v": item_version(self.root, item_id, path, st, cropped=kind == "image")}
+        if op == "update":
+            self.append("update", item_id, data)  # folds like a crop edit: new v for the same item
+        else:
+            self.append("add", item_id, dict(data, kind=kind))
+
+    def _on_crop(self, item_id: str, rec: dict | None) -> None:
+        # CropStore listener: edits made through any writer land in the log
+        data = {"crop": rec}
+        try:
+            data["v"] = item_version(self.root, item_id, self.root / unquote(item_id))
+        except OSError:
+            pass
+        self.append("crop", item_id, data)
+
+    # ---- reading ----
+    def changes_since(self, since: int, limit: int = 1000, epoch: str | None = None) -> dict:
+        with self._lock:
+            rev, floor = self.rev, self.floor
+            if (epoch and epoch != self.epoch) or since < floor or since > rev:
+                return {"epoch": self.epoch, "rev": rev, "since": since, "reset": True,
+                        "changes": [], "more": False}
+            rows = self.conn.execute(
+                "SELECT rev, item_id, op, data FROM changes WHERE rev>? ORDER BY rev LIMIT ?",
+                (int(since), int(limit) + 1)).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        entries: Dict[str, dict] = {}
+        for r, item_id, op, data in rows:
+            fold(entries, item_id, r, op, json.loads(data or "{}"))
+        upto = rows[-1][0] if (rows and more) else rev
+        return {"epoch": self.epoch, "rev": upto, "since": since, "reset": False,
+                "changes": sorted(entries.values(), key=lambda e: e["rev"]), "more": more}
+
+    # ---- compaction ----
+    def compact(self) -> dict:
+        """Fold each item's rows into one (at its latest rev); cap the table at MAX_ROWS."""
+        with self._lock:
+            self._since_compact = 0
+            multi = [r[0] for r in self.conn.execute(
+                "SELECT item_id FROM changes GROUP BY item_id HAVING COUNT(*) > 1")]
+            folded = 0
+            for item_id in multi:
+                rows = self.conn.execute(
+                    "SELECT rev, op, data, ts FROM changes WHERE item_id=? ORDER BY rev",
+                    (item_id,)).fetchall()
+                entries: Dict[str, dict] = {}
+                for r, op, data, _ts in rows:
+                    fold(entries, item_id, r, op, json.loads(data or "{}"))
+                e = dict(entries[item_id])
+                last_rev, last_ts = rows[-1][0], rows[-1][3]
+                op = e.pop("op"); e.pop("id"); e.pop("rev")
+                self.conn.execute("DELETE FROM changes WHERE item_id=? AND rev<?", (item_id, last_rev))
+                self.conn.execute("UPDATE changes SET op=?, data=?, ts=? WHERE rev=?",
+                                  (op, json.dumps(e, sort_keys=True, separators=(",", ":")),
+                                   last_ts, last_rev))
+                folded += len(rows) - 1
+            dropped = 0
+            n = self.conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+            if n > MAX_ROWS:
+                cut = self.conn.execute("SELECT rev FROM changes ORDER BY rev LIMIT 1 OFFSET ?",
+                                        (n - MAX_ROWS - 1,)).fetchone()[0]
+                dropped = self.conn.execute("DELETE FROM changes WHERE rev<=?", (cut,)).rowcount
+                self.floor = max(self.floor, int(cut))
+                self.conn.execute("INSERT OR REPLACE INTO changes_meta(key,value) VALUES('floor',?)",
+                                  (str(self.floor),))
+            self.conn.commit()
+        if folded or dropped:
+            print(f"[changes] compacted: folded {folded}, dropped {dropped} (floor {self.floor})")
+        return {"folded": folded, "dropped": dropped, "floor": self.floor}
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = self.conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+        return {"rev": self.rev, "epoch": self.epoch, "floor": self.floor, "rows": n}
+
+_logs: Dict[Path, ChangeLog] = {}
+_logs_lock = threading.Lock()
+
+def changes_path(index_db: Path) -> Path:
+    return Path(index_db).with_name("changes.db")
+
+def change_log(index_db: Path, library_root: Path) -> ChangeLog:
+    """One shared log per index, used by the indexer listeners and the API."""
+    key = changes_path(index_db).resolve()
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = ChangeLog(key, library_root)
+        return log
@@ -21,6 +21,9 @@ class RenderPaddingCfg:
 class RenderCfg:
     mode: str = "cover" # "cover" | "contain"
     padding: RenderPaddingCfg = field(default_factory=RenderPaddingCfg)
+    max_decode_mp: float = 48.0 # hard pixel budget per decode (megapixels)
+    quality: str = "auto" # "auto" | "high" | "balanced" | "fast" | "minimal"
+    renderer: str = "auto" # "auto" | "sdl2" | "software" (see transitions.py)
 
 @dataclass
 class PlaybackCfg:
@@ -30,6 +33,7 @@ class PlaybackCfg:
     resume_on_start: bool = True
     transitions_crossfade: bool = True
     crossfade_ms: int = 350
+    state_flush_s: float = 300.0  # resume state is coalesced in memory, written at most this often
 
 @dataclass
 class PathsCfg:
@@ -45,6 +49,12 @@ class ServerCfg:
     auth_token: str = "change-me"
     max_upload_mb: int = 512
     allow_extensions: list[str] = None
+    events_max_clients: int = 16   # concurrent /events streams
+    events_queue: int = 64         # per-stream backlog before it is told to resync
+    render_workers: int = 2        # threads rendering /thumb and /render derivatives
+    render_queue: int = 64         # derivatives in flight before new ones get 503
+    prewarm: bool = True           # make thumbnails + screen renders ahead of the first request
+    derivative_cache_mb: int = 1024  # .cache/derivatives budget, least recently used evicted first
 
 @dataclass
 class ConvertCfg:
@@ -55,6 +65,13 @@ class ConvertCfg:
     target_video_format: str = "mp4"
     video_codec: str = "libx264"
     crf: int = 23
+    # display proxies for videos (see transcode.py)
+    proxy_enabled: bool = True
+    proxy_preset: str = "veryfast"
+    proxy_threads: int = 2        # ffmpeg threads; the job also runs at nice 19
+    proxy_pause_s: float = 10.0   # idle gap between two transcodes
+    proxy_timeout_x: float = 8.0  # a transcode is killed after this many times the clip's duration
+    poster_workers: int = 2       # concurrent ffmpeg poster extractions for /thumb
 
 @dataclass
 class IndexerCfg:
@@ -109,6 +126,9 @@ class AppCfg:
         color=padding.get("color", "#000000"),
         blur_amount=padding.get("blur_amount", "28"),
         ),
+        max_decode_mp=float(r.get("max_decode_mp", 48.0)),
+        quality=str(r.get("quality", "auto")),
+        renderer=str(r.get("renderer", "auto")),
         )
 
         # playback
@@ -133,6 +153,8 @@ class AppCfg:
             pb["shuffle"] = bool(pb["shuffle"])
         if "loop" in pb:
             pb["loop"] = bool(pb["loop"])
+        if "state_flush_s" in pb:
+            pb["state_flush_s"] = float(pb["state_flush_s"])
 
         # now safe to construct
         # playback = PlaybackCfg(
@@ -11,6 +11,14 @@ etag TEXT
 CREATE INDEX IF NOT EXISTS idx_media_kind ON media(kind);
 """
 
+# Columns added after the first release; Library adds any that are missing.
+DB_MIGRATIONS = [
+("media", "proxy_path", "TEXT"),   # display proxy of a video (transcode.py)
+("media", "proxy_state", "TEXT"),  # NULL = to check, 'ready' | 'skip' | 'failed'
+("media", "content_hash", "TEXT"), # derivative cache key (indexer.ContentHashes)
+("media", "hash_stamp", "TEXT"),   # "<mtime_ns>-<size>" the hash was taken at
+]
+
 
 # Extended image formats including iPhone and Android common formats
 SUPPORTED_IMAGES = {
@@ -7,4 +7,55 @@ def convert_image(src: Path, dst: Path, convert_bin="convert"):
 
 def convert_video(src: Path, dst: Path, ffmpeg="ffmpeg", vcodec="libx264", crf=23):
     dst.parent.mkdir(parents=True, exist_ok=True)
-    subprocess.run([ffmpeg, '-y', '-i', str(src), '-c:v', vcodec, '-crf', str(crf), '-c:a', 'aac', str(dst)], check=True)
\ No newline at end of file
+    subprocess.run([ffmpeg, '-y', '-i', str(src), '-c:v', vcodec, '-crf', str(crf), '-c:a', 'aac', str(dst)], check=True)
+
+def ffprobe_bin(ffmpeg="ffmpeg"):
+    """ffprobe that ships next to the configured ffmpeg."""
+    p = Path(ffmpeg)
+    return str(p.with_name(p.name.replace("ffmpeg", "ffprobe"))) if "ffmpeg" in p.name else "ffprobe"
+
+def probe_video(src: Path, ffmpeg="ffmpeg"):
+    """{"codec", "width", "height", "pix_fmt", "duration"} of the first video stream, or None."""
+    import json
+    try:
+        out = subprocess.run(
+            [ffprobe_bin(ffmpeg), "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=codec_name,width,height,pix_fmt:format=duration",
+             "-of", "json", str(src)],
+            check=True, capture_output=True, timeout=30).stdout
+        doc = json.loads(out)
+        st = (doc.get("streams") or [None])[0]
+    except Exception:
+        return None
+    if not st:
+        return None
+    try:
+        duration = float((doc.get("format") or {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None  # e.g. some live-recorded .mkv/.webm
+    return {"codec": st.get("codec_name"), "width": int(st.get("width") or 0),
+            "height": int(st.get("height") or 0), "pix_fmt": st.get("pix_fmt"),
+            "duration": duration}
+
+def transcode_proxy(src: Path, dst: Path, box, ffmpeg="ffmpeg", vcodec="libx264", crf=23,
+                    preset="veryfast", threads=2, nice=19, timeout_s=None):
+    """
+    Screen-sized 8-bit H.264 copy of src for smooth playback. Written to
+    dst + ".part" and renamed only on success, so dst is never partial.
+    Past timeout_s ffmpeg is killed and subprocess.TimeoutExpired raised.
+    """
+    import os
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(dst.name + ".part")
+    w, h = box
+    cmd = [ffmpeg, "-y", "-v", "error", "-i", str(src),
+           "-vf", f"scale={w}:{h}:force_original_aspect_ratio=decrease:force_divisible_by=2,format=yuv420p",
+           "-c:v", vcodec, "-preset", preset, "-crf", str(crf), "-threads", str(threads),
+           "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart", "-f", "mp4", str(tmp)]
+    try:
+        subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout_s,
+                       preexec_fn=(lambda: os.nice(nice)) if nice and hasattr(os, "nice") else None)
+        tmp.replace(dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return dst
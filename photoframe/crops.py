@@ -0,0 +1,92 @@
+# photoframe/crops.py
+"""
+Per-item crop specs (normalized rect + quarter-turn rotation + flips),
+shared in-process by the API server and the viewer.
+
+The server validates and writes; the viewer reads straight from the same
+store (no loopback HTTP) and is told about edits through subscribe().
+"""
+from __future__ import annotations
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+CropKey = Tuple[float, float, float, float, int, bool, bool]
+
+class CropStore:
+    """Thread-safe JSON dict id -> crop dict, with change notifications."""
+    def __init__(self, root: Path):
+        self._path = Path(root) / ".crops.json"
+        self._lock = threading.RLock()
+        self._data: Dict[str, dict] = {}
+        self._subs: List[Callable[[str, dict | None], None]] = []
+        if self._path.exists():
+            try:
+                self._data = json.loads(self._path.read_text())
+            except Exception:
+                self._data = {}
+
+    def _save(self):
+        tmp = self._path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._data, separators=(",", ":")))
+        tmp.replace(self._path)
+
+    def _notify(self, id_: str, rec: dict | None):
+        with self._lock:
+            subs = list(self._subs)
+        for cb in subs:
+            try:
+                cb(id_, rec)
+            except Exception:
+                pass
+
+    def subscribe(self, cb: Callable[[str, dict | None], None]) -> None:
+        """cb(item_id, crop dict or None when cleared); called on the writer's thread."""
+        with self._lock:
+            self._subs.append(cb)
+
+    def get(self, id_: str) -> dict | None:
+        with self._lock:
+            rec = self._data.get(id_)
+        return dict(rec) if rec else None
+
+    def put(self, id_: str, rec: dict):
+        with self._lock:
+            self._data[id_] = dict(rec)
+            self._save()
+        self._notify(id_, dict(rec))
+
+    def delete(self, id_: str):
+        with self._lock:
+            if id_ not in self._data:
+                return
+            del self._data[id_]
+            self._save()
+        self._notify(id_, None)
+
+_stores: Dict[Path, CropStore] = {}
+_stores_lock = threading.Lock()
+
+def crop_store(root: Path) -> CropStore:
+    """One shared store per library root, so server edits reach the viewer."""
+    key = Path(root).resolve()
+    with _stores_lock:
+        st = _stores.get(key)
+        if st is None:
+            st = _stores[key] = CropStore(key)
+        return st
+
+def crop_key(rec: dict | None) -> CropKey | None:
+    """Normalized, hashable crop; None for the implicit full frame."""
+    if not rec:
+        return None
+    k = (
+        round(float(rec.get("x", 0)), 6), round(float(rec.get("y", 0)), 6),
+        round(float(rec.get("w", 1)), 6), round(float(rec.get("h", 1)), 6),
+        int(rec.get("rotate_deg", 0)) % 360,
+        bool(rec.get("hflip", False)), bool(rec.get("vflip", False)),
+    )
+    if k == (0.0, 0.0, 1.0, 1.0, 0, False, False):
+        return None
+    return k
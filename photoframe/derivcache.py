@@ -0,0 +1,176 @@
+# photoframe/derivcache.py
+"""
+Size-bounded LRU for the API's derivative cache (<library>/.cache/derivatives).
+
+Every rendered variant and video poster is recorded in a small sqlite index
+(name, group, bytes, last access) next to the cache dir. Hits only touch an
+in-memory map that is written back in batches, so serving a thumbnail costs
+no sqlite write. When the recorded total passes the byte budget the least
+recently used files are deleted down to LOW_WATER of it; nothing ever globs
+the directory except the one-time import of files made before the index
+existed.
+
+Rows also record their group, the file-name prefix before "__" (the
+source's content hash; path + mtime for the viewer's clip posters). Nothing
+is purged per source: an edited file gets a new key and new names, and its
+old derivatives age out like any others.
+
+The API and the viewer share one instance per directory
+(derivative_cache()), so both count against the same budget.
+"""
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS derivatives(
+  name TEXT PRIMARY KEY,
+  grp TEXT NOT NULL,
+  bytes INTEGER NOT NULL,
+  atime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS derivatives_atime ON derivatives(atime);
+CREATE INDEX IF NOT EXISTS derivatives_grp ON derivatives(grp);
+"""
+
+LOW_WATER = 0.9        # evict down to this fraction of the budget
+FLUSH_EVERY_S = 30.0   # write back access times at most this often
+FLUSH_EVERY_N = 256    # ... or after this many hits
+
+def group_of(name: str) -> str:
+    return name.split("__", 1)[0]
+
+class DerivativeCache:
+    def __init__(self, cache_dir: Path, budget_bytes: int):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.budget = max(1, int(budget_bytes))
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.dir.with_name(self.dir.name + ".db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.executescript(SCHEMA)
+        self._touched: dict[str, float] = {}
+        self._flushed_at = time.monotonic()
+        self.stats = {"hits": 0, "misses": 0, "added": 0, "evicted": 0, "evicted_bytes": 0}
+        row = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM derivatives").fetchone()
+        self.files, self.bytes = int(row[0]), int(row[1])
+        if self.files == 0:
+            self._import_existing()
+        self._evict()
+
+    def _import_existing(self) -> None:
+        """One-time: adopt files written before there was an index."""
+        rows = []
+        with os.scandir(self.dir) as it:
+            for e in it:
+                if e.is_file() and not e.name.endswith(".part"):
+                    st = e.stat()
+                    rows.append((e.name, group_of(e.name), st.st_size, st.st_atime))
+        if rows:
+            with self._lock:
+                self.conn.executemany("INSERT OR REPLACE INTO derivatives VALUES(?,?,?,?)", rows)
+                self.conn.commit()
+                self.files, self.bytes = len(rows), sum(r[2] for r in rows)
+            print(f"[derivatives] indexed {self.files} cached files ({self.bytes >> 20} MB)")
+
+    # ---- lookups ----
+    def hit(self, path: Path) -> Path | None:
+        """path if it is cached (and mark it used), else None."""
+        path = Path(path)
+        if not path.exists():
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+            self._touched[path.name] = time.time()
+            if len(self._touched) >= FLUSH_EVERY_N or time.monotonic() - self._flushed_at > FLUSH_EVERY_S:
+                self._flush()
+        return path
+
+    def has_room(self) -> bool:
+        """Below the low-water mark: background prewarming may add files."""
+        return self.bytes < self.budget * LOW_WATER
+
+    def _flush(self) -> None:
+        if self._touched:
+            self.conn.executemany("UPDATE derivatives SET atime=? WHERE name=?",
+                                  [(t, n) for n, t in self._touched.items()])
+            self.conn.commit()
+            self._touched.clear()
+        self._flushed_at = time.monotonic()
+
+    # ---- writes ----
+    def add(self, path: Path) -> None:
+        """Record a freshly written derivative; evicts if over budget."""
+        path = Path(path)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return
+        with self._lock:
+            old = self.conn.execute("SELECT bytes FROM derivatives WHERE name=?", (path.name,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO derivatives VALUES(?,?,?,?)",
+                              (path.name, group_of(path.name), size, time.time()))
+            self.conn.commit()
+            if old:
+                self.bytes -= int(old[0])
+            else:
+                self.files += 1
+            self.bytes += size
+            self.stats["added"] += 1
+            if self.bytes > self.budget:
+                self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            if self.bytes <= self.budget:
+                return
+            self._flush()
+            target = self.budget * LOW_WATER
+            victims = []
+            freed = 0
+            for name, size in self.conn.execute("SELECT name, bytes FROM derivatives ORDER BY atime"):
+                if self.bytes - freed <= target:
+                    break
+                victims.append((name,))
+                freed += int(size)
+            self._drop(victims, freed)
+            self.stats["evicted"] += len(victims)
+            self.stats["evicted_bytes"] += freed
+
+    def _drop(self, names: list[tuple[str]], size: int) -> None:
+        for (name,) in names:
+            try:
+                os.remove(self.dir / name)
+            except OSError:
+                pass
+        self.conn.executemany("DELETE FROM derivatives WHERE name=?", names)
+        self.conn.commit()
+        self.files -= len(names)
+        self.bytes -= size
+
+    def report(self) -> dict:
+        with self._lock:
+            looked = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, files=self.files, bytes=self.bytes, budget_bytes=self.budget,
+                        hit_rate=round(self.stats["hits"] / looked, 3) if looked else None)
+
+def derivatives_dir(library_root: Path) -> Path:
+    return Path(library_root) / ".cache" / "derivatives"
+
+_caches: dict[Path, DerivativeCache] = {}
+_caches_lock = threading.Lock()
+
+def derivative_cache(cache_dir: Path, budget_bytes: int) -> DerivativeCache:
+    """The shared cache for cache_dir (the first caller's budget applies)."""
+    key = Path(cache_dir).resolve()
+    with _caches_lock:
+        dc = _caches.get(key)
+        if dc is None:
+            dc = _caches[key] = DerivativeCache(key, budget_bytes)
+        return dc
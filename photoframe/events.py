@@ -0,0 +1,111 @@
+# photoframe/events.py
+"""
+Server-Sent Events fan-out for the API's /events stream.
+
+Instead of polling /library/rev and /config/runtime, the app keeps one
+GET /events open and is pushed:
+
+    event: library     id: <epoch>-<rev>   one change-log entry (see changelog.py)
+    event: runtime                          a runtime config update (runtime_bus payload)
+    event: now_playing                      {"id", "kind", "at"} when the viewer moves on
+    event: resync                           the stream fell behind: fetch /library/changes
+
+publish() may be called from any thread (indexer, viewer, API handlers); it
+hands the message to each client's event loop. Every client has a small
+bounded queue. A client that does not keep up is not buffered without limit: its queue
+is emptied and replaced by a single "resync", and it catches up through
+/library/changes from the last id it saw. Library events carry that id, so a
+browser EventSource reconnecting with Last-Event-ID gets the missed changes
+replayed (or a resync when the log no longer reaches back that far).
+"""
+from __future__ import annotations
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Awaitable, Callable
+
+class HubFull(RuntimeError):
+    pass
+
+def sse(event: str, data: dict, id_: str | None = None) -> bytes:
+    head = f"id: {id_}\n" if id_ is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+class _Client:
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.loop = loop
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, msg: bytes) -> None:
+        # on the client's loop
+        try:
+            self.queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(sse("resync", {"reason": "slow consumer"}))
+
+class EventHub:
+    def __init__(self, max_clients: int = 16, queue_size: int = 64, keepalive_s: float = 15.0):
+        self.max_clients = max(1, int(max_clients))
+        self.queue_size = max(2, int(queue_size))
+        self.keepalive_s = keepalive_s
+        self._lock = threading.Lock()
+        self._clients: set[_Client] = set()
+        self.stats = {"published": 0, "connects": 0, "rejected": 0, "dropped": 0}
+
+    def publish(self, event: str, data: dict, id_: str | None = None) -> None:
+        """Send to every connected client; thread-safe, never blocks."""
+        msg = sse(event, data, id_)
+        with self._lock:
+            clients = list(self._clients)
+            self.stats["published"] += 1
+        for c in clients:
+            try:
+                c.loop.call_soon_threadsafe(c.offer, msg)
+            except RuntimeError:
+                pass  # loop closed; the stream's finally removes the client
+
+    def connect(self) -> _Client:
+        """Register a stream on the running loop; HubFull when max_clients are connected."""
+        client = _Client(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                self.stats["rejected"] += 1
+                raise HubFull(f"{self.max_clients} event streams open")
+            self._clients.add(client)
+            self.stats["connects"] += 1
+        return client
+
+    async def stream(self, client: _Client, hello: list[bytes],
+                     is_disconnected: Callable[[], Awaitable[bool]] | None = None
+                     ) -> AsyncIterator[bytes]:
+        """
+        The client's SSE bytes: `hello` first (snapshot, replayed changes),
+        then published events, with a keepalive comment when idle.
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            for msg in hello:
+                yield msg
+            while True:
+                try:
+                    yield await asyncio.wait_for(client.queue.get(), self.keepalive_s)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        return
+                    yield b": keepalive\n\n"
+        finally:
+            self.disconnect(client)
+
+    def disconnect(self, client: _Client) -> None:
+        with self._lock:
+            if client in self._clients:
+                self._clients.discard(client)
+                self.stats["dropped"] += client.dropped
+
+    def report(self) -> dict:
+        with self._lock:
+            return dict(self.stats, clients=len(self._clients), max_clients=self.max_clients)
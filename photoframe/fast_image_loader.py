@@ -3,43 +3,247 @@ from __future__ import annotations
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
 from collections import OrderedDict
+from functools import lru_cache
+import importlib.util
+import threading, time
 from PIL import Image, ImageOps, ImageFilter, ImageDraw 
 import numpy as np
 import pygame
 
-# Optional accelerators
-try:
-    from turbojpeg import TurboJPEG, TJPF_RGB
-    _jpeg = TurboJPEG()
-except Exception:
-    _jpeg = None
-
-try:
-    import pyvips
-except Exception:
-    pyvips = None
-
 from PIL import Image, ImageOps, ExifTags, ImageFilter  # EXIF + fallback + blur
 from .config import RenderCfg, RenderPaddingCfg
+from .imaging import (DecodeBudgetError, budget_pixels, exif_orientation, open_pillow_bounded,
+                      open_vips_bounded, vips)
+
+# Optional accelerators: only looked up at start, imported by the first decode
+# routed to them (pyvips alone takes a good part of a second to import on a Pi)
+_ACCEL_MODULES = {"turbojpeg": "turbojpeg", "pyvips": "pyvips"}
+_accel: dict[str, object] = {}  # backend -> loaded handle, None if loading failed
+_accel_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _has_module(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except Exception:
+        return False
+
+def _load_accel(backend: str):
+    """Import/initialise an accelerator once; None if it can't be used."""
+    with _accel_lock:
+        if backend not in _accel:
+            try:
+                if backend == "turbojpeg":
+                    from turbojpeg import TurboJPEG
+                    _accel[backend] = TurboJPEG()
+                else:
+                    _accel[backend] = vips()
+            except Exception as e:
+                print(f"[loader] {backend} unavailable: {e}")
+                _accel[backend] = None
+        return _accel[backend]
 
 _EXIF_ORIENT = {v: k for k, v in ExifTags.TAGS.items()}.get('Orientation', None)
 
+# EXIF orientation tag -> transposes that make the pixels upright
+_T = Image.Transpose
+_ORIENT_OPS = {
+    2: (_T.FLIP_LEFT_RIGHT,), 3: (_T.ROTATE_180,), 4: (_T.FLIP_TOP_BOTTOM,),
+    5: (_T.TRANSPOSE,), 6: (_T.ROTATE_270,), 7: (_T.TRANSVERSE,), 8: (_T.ROTATE_90,),
+}
+# clockwise quarter turns (libvips rot() semantics, as used by /render)
+_QUARTER_TURNS = {1: _T.ROTATE_270, 2: _T.ROTATE_180, 3: _T.ROTATE_90}
+
+# File suffix -> format key used by the decoder routing table
+FORMATS = {
+    ".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png", ".webp": "webp",
+    ".heic": "heif", ".heif": "heif", ".avif": "avif", ".bmp": "bmp",
+    ".tif": "tiff", ".tiff": "tiff",
+}
+
+def installed_backends() -> list[str]:
+    """Backends whose module is installed (nothing imported)."""
+    return [b for b, mod in _ACCEL_MODULES.items() if _has_module(mod)] + ["pillow"]
+
+def available_backends() -> list[str]:
+    """Installed backends, minus any that already failed to load."""
+    return [b for b in installed_backends() if _accel.get(b, True) is not None]
+
+def backend_supports(backend: str, fmt: str | None) -> bool:
+    if backend == "turbojpeg":
+        return fmt == "jpeg"
+    return backend in ("pyvips", "pillow")
+
+# Quality tiers, best first: (name, resample filter, blur working scale, cheap padding)
+QUALITY_TIERS = (
+    ("high",     Image.Resampling.LANCZOS,  1.0,   False),
+    ("balanced", Image.Resampling.BICUBIC,  0.5,   False),
+    ("fast",     Image.Resampling.BILINEAR, 0.25,  True),
+    ("minimal",  Image.Resampling.BILINEAR, 0.125, True),
+)
+_TIER_NAMES = [t[0] for t in QUALITY_TIERS]
+
+# Padding fallbacks used by the cheap tiers (styles not listed are kept)
+_CHEAP_PADDING = {
+    "fast": {"mirror": "blur", "stretch": "blur", "motion": "blur",
+             "texture": "average", "gradient_radial": "gradient_linear"},
+    "minimal": {"blur": "average", "glass": "average", "mirror": "average",
+                "stretch": "average", "motion": "average", "texture": "average",
+                "gradient_radial": "average", "gradient_linear": "average"},
+}
+
+# Tier controller: step down when decode+compose exceeds the budget,
+# step back up after a few frames comfortably under it.
+_EWMA_ALPHA = 0.3
+_HEADROOM = 0.4     # "comfortably under" = below 40% of budget
+_CALM_FRAMES = 3
+
 class SurfaceLRU(OrderedDict):
-    def __init__(self, cap=6): super().__init__(); self.cap = cap
+    def __init__(self, cap=6):
+        super().__init__(); self.cap = cap; self.lock = threading.RLock()
+        self._inflight: dict = {}  # key -> Event while some thread is making it
     def get_put(self, key, mk):
-        if key in self:
-            self.move_to_end(key); return self[key]
-        val = mk(); self[key] = val
-        while len(self) > self.cap: self.popitem(last=False)
-        return val
+        with self.lock:
+            if key in self:
+                self.move_to_end(key); return self[key]
+            ev = self._inflight.get(key)
+            owner = ev is None
+            if owner:
+                ev = self._inflight[key] = threading.Event()
+        if not owner:
+            # the preloader is already decoding this slide: wait for it, don't decode twice
+            ev.wait()
+            with self.lock:
+                if key in self:
+                    self.move_to_end(key); return self[key]
+            return self.get_put(key, mk)  # it failed (or was evicted): try ourselves
+        try:
+            val = mk()  # decode outside the lock; preload threads run concurrently
+            with self.lock:
+                self[key] = val
+                while len(self) > self.cap: self.popitem(last=False)
+            return val
+        finally:
+            with self.lock:
+                self._inflight.pop(key, None)
+            ev.set()
+    def drop(self, pred):
+        with self.lock:
+            for k in [k for k in self if pred(k)]:
+                del self[k]
 
 class FastImageLoader:
-    def __init__(self, screen_size, render: RenderCfg | None = None):
+    def __init__(self, screen_size, render: RenderCfg | None = None, routing: dict | None = None):
         self.W, self.H = screen_size
         self.cache = SurfaceLRU(6)
         self.pool = ThreadPoolExecutor(max_workers=3)
         # default render if not provided
         self.render = render or RenderCfg()
+        # calibrated routing table (see calibrate.py); None -> import-order default
+        self.routing = routing
+        # adaptive quality: seconds allowed for decode+compose of one slide (0 = no limit)
+        self.frame_budget_s = 0.0
+        self._tier_idx = 0
+        self._calm = 0
+        self._ewma: dict[str, float] = {}
+        self._frames = 0
+        self._tier_changes = 0
+        self._stats_lock = threading.Lock()
+        self._built: dict[Path, dict] = {}  # path -> stage times of its last build (bench.py)
+
+    def tier(self):
+        pinned = str(getattr(self.render, "quality", "auto") or "auto").lower()
+        if pinned in _TIER_NAMES:
+            return QUALITY_TIERS[_TIER_NAMES.index(pinned)]
+        return QUALITY_TIERS[self._tier_idx]
+
+    def _record_frame(self, decode_s: float, compose_s: float, convert_s: float) -> None:
+        with self._stats_lock:
+            self._frames += 1
+            for k, v in (("decode", decode_s), ("compose", compose_s), ("convert", convert_s)):
+                prev = self._ewma.get(k)
+                self._ewma[k] = v if prev is None else prev + _EWMA_ALPHA * (v - prev)
+            budget = self.frame_budget_s
+            if not budget:
+                return
+            total = sum(self._ewma.values())
+            stepped = False
+            if total > budget and self._tier_idx < len(QUALITY_TIERS) - 1:
+                self._tier_idx += 1
+                stepped = True
+            elif total < budget * _HEADROOM and self._tier_idx > 0:
+                self._calm += 1
+                if self._calm >= _CALM_FRAMES:
+                    self._tier_idx -= 1
+                    stepped = True
+            else:
+                self._calm = 0
+            if stepped:
+                self._calm = 0
+                self._tier_changes += 1
+                # compose cost is tier-dependent: relearn it at the new tier
+                self._ewma.pop("compose", None)
+                print(f"[loader] quality tier -> {_TIER_NAMES[self._tier_idx]} "
+                      f"(frame {total*1000:.0f} ms, budget {budget*1000:.0f} ms)")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "tier": self.tier()[0],
+                "tier_index": _TIER_NAMES.index(self.tier()[0]),
+                "tiers": _TIER_NAMES,
+                "pinned": str(getattr(self.render, "quality", "auto") or "auto").lower() in _TIER_NAMES,
+                "budget_ms": round(self.frame_budget_s * 1000.0, 1),
+                "ewma_ms": {k: round(v * 1000.0, 1) for k, v in self._ewma.items()},
+                "frames": self._frames,
+                "tier_changes": self._tier_changes,
+            }
+
+    def backend_for(self, path: Path) -> str:
+        """Pick the decoder for this file: calibrated route if usable, else TurboJPEG > pyvips > Pillow."""
+        fmt = FORMATS.get(Path(path).suffix.lower())
+        routes = (self.routing or {}).get("routes") or {}
+        choice = routes.get(fmt)
+        usable = lambda b: b in available_backends() and (b == "pillow" or _load_accel(b) is not None)
+        if choice and backend_supports(choice, fmt) and usable(choice):
+            return choice
+        if fmt == "jpeg" and usable("turbojpeg"):
+            return "turbojpeg"
+        return "pyvips" if usable("pyvips") else "pillow"
+
+    def decode(self, backend: str, path: Path) -> tuple[np.ndarray, str]:
+        """
+        Decode to an RGB array (roughly screen-sized) with the named backend.
+        Returns (array, backend actually used): a JPEG turbojpeg can't read
+        falls back to Pillow, whose pixels are already EXIF-upright.
+        """
+        if backend != "pillow" and _load_accel(backend) is None:
+            raise RuntimeError(f"{backend} is not available")
+        if backend == "turbojpeg":
+            arr = self._decode_with_turbojpeg(path)
+            if arr is not None:
+                return arr, backend
+            backend = "pillow"
+        if backend == "pyvips":
+            return self._decode_with_pyvips(path), backend
+        return self._decode_with_pillow(path), "pillow"
+
+    def decoder_report(self) -> dict:
+        r = self.routing or {}
+        return {
+            "available": available_backends(),
+            "source": "calibrated" if r.get("routes") else "default",
+            "routes": {fmt: self.backend_for(Path("x" + ext)) for ext, fmt in FORMATS.items()},
+            "calibrated_at": r.get("created"),
+            "timings_ms": r.get("timings_ms", {}),
+        }
+
+    def _max_pixels(self) -> int:
+        return budget_pixels(getattr(self.render, "max_decode_mp", None))
+
+    def _cover(self) -> bool:
+        # cover fills the screen, so decodes must cover it too (not just fit inside)
+        return (getattr(self.render, "mode", None) or "cover").lower() == "cover"
 
     def _apply_orientation(self, pil_img):
         try:
@@ -50,12 +254,36 @@ class FastImageLoader:
         except Exception:
             return pil_img
 
+    @staticmethod
+    def _orient(pil_img: Image.Image, orientation_tag: int) -> Image.Image:
+        """Make pixels upright from an EXIF orientation tag (decoded arrays carry no EXIF)."""
+        for op in _ORIENT_OPS.get(int(orientation_tag or 1), ()):
+            pil_img = pil_img.transpose(op)
+        return pil_img
+
+    @staticmethod
+    def _apply_crop(pil_img: Image.Image, crop) -> Image.Image:
+        """
+        Apply a crops.crop_key() tuple to an upright image: normalized crop
+        rect, then flips, then clockwise quarter turns (same order as /render).
+        """
+        x, y, cw, ch, rot, hflip, vflip = crop
+        W, H = pil_img.size
+        l = max(0, min(W - 1, int(x * W))); t = max(0, min(H - 1, int(y * H)))
+        r = max(l + 1, min(W, l + max(1, int(cw * W))))
+        b = max(t + 1, min(H, t + max(1, int(ch * H))))
+        im = pil_img.crop((l, t, r, b))
+        if hflip: im = im.transpose(_T.FLIP_LEFT_RIGHT)
+        if vflip: im = im.transpose(_T.FLIP_TOP_BOTTOM)
+        q = (rot // 90) % 4
+        if q: im = im.transpose(_QUARTER_TURNS[q])
+        return im
+
     def _read_orientation_tag(self, path: Path) -> int:
         """Lightweight: read orientation without fully decoding pixels for turbojpeg/pyvips paths."""
         try:
             with Image.open(path) as im:
-                exif = im.getexif()
-                return int(exif.get(_EXIF_ORIENT, 1)) if exif else 1
+                return exif_orientation(im)
         except Exception:
             return 1
 
@@ -111,14 +339,14 @@ class FastImageLoader:
         overlay = Image.new("RGB", (W, H), c1)
         return Image.composite(overlay, base, mask_img)
 
-    def _mirror_pad_canvas(self, src: Image.Image, size) -> Image.Image:
+    def _mirror_pad_canvas(self, src: Image.Image, size, resample=Image.LANCZOS) -> Image.Image:
         """Create a mirror-padded canvas (reflect edges) then center-crop to size."""
         W, H = size
         w, h = src.size
         # scale to fit (contain), then mirror-pad around to at least W×H
         s = min(W / w, H / h)
         nw, nh = max(1, int(w * s)), max(1, int(h * s))
-        main = src.resize((nw, nh), Image.LANCZOS).convert("RGB")
+        main = src.resize((nw, nh), resample).convert("RGB")
         pad_x = max(0, (W - nw) // 2)
         pad_y = max(0, (H - nh) // 2)
         # Build big canvas by tiling mirrors (left/right/top/bottom)
@@ -151,13 +379,13 @@ class FastImageLoader:
         # final crop (already exact, but keep consistent)
         return canvas.crop((0, 0, W, H))
 
-    def _stretch_pad_canvas(self, src: Image.Image, size) -> Image.Image:
+    def _stretch_pad_canvas(self, src: Image.Image, size, resample=Image.LANCZOS) -> Image.Image:
         """Pixel-stretch edges to fill remaining area."""
         W, H = size
         w, h = src.size
         s = min(W / w, H / h)
         nw, nh = max(1, int(w * s)), max(1, int(h * s))
-        main = src.resize((nw, nh), Image.LANCZOS).convert("RGB")
+        main = src.resize((nw, nh), resample).convert("RGB")
         bg = Image.new("RGB", (W, H))
         off = ((W - nw) // 2, (H - nh) // 2)
         # stretch left/right
@@ -189,16 +417,38 @@ class FastImageLoader:
         arr = np.clip(base + noise, 0, 255).astype(np.uint8)
         return Image.fromarray(arr, mode="RGB").filter(ImageFilter.GaussianBlur(radius=blur_amt))
 
-    def _compose_frame(self, src_img: Image.Image, orientation_tag: int) -> np.ndarray:
+    def _blurred_cover(self, src_img: Image.Image, radius: float, tier) -> Image.Image:
+        """
+        Cover-scaled, center-cropped, Gaussian-blurred background. The blur runs
+        at the tier's working size (a fraction of the screen) and is upscaled
+        afterwards; a blurred image loses nothing visible by being small.
+        """
+        W, H = self.W, self.H
+        _, resample, work, _ = tier
+        ww, wh = max(1, int(W * work)), max(1, int(H * work))
+        w, h = src_img.size
+        s = max(ww / w, wh / h)
+        cw, ch = max(1, int(w * s)), max(1, int(h * s))
+        bg = src_img.resize((cw, ch), resample).convert("RGB")
+        l = max(0, (cw - ww) // 2); t = max(0, (ch - wh) // 2)
+        bg = bg.crop((l, t, l + ww, t + wh)).filter(ImageFilter.GaussianBlur(radius=max(1.0, radius * work)))
+        if (ww, wh) != (W, H):
+            bg = bg.resize((W, H), Image.Resampling.BILINEAR)
+        return bg
+
+    def _compose_frame(self, src_img: Image.Image, orientation_tag: int, tier=None) -> np.ndarray:
         """
         Returns an RGB numpy array with shape (H, W, 3), already composed to the
-        screen size (W,H) according to self.render.mode and padding settings.
+        screen size (W,H) according to self.render.mode and padding settings,
+        at the given quality tier (resample filter, blur working size, padding).
         """
         W, H = self.W, self.H
+        tier = tier or self.tier()
+        tier_name, resample, _, cheap = tier
         # Apply orientation first
         try:
             if orientation_tag != 1:
-                src_img = ImageOps.exif_transpose(src_img)
+                src_img = self._orient(src_img, orientation_tag)
         except Exception:
             pass
 
@@ -214,12 +464,15 @@ class FastImageLoader:
         blur_amt = max(1, min(blur_amt, 100))
         pad_style = (self.render.padding.style if self.render.padding else "blur").lower()
         pad_color_rgb = self._hex_to_rgb(self.render.padding.color if self.render.padding else "#000000")
+        if cheap:
+            # budget at risk: swap full-screen padding passes for cheap ones
+            pad_style = _CHEAP_PADDING[tier_name].get(pad_style, pad_style)
 
         if mode == "cover":
             # scale to fill, then center-crop
             scale = max(W / w, H / h)
             nw, nh = max(1, int(w * scale)), max(1, int(h * scale))
-            im = src_img.resize((nw, nh), Image.LANCZOS)
+            im = src_img.resize((nw, nh), resample)
             left = max(0, (nw - W) // 2)
             top = max(0, (nh - H) // 2)
             im = im.crop((left, top, left + W, top + H))
@@ -228,24 +481,16 @@ class FastImageLoader:
         # CONTAIN: keep aspect, add padding to fit exactly W×H
         scale = min(W / w, H / h)
         nw, nh = max(1, int(w * scale)), max(1, int(h * scale))
-        main = src_img.resize((nw, nh), Image.LANCZOS).convert("RGB")
+        main = src_img.resize((nw, nh), resample).convert("RGB")
 
         # Background canvas
         if pad_style == "solid":
             bg = Image.new("RGB", (W, H), pad_color_rgb)
         elif pad_style == "blur":
             # "blur" modern padding: take a cover-scaled version, heavily blur
-            s = max(W / w, H / h)
-            cw, ch = max(1, int(w * s)), max(1, int(h * s))
-            bg = src_img.resize((cw, ch), Image.LANCZOS).convert("RGB")
-            # center-crop to W×H
-            l = max(0, (cw - W) // 2)
-            t = max(0, (ch - H) // 2)
-            bg = bg.crop((l, t, l + W, t + H))
-            # blur + slight darken to emphasize main image
+            bg = self._blurred_cover(src_img, blur_amt, tier)
+            # slight darken to emphasize main image
             try:
-                bg = bg.filter(ImageFilter.GaussianBlur(radius=blur_amt))
-                # optional: subtle dim
                 bg = Image.blend(bg, Image.new("RGB", bg.size, (0, 0, 0)), alpha=0.08)
             except Exception:
                 pass
@@ -253,9 +498,9 @@ class FastImageLoader:
             avg = self._avg_color(src_img)
             bg = Image.new("RGB", (W, H), avg)
         elif pad_style == "mirror":
-            bg = self._mirror_pad_canvas(src_img, (W, H))
+            bg = self._mirror_pad_canvas(src_img, (W, H), resample)
         elif pad_style == "stretch":
-            bg = self._stretch_pad_canvas(src_img, (W, H))
+            bg = self._stretch_pad_canvas(src_img, (W, H), resample)
         elif pad_style == "gradient_linear":
             c0 = self._avg_color(src_img)
             c1 = pad_color_rgb or (0, 0, 0)
@@ -266,18 +511,14 @@ class FastImageLoader:
             bg = self._make_radial_gradient((W, H), c0, c1)
         elif pad_style == "glass":
             # frosted glass = blur + slight brighten
-            s = max(W / w, H / h)
-            cw, ch = max(1, int(w * s)), max(1, int(h * s))
-            bg = src_img.resize((cw, ch), Image.LANCZOS).convert("RGB")
-            l = max(0, (cw - W) // 2); t = max(0, (ch - H) // 2)
-            bg = bg.crop((l, t, l + W, t + H)).filter(ImageFilter.GaussianBlur(radius=blur_amt))
+            bg = self._blurred_cover(src_img, blur_amt, tier)
             # brighten a tad by blending toward white
             bg = Image.blend(bg, Image.new("RGB", (W, H), (255, 255, 255)), alpha=0.06)
         elif pad_style == "motion":
             # cheap directional blur: average a few shifted copies
             s = max(W / w, H / h)
             cw, ch = max(1, int(w * s)), max(1, int(h * s))
-            base = src_img.resize((cw, ch), Image.LANCZOS).convert("RGB")
+            base = src_img.resize((cw, ch), resample).convert("RGB")
             l = max(0, (cw - W) // 2); t = max(0, (ch - H) // 2)
             base = base.crop((l, t, l + W, t + H))
             acc = np.zeros((H, W, 3), dtype=np.float32)
@@ -296,11 +537,7 @@ class FastImageLoader:
             bg = Image.blend(bg, Image.new("RGB", (W, H), (0, 0, 0)), alpha=0.4)
         else:
             # default fallback = blur
-            s = max(W / w, H / h)
-            cw, ch = max(1, int(w * s)), max(1, int(h * s))
-            bg = src_img.resize((cw, ch), Image.LANCZOS).convert("RGB")
-            l = max(0, (cw - W) // 2); t = max(0, (ch - H) // 2)
-            bg = bg.crop((l, t, l + W, t + H)).filter(ImageFilter.GaussianBlur(radius=blur_amt))
+            bg = self._blurred_cover(src_img, blur_amt, tier)
             bg = Image.blend(bg, Image.new("RGB", (W, H), (0, 0, 0)), alpha=0.08)
 
         # Paste main centered
@@ -311,7 +548,9 @@ class FastImageLoader:
 
     def _to_surface(self, arr_hw3):
         surf = pygame.image.frombuffer(arr_hw3.tobytes(), arr_hw3.shape[1::-1], "RGB")
-        return surf.convert()  # match display format for fast blits
+        # match display format for fast blits; with the sdl2 renderer there is no
+        # display surface and the frame is uploaded as a texture instead
+        return surf.convert() if pygame.display.get_surface() is not None else surf
 
     def _decode_with_turbojpeg(self, path):
         """
@@ -319,9 +558,12 @@ class FastImageLoader:
           - Works with PyTurboJPEG header as dict *or* tuple (older builds on Pi).
           - Reads the whole file (partial header reads can fail on some JPEGs).
           - If reshape dims are off (MCU rounding), falls back gracefully.
+          - None if turbojpeg can't decode it (decode() then uses Pillow).
         """
         with open(path, "rb") as f:
             data = f.read()
+        from turbojpeg import TJPF_RGB  # already imported by _load_accel
+        _jpeg = _load_accel("turbojpeg")
         # PyTurboJPEG header can be dict or tuple depending on version.
         hdr = _jpeg.decode_header(data)
         if isinstance(hdr, dict):
@@ -333,11 +575,12 @@ class FastImageLoader:
         denom = 1
         while denom < 8 and (w // (denom * 2) > self.W * 1.25 or h // (denom * 2) > self.H * 1.25):
             denom *= 2
+        if (w // denom) * (h // denom) > self._max_pixels():
+            raise DecodeBudgetError(f"{Path(path).name}: {w}x{h} exceeds decode budget even at 1/8 scale")
         try:
             rgb = _jpeg.decode(data, pixel_format=TJPF_RGB, scaling_factor=(1, denom))
         except Exception:
-            # If turbojpeg decode fails for any reason, defer to Pillow path.
-            return self._decode_with_pillow(Path(path))
+            return None  # decode() defers to the Pillow path
         # Some builds return a numpy array already; others return bytes.
         if isinstance(rgb, np.ndarray):
             arr = rgb
@@ -356,10 +599,13 @@ class FastImageLoader:
         return arr
 
     def _decode_with_pyvips(self, path):
-        # Shrink on read; keeps memory tiny
-        img = pyvips.Image.new_from_file(str(path), access="sequential")
-        scale = min(self.W / img.width, self.H / img.height, 1.0)
-        out = img.resize(scale) if scale < 1.0 else img
+        # Shrink on load; never holds the full-resolution raster.
+        # Orientation is applied in load_surface, so keep pixels as stored
+        # (the screen box is turned to match them).
+        out = open_vips_bounded(path, (self.W, self.H), self._max_pixels(),
+                                no_rotate=True, cover=self._cover())
+        if out.bands == 1:
+            out = out.colourspace("srgb")
         # to numpy
         mem = out.write_to_memory()
         arr = np.frombuffer(mem, dtype=np.uint8).reshape(out.height, out.width, out.bands)
@@ -367,9 +613,14 @@ class FastImageLoader:
         return arr
 
     def _decode_with_pillow(self, path):
-        im = Image.open(path)
+        # draft/reduce keep the decode under the pixel budget (panoramas, bombs)
+        cover = self._cover()
+        im = open_pillow_bounded(path, (self.W, self.H), self._max_pixels(), upright=True, cover=cover)
         im = self._apply_orientation(im)
-        im.thumbnail((self.W, self.H), Image.Resampling.BILINEAR)
+        w, h = im.size
+        s = max(self.W / w, self.H / h) if cover else min(self.W / w, self.H / h)
+        if s < 1.0:
+            im = im.resize((max(1, round(w * s)), max(1, round(h * s))), Image.Resampling.BILINEAR)
         return np.array(im.convert("RGB"))
 
     def _decode_exif_thumb(self, path):
@@ -389,7 +640,12 @@ class FastImageLoader:
         except Exception:
             return None
 
-    def load_surface(self, path):
+    def load_surface(self, path, crop=None):
+        """
+        Decode + crop + compose one slide to a display-format Surface.
+        crop is a crops.crop_key() tuple (None = full frame); it is part of the
+        cache key, so an edited crop can never serve a stale surface.
+        """
         p = Path(path)
         # key = (p, self.W, self.H, p.stat().st_mtime)
         try:
@@ -403,31 +659,47 @@ class FastImageLoader:
                 getattr(self.render.padding, "style", "blur") if self.render and self.render.padding else "blur",
                 getattr(self.render.padding, "color", "#000000") if self.render and self.render.padding else "#000000",
                 int(getattr(self.render.padding, "blur_amount", 28)) if self.render and self.render.padding else 28)
+        tier = self.tier()
+        key = key + (tier[0], crop)
         def mk():
-            # Decode (fast-paths if available)
-            orientation_tag = 1
-            if _jpeg and p.suffix.lower() in (".jpg", ".jpeg"):
-                arr = self._decode_with_turbojpeg(p)
-                # fetch EXIF orientation cheaply
-                orientation_tag = self._read_orientation_tag(p)
-                pil = Image.fromarray(arr, mode="RGB")
-            elif pyvips:
-                arr = self._decode_with_pyvips(p)
-                # EXIF for non-JPEG may be absent; try anyway
-                orientation_tag = self._read_orientation_tag(p)
-                pil = Image.fromarray(arr, mode="RGB")
-            else:
-                # pillow decode (we'll re-orient during compose)
-                arr = self._decode_with_pillow(p)
-                orientation_tag = self._read_orientation_tag(p)
-                pil = Image.fromarray(arr, mode="RGB")
+            t0 = time.perf_counter()
+            # Decode with the routed backend (calibrated per format, or fast-path default)
+            arr, backend = self.decode(self.backend_for(p), p)
+            pil = Image.fromarray(arr, mode="RGB")
+            # Pillow decode is already upright; the array backends need the EXIF tag
+            if backend != "pillow":
+                pil = self._orient(pil, self._read_orientation_tag(p))
+            if crop is not None:
+                pil = self._apply_crop(pil, crop)
+            t1 = time.perf_counter()
 
             # Compose to screen size according to render settings
-            composed = self._compose_frame(pil, orientation_tag)
-            return self._to_surface(composed)
+            composed = self._compose_frame(pil, 1, tier)
+            t2 = time.perf_counter()
+            surf = self._to_surface(composed)
+            t3 = time.perf_counter()
+            self._record_frame(t1 - t0, t2 - t1, t3 - t2)
+            with self._stats_lock:
+                self._built.pop(p, None)
+                self._built[p] = {"decode_s": t1 - t0, "compose_s": t2 - t1, "convert_s": t3 - t2,
+                                  "backend": backend, "done_at": t3}
+                if len(self._built) > 32:
+                    self._built.pop(next(iter(self._built)))
+            return surf
         return self.cache.get_put(key, mk)
 
-    def preload_neighbors(self, paths, idx):
+    def build_times(self, path) -> dict | None:
+        """Stage times of the last decode/compose/convert of path (None if never built)."""
+        with self._stats_lock:
+            rec = self._built.get(Path(path))
+            return dict(rec) if rec else None
+
+    def invalidate(self, path) -> None:
+        """Drop cached surfaces for one file (e.g. after its crop changed)."""
+        p = Path(path)
+        self.cache.drop(lambda k: k[0] == p)
+
+    def preload_neighbors(self, paths, idx, crops=None):
         for j in (idx+1, idx-1):
             if 0 <= j < len(paths):
-                self.pool.submit(self.load_surface, paths[j])
+                self.pool.submit(self.load_surface, paths[j], crops[j] if crops else None)
@@ -0,0 +1,137 @@
+# photoframe/imaging.py
+"""
+Memory-aware image decoding shared by the viewer loader and the API server.
+
+Decode cost is estimated from header dimensions (no pixels touched). Images
+that would blow the pixel budget are routed through shrink-on-load:
+  - pyvips ``thumbnail`` (streams the file, never holds the full raster)
+  - Pillow ``draft`` (JPEG DCT scaling 1/2..1/8) followed by ``reduce``
+Anything that still cannot be brought under the budget is refused with
+DecodeBudgetError instead of taking the frame into swap.
+"""
+from __future__ import annotations
+from pathlib import Path
+from PIL import Image
+
+_pyvips = False  # not looked up yet; see vips()
+
+def vips():
+    """pyvips, imported on first use (it is slow to import on a Pi); None if unavailable."""
+    global _pyvips
+    if _pyvips is False:
+        try:
+            import pyvips
+            _pyvips = pyvips
+        except Exception:
+            _pyvips = None
+    return _pyvips
+
+# Pillow's own bomb check fires on Image.open() (before we get a chance to
+# draft), so it would reject panoramas we can decode cheaply. The pixel budget
+# below replaces it.
+Image.MAX_IMAGE_PIXELS = None
+
+DEFAULT_MAX_DECODE_MP = 48.0  # megapixels held in RAM for one decode
+
+class DecodeBudgetError(ValueError):
+    """Raised when an image cannot be decoded within the pixel budget."""
+
+def budget_pixels(max_decode_mp: float | None) -> int:
+    mp = float(max_decode_mp) if max_decode_mp else DEFAULT_MAX_DECODE_MP
+    return max(1, int(mp * 1_000_000))
+
+def fit_within(w: int, h: int, max_pixels: int) -> tuple[int, int]:
+    """Largest (w, h) with the same aspect that stays under max_pixels."""
+    if w * h <= max_pixels:
+        return w, h
+    s = (max_pixels / float(w * h)) ** 0.5
+    return max(1, int(w * s)), max(1, int(h * s))
+
+# EXIF orientations that turn the picture a quarter (stored w/h are swapped)
+SWAPS_AXES = (5, 6, 7, 8)
+
+def _target_box(size: tuple[int, int], target: tuple[int | None, int | None] | None,
+                cover: bool = False) -> tuple[int, int]:
+    """
+    Resolve an optional (w, h) request into a concrete box (never upscales).
+    The box fits inside target, or with cover fills it (one side overhangs).
+    """
+    w, h = size
+    tw, th = target or (None, None)
+    if tw or th:
+        scales = [s for s in ((tw / w) if tw else None, (th / h) if th else None) if s is not None]
+        s = min(max(scales) if cover else min(scales), 1.0)
+        w, h = max(1, int(w * s)), max(1, int(h * s))
+    return w, h
+
+def exif_orientation(im: Image.Image) -> int:
+    """
+    EXIF orientation from the header only. Image.getexif() on a PNG whose
+    eXIf chunk follows the pixel data loads the whole image, budget or not.
+    """
+    raw = im.info.get("exif")
+    if not raw:
+        return 1
+    try:
+        exif = Image.Exif()
+        exif.load(raw)
+        return int(exif.get(0x0112, 1))
+    except Exception:
+        return 1
+
+def open_pillow_bounded(path: Path, target: tuple[int | None, int | None] | None,
+                        max_pixels: int, upright: bool = False, cover: bool = False) -> Image.Image:
+    """
+    Open with Pillow without ever materialising more than max_pixels.
+    The result is at least as large as the target box where the budget allows
+    (callers still do the final resize) and is *not* EXIF-transposed.
+    upright: target is as displayed, so it is turned with the file's EXIF
+    orientation before it is matched against the stored pixels.
+    """
+    im = Image.open(path)
+    w, h = im.size
+    if upright and target and exif_orientation(im) in SWAPS_AXES:
+        target = (target[1], target[0])
+    bw, bh = _target_box((w, h), target, cover)
+    # JPEG DCT scaling: shrink towards the box, then further if the budget demands it
+    d = 1
+    while d < 8 and w // (d * 2) >= bw and h // (d * 2) >= bh:
+        d *= 2
+    while d < 8 and (w // d) * (h // d) > max_pixels:
+        d *= 2
+    if d > 1:
+        try:
+            im.draft("RGB", (w // d, h // d))
+        except Exception:
+            pass
+    w, h = im.size
+    if w * h > max_pixels:
+        im.close()
+        raise DecodeBudgetError(
+            f"{Path(path).name}: {w}x{h} exceeds decode budget of {max_pixels} px")
+    # integer box-reduce down towards ~2x the box keeps the final resample cheap
+    factor = max(1, min(w // max(1, bw * 2), h // max(1, bh * 2)))
+    if factor > 1:
+        try:
+            im = im.reduce(factor)
+        except ValueError:
+            pass  # palette/bit modes have no reduce(); final resize copes
+    return im
+
+def open_vips_bounded(path: Path, target: tuple[int | None, int | None] | None,
+                      max_pixels: int, no_rotate: bool = False, cover: bool = False):
+    """
+    pyvips shrink-on-load to the target box (and the pixel budget). target
+    is as displayed; with no_rotate the pixels stay as stored, turned from it.
+    """
+    pyvips = vips()
+    hdr = pyvips.Image.new_from_file(str(path))
+    w, h = hdr.width, hdr.height
+    swap = bool(hdr.get_typeof("orientation")) and int(hdr.get("orientation")) in SWAPS_AXES
+    if swap:
+        w, h = h, w
+    bw, bh = fit_within(*_target_box((w, h), target, cover), max_pixels)
+    if swap and no_rotate:
+        bw, bh = bh, bw  # thumbnail() then measures the unrotated image
+    return pyvips.Image.thumbnail(str(path), bw, height=bh, size="down",
+                                  no_rotate=no_rotate)
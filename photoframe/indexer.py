@@ -1,6 +1,7 @@
 from pathlib import Path
-import sqlite3, time
-from .constants import DB_SCHEMA, SUPPORTED_IMAGES, SUPPORTED_VIDEOS
+from collections import OrderedDict
+import hashlib, sqlite3, time
+from .constants import DB_SCHEMA, DB_MIGRATIONS, SUPPORTED_IMAGES, SUPPORTED_VIDEOS
 from .utils import ext, is_hidden
 import os
 from watchdog.observers import Observer
@@ -18,6 +19,26 @@ IGNORE_GLOBS = [
     "*.tmp", "*.swp", "*~",
 ]
 
+def migrate(conn):
+    """Add the DB_MIGRATIONS columns an older index lacks."""
+    for table, col, decl in DB_MIGRATIONS:
+        cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        if col not in cols:
+            try:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {decl}")
+            except sqlite3.OperationalError:
+                pass  # another connection added it first
+    conn.commit()
+
+def _drop_proxies(paths):
+    """Delete display proxies (transcode.py) of edited or removed videos."""
+    for p in paths:
+        if p:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
 class Library:
     def __init__(self, db_path: Path, library_root: Path):
         self.db_path = db_path
@@ -25,11 +46,37 @@ class Library:
         self.conn = sqlite3.connect(db_path)
         self.conn.execute("PRAGMA journal_mode=WAL;")
         self.conn.executescript(DB_SCHEMA)
+        self._migrate()
+        self._listeners = []
+
+    def _migrate(self):
+        migrate(self.conn)
 
     def close(self):
         self.conn.close()
 
+    def subscribe(self, cb):
+        """
+        cb(op, mid, path, kind) with op in {"add", "update", "remove"}, called
+        after the change is committed, on the thread that made it. "update" is
+        a known file whose mtime changed (edited in place, re-synced).
+        """
+        self._listeners.append(cb)
+
+    def _emit(self, changes):
+        for op, mid, path, kind in changes:
+            for cb in list(self._listeners):
+                try:
+                    cb(op, mid, path, kind)
+                except Exception as e:
+                    print("[indexer] listener error", e)
+
     def scan_once(self, recursive=True, ignore_hidden=True):
+        known = {path: (mid, kind, proxy) for mid, path, kind, proxy in
+                 self.conn.execute("SELECT id,path,kind,proxy_path FROM media").fetchall()}
+        seen = set()
+        changes = []
+        stale = []  # proxies of edited or removed videos
         files = self.root.rglob('*') if recursive else self.root.glob('*')
         for p in files:
             if not p.is_file():
@@ -41,33 +88,58 @@ class Library:
             if not kind:
                 continue
             mtime = p.stat().st_mtime
+            seen.add(str(p))
             try:
-                self.conn.execute(
+                cur = self.conn.execute(
                     "INSERT OR IGNORE INTO media(path,kind,mtime) VALUES(?,?,?)",
                     (str(p), kind, mtime)
                 )
-                self.conn.execute(
-                    "UPDATE media SET mtime=? WHERE path=? AND mtime<>?",
+                if cur.rowcount == 1:
+                    changes.append(("add", cur.lastrowid, str(p), kind))
+                # a changed file needs its proxy re-made (and new derivative URLs)
+                cur = self.conn.execute(
+                    "UPDATE media SET mtime=?, proxy_state=NULL, proxy_path=NULL WHERE path=? AND mtime<>?",
                     (mtime, str(p), mtime)
                 )
+                if cur.rowcount and str(p) in known:
+                    mid, _, proxy = known[str(p)]
+                    stale.append(proxy)
+                    changes.append(("update", mid, str(p), kind))
             except Exception as e:
                 print("index error", p, e)
+        # rows whose file vanished (deleted via API, moved by a sync, ...)
+        gone = [(mid, path, kind) for path, (mid, kind, _) in known.items() if path not in seen]
+        if gone:
+            self.conn.executemany("DELETE FROM media WHERE id=?", [(g[0],) for g in gone])
+            changes += [("remove", mid, path, kind) for mid, path, kind in gone]
+            stale += [known[path][2] for _, path, _ in gone]
         self.conn.commit()
+        _drop_proxies(stale)
+        self._emit(changes)
+        return changes
 
     def delete_id(self, mid: int):
+        row = self.get_by_id(mid)
+        proxy = self.conn.execute("SELECT proxy_path FROM media WHERE id=?", (mid,)).fetchone()
         self.conn.execute("DELETE FROM media WHERE id=?", (mid,))
         self.conn.commit()
+        _drop_proxies([proxy[0]] if proxy else [])
+        if row:
+            self._emit([("remove", row[0], row[1], row[2])])
 
     def purge_missing(self):
-        cur = self.conn.execute("SELECT id, path FROM media")
-        to_delete = []
-        for mid, path in cur.fetchall():
+        cur = self.conn.execute("SELECT id, path, kind, proxy_path FROM media")
+        to_delete, stale = [], []
+        for mid, path, kind, proxy in cur.fetchall():
             if not os.path.exists(path):
-                to_delete.append(mid)
+                to_delete.append((mid, path, kind))
+                stale.append(proxy)
         if to_delete:
-            self.conn.executemany("DELETE FROM media WHERE id=?", [(m,) for m in to_delete])
+            self.conn.executemany("DELETE FROM media WHERE id=?", [(m[0],) for m in to_delete])
             self.conn.commit()
+            _drop_proxies(stale)
             print(f"[indexer] purged {len(to_delete)} missing files")
+            self._emit([("remove",) + m for m in to_delete])
 
     def list_ids(self, kind=None):
         cur = self.conn.cursor()
@@ -77,10 +149,48 @@ class Library:
             cur.execute("SELECT id,path,kind FROM media ORDER BY id")
         return cur.fetchall()
 
+    def iter_id_kinds(self):
+        """(id, kind) rows, streamed; enough to build a playlist without holding paths."""
+        return self.conn.execute("SELECT id,kind FROM media ORDER BY id")
+
     def get_by_id(self, mid: int):
         cur = self.conn.execute("SELECT id,path,kind FROM media WHERE id=?", (mid,))
         return cur.fetchone()
 
+    def id_for_path(self, path: str):
+        row = self.conn.execute("SELECT id FROM media WHERE path=?", (path,)).fetchone()
+        return row[0] if row else None
+
+    # ---- video proxies (see transcode.py) ----
+    def proxy_for(self, mid: int):
+        """Path of a finished display proxy for mid, or None (never a partial file)."""
+        row = self.conn.execute(
+            "SELECT proxy_path FROM media WHERE id=? AND proxy_state='ready'", (mid,)).fetchone()
+        if row and row[0] and os.path.exists(row[0]):
+            return row[0]
+        return None
+
+    def next_proxy_job(self):
+        """(id, path, mtime) of a video whose proxy has not been checked yet."""
+        return self.conn.execute(
+            "SELECT id,path,mtime FROM media WHERE kind='video' AND proxy_state IS NULL "
+            "ORDER BY id LIMIT 1").fetchone()
+
+    def set_proxy(self, mid: int, state: str, proxy_path=None, mtime=None):
+        """Record a job result; ignored if the file changed (mtime) while it ran."""
+        sql = "UPDATE media SET proxy_state=?, proxy_path=? WHERE id=?"
+        args = [state, proxy_path, mid]
+        if mtime is not None:
+            sql += " AND mtime=?"
+            args.append(mtime)
+        cur = self.conn.execute(sql, args)
+        self.conn.commit()
+        return cur.rowcount == 1
+
+    def proxy_paths(self):
+        return {r[0] for r in self.conn.execute(
+            "SELECT proxy_path FROM media WHERE proxy_path IS NOT NULL")}
+
     def next_id(self, mid: int, loop=True):
         cur = self.conn.execute("SELECT id FROM media WHERE id>? ORDER BY id LIMIT 1", (mid,))
         row = cur.fetchone()
@@ -91,6 +201,159 @@ class Library:
             return row[0] if row else None
         return None
 
+class IndexWorker:
+    """
+    Runs scan_once() off the render thread, on its own thread and Library
+    connection. A scan starts when `flag` is set (the watcher's flag, or
+    request_scan()); changes reach subscribers as the usual
+    cb(op, mid, path, kind) calls, on the worker thread, so the viewer only
+    queues them and applies them between slides.
+    """
+    def __init__(self, db_path: Path, library_root: Path, recursive=True, ignore_hidden=True,
+                 flag: "threading.Event | None" = None):
+        self.db_path = db_path
+        self.root = library_root
+        self.recursive = recursive
+        self.ignore_hidden = ignore_hidden
+        self.flag = flag or threading.Event()
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.scans = 0
+        self.last_scan_s = 0.0
+        self.last_changes = 0
+        self.scanning = False
+
+    def subscribe(self, cb):
+        """cb(op, mid, path, kind), called on the worker thread after each commit."""
+        self._listeners.append(cb)
+
+    def _emit(self, op, mid, path, kind):
+        for cb in list(self._listeners):
+            cb(op, mid, path, kind)  # Library._emit already logs listener errors
+
+    def request_scan(self):
+        self.flag.set()
+
+    def start(self) -> "IndexWorker":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="indexer")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.flag.set()
+
+    def _run(self):
+        lib = Library(self.db_path, self.root)
+        lib.subscribe(self._emit)
+        try:
+            while True:
+                self.flag.wait()
+                if self._stop.is_set():
+                    return
+                # clear first: changes landing during the scan trigger another one
+                self.flag.clear()
+                self.scanning = True
+                t0 = time.monotonic()
+                try:
+                    changes = lib.scan_once(recursive=self.recursive, ignore_hidden=self.ignore_hidden)
+                    self.last_changes = len(changes)
+                except Exception as e:
+                    print("[indexer] scan failed", e)
+                finally:
+                    self.scanning = False
+                self.scans += 1
+                self.last_scan_s = round(time.monotonic() - t0, 3)
+                if self.last_changes:
+                    print(f"[indexer] scan: {self.last_changes} changes in {self.last_scan_s}s")
+        finally:
+            lib.close()
+
+    def stats(self):
+        return {"scans": self.scans, "scanning": self.scanning,
+                "last_scan_s": self.last_scan_s, "last_changes": self.last_changes}
+
+# files up to this size are hashed whole; bigger ones (videos) by size + three samples
+HASH_FULL_MAX = 64 << 20
+HASH_SAMPLE = 4 << 20
+
+def file_digest(path, size: int) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        if size <= HASH_FULL_MAX:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        else:
+            h.update(str(size).encode())
+            for off in (0, size // 2 - HASH_SAMPLE // 2, size - HASH_SAMPLE):
+                f.seek(off)
+                h.update(f.read(HASH_SAMPLE))
+    return h.hexdigest()
+
+class ContentHashes:
+    """
+    Content hash of library files, the key of the API's derivative cache (so
+    a renamed, moved or duplicated photo reuses its thumbnails). Stored in the
+    media row with the mtime/size it was taken at and recomputed when those
+    change; files without a row yet (fresh uploads) are only memoized.
+    Thread-safe: used from the event loop, render and prewarm threads.
+    """
+    MEMO = 8192
+
+    def __init__(self, db_path: Path):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.executescript(DB_SCHEMA)
+        migrate(self.conn)
+        self._lock = threading.Lock()
+        self._memo: OrderedDict = OrderedDict()
+        self.stats = {"hashed": 0, "hashed_bytes": 0}
+
+    @staticmethod
+    def _stamp(st) -> str:
+        return f"{st.st_mtime_ns}-{st.st_size}"
+
+    def cached(self, path: Path, st=None) -> str | None:
+        """The hash if it is known for the file as it is now; never reads the file."""
+        st = st or os.stat(path)
+        key = (str(path), self._stamp(st))
+        with self._lock:
+            h = self._memo.get(key)
+            if h is not None:
+                self._memo.move_to_end(key)
+                return h
+            row = self.conn.execute("SELECT content_hash, hash_stamp FROM media WHERE path=?",
+                                    (key[0],)).fetchone()
+        if row and row[0] and row[1] == key[1]:
+            self._remember(key, row[0])
+            return row[0]
+        return None
+
+    def get(self, path: Path, st=None) -> str:
+        """The hash, reading the file if needed (keep off the event loop)."""
+        st = st or os.stat(path)
+        h = self.cached(path, st)
+        if h is not None:
+            return h
+        h = file_digest(path, st.st_size)
+        key = (str(path), self._stamp(st))
+        with self._lock:
+            self.conn.execute("UPDATE media SET content_hash=?, hash_stamp=? WHERE path=?", (h, key[1], key[0]))
+            self.conn.commit()
+            self.stats["hashed"] += 1
+            self.stats["hashed_bytes"] += min(st.st_size, HASH_FULL_MAX)
+        self._remember(key, h)
+        return h
+
+    def _remember(self, key, h: str) -> None:
+        with self._lock:
+            self._memo[key] = h
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.MEMO:
+                self._memo.popitem(last=False)
+
 class _SignalHandler(FileSystemEventHandler):
     """
     Watchdog handler that:
@@ -147,7 +410,7 @@ class _SignalHandler(FileSystemEventHandler):
 
     def _arm_flag(self):
         try:
-            self.flag.set()   # viewer thread will do scan_once()
+            self.flag.set()   # IndexWorker (or whoever polls the flag) runs scan_once()
         finally:
             with self._lock:
                 self._scheduled = False
@@ -156,8 +419,8 @@ class _SignalHandler(FileSystemEventHandler):
 def start_watcher(path: Path, recursive: bool = True):
     """
     Start a background observer and return (observer, event_flag).
-    The caller should poll `event_flag.is_set()` from the main/viewer thread,
-    run lib.scan_once(), then `event_flag.clear()`.
+    Hand event_flag to an IndexWorker, which rescans whenever it is set (or
+    poll `event_flag.is_set()`, run lib.scan_once(), then `event_flag.clear()`).
     """
     flag = threading.Event()
     handler = _SignalHandler(flag, debounce_s=1.0)
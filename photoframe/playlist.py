@@ -0,0 +1,422 @@
+# photoframe/playlist.py
+"""
+Flags-aware slideshow order, maintained incrementally.
+
+The viewer used to re-query, re-filter and re-shuffle the whole library after
+every slide. Playlist is built once and then fed deltas (add / remove / flag
+change) from the indexer and the API, so advancing one slide is O(1) and the
+order - shuffled or not - stays stable while the library changes under it.
+
+Shuffle is a stored, seeded permutation walked by a cursor (next/prev are
+O(1)). New items are dropped into a random *future* slot with one swap
+(inside-out Fisher-Yates), so nothing already queued moves and nothing is
+reshuffled; a fresh permutation is drawn only when a full pass wraps. The
+permutation, seed, pass number and cursor survive reboots via snapshot() /
+order_bytes() / restore().
+
+Storage is flat and keyed by the integer media id: the order is an int64
+array, the id -> slot index an int32 array addressed by id, and the kind a
+bitmap. No paths are held; the row about to be shown (or prefetched) is read
+back from the Library, so a 200k item library costs a few MB instead of tens.
+"""
+from __future__ import annotations
+import os
+import random
+import threading
+from array import array
+from pathlib import Path
+from typing import Iterable, Protocol
+from urllib.parse import quote, unquote
+
+Row = tuple[int, str, str]  # (id, path, kind)
+
+_GONE = -1          # tombstone left in the order by remove()
+_COMPACT_MIN = 64   # don't bother compacting tiny playlists
+
+class RowSource(Protocol):
+    """What the playlist needs from the index (indexer.Library fits)."""
+    root: Path
+    def get_by_id(self, mid: int) -> Row | None: ...
+    def id_for_path(self, path: str) -> int | None: ...
+
+class Playlist:
+    def __init__(self, source: RowSource, shuffle: bool = False, loop: bool = True,
+                 seed: int | None = None):
+        self.source = source
+        self.lib_root = Path(source.root)
+        self._prefix = str(self.lib_root) + os.sep
+        self.shuffle = bool(shuffle)
+        self.loop = bool(loop)
+        self._lock = threading.RLock()
+        self._order = array("q")        # ids in play order (or _GONE)
+        self._pos = array("i")          # id -> index in _order, -1 if absent
+        self._video = bytearray()       # kind bitmap by id: bit set = video
+        self._count = 0
+        self._dead = 0
+        self._cursor = -1
+        # flags: whitelist (if any) and exclusions, keyed by server item id ...
+        self._include: set[str] = set()
+        self._exclude: set[str] = set()
+        # ... and the same resolved to media ids (only flagged items, usually few)
+        self._include_ids: set[int] = set()
+        self._exclude_ids: set[int] = set()
+        # shuffle engine: seed + pass number fully determine each fresh permutation
+        self.seed = int(seed) if seed is not None else random.SystemRandom().getrandbits(32)
+        self.cycle = 0
+        self._rng = random.Random(self.seed)     # future-slot picks for inserts
+        self.order_dirty = True                  # order changed since last order_bytes()
+
+    def item_id(self, path: str) -> str:
+        # exact same id scheme as the server
+        rel = path[len(self._prefix):] if path.startswith(self._prefix) else os.path.relpath(path, self.lib_root)
+        return quote(rel, safe="/-._~")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def nbytes(self) -> int:
+        """Approximate size of the per-item storage."""
+        with self._lock:
+            return (self._order.itemsize * len(self._order) + self._pos.itemsize * len(self._pos)
+                    + len(self._video))
+
+    # ---- id-addressed storage ----
+    def _slot(self, mid: int) -> int:
+        return self._pos[mid] if 0 <= mid < len(self._pos) else -1
+
+    def _grow(self, mid: int) -> None:
+        n = len(self._pos)
+        if mid >= n:
+            extra = max(mid + 1, n + max(1024, n >> 3)) - n
+            self._pos.extend(array("i", [-1]) * extra)
+            need = (n + extra + 7) >> 3
+            self._video.extend(bytes(need - len(self._video)))
+
+    def _set_kind(self, mid: int, kind: str) -> None:
+        if kind == "video":
+            self._video[mid >> 3] |= 1 << (mid & 7)
+        else:
+            self._video[mid >> 3] &= ~(1 << (mid & 7)) & 0xFF
+
+    def is_video(self, mid: int) -> bool:
+        return 0 <= mid < len(self._pos) and bool(self._video[mid >> 3] & (1 << (mid & 7)))
+
+    def _index(self) -> None:
+        """Rebuild id -> slot from _order."""
+        pos = self._pos
+        for i in range(len(pos)):
+            pos[i] = -1
+        for i, mid in enumerate(self._order):
+            if mid != _GONE:
+                pos[mid] = i
+
+    def _lookup(self, item_id: str) -> int | None:
+        try:
+            return self.source.id_for_path(str(self.lib_root / unquote(item_id)))
+        except Exception:
+            return None
+
+    # ---- building ----
+    def reset(self, rows: Iterable[tuple], meta: dict | None = None) -> None:
+        """
+        Full (re)build, e.g. at startup, from (id, kind) or (id, path, kind)
+        rows. Keeps the cursor on the current item if it survives.
+        """
+        with self._lock:
+            cur = self.current_id()
+            ids = array("q")
+            kinds = []
+            for r in rows:
+                ids.append(int(r[0]))
+                if r[-1] == "video":
+                    kinds.append(int(r[0]))
+            self._pos = array("i")
+            self._video = bytearray()
+            if ids:
+                self._grow(max(ids))
+            for mid in kinds:
+                self._set_kind(mid, "video")
+            self._order = ids
+            self._count = len(ids)
+            if meta is not None:
+                self.set_meta(meta)
+            self._reorder(cur)
+
+    def _reorder(self, keep_id: int | None) -> None:
+        order = array("q", sorted(mid for mid in self._order if mid != _GONE))
+        if self.shuffle:
+            random.Random(self.seed * 1_000_003 + self.cycle).shuffle(order)
+        self._order = order
+        self._index()
+        self._dead = 0
+        self._cursor = self._slot(keep_id) if keep_id is not None else -1
+        self.order_dirty = True
+
+    def _new_cycle(self) -> None:
+        """A full shuffled pass wrapped: draw the next permutation (amortized O(1) per slide)."""
+        last = self.current_id()
+        self.cycle += 1
+        self._reorder(None)
+        # don't show the same item twice in a row across the seam
+        if last is not None and len(self._order) > 1 and self._order[0] == last:
+            j = self._rng.randrange(1, len(self._order))
+            self._swap(0, j)
+
+    def _swap(self, i: int, j: int) -> None:
+        a, b = self._order[i], self._order[j]
+        self._order[i], self._order[j] = b, a
+        if a != _GONE: self._pos[a] = j
+        if b != _GONE: self._pos[b] = i
+
+    def set_shuffle(self, on: bool) -> None:
+        with self._lock:
+            if bool(on) != self.shuffle:
+                self.shuffle = bool(on)
+                self._reorder(self.current_id())
+
+    def set_meta(self, meta: dict) -> None:
+        """Replace all flags from a .meta.json style dict {item_id: flags}."""
+        with self._lock:
+            self._include.clear()
+            self._exclude.clear()
+            self._include_ids.clear()
+            self._exclude_ids.clear()
+            for item_id, flags in (meta or {}).items():
+                if isinstance(flags, dict):
+                    self._apply_flags(item_id, flags)
+
+    def set_flags(self, item_id: str, flags: dict | None) -> None:
+        """Flag change for one item; resolves it through the source, so call on its thread."""
+        with self._lock:
+            self._include.discard(item_id)
+            self._exclude.discard(item_id)
+            mid = self._lookup(item_id)
+            if mid is not None:
+                self._include_ids.discard(mid)
+                self._exclude_ids.discard(mid)
+            self._apply_flags(item_id, flags or {}, mid)
+
+    def _apply_flags(self, item_id: str, flags: dict, mid: int | None = -1) -> None:
+        inc = flags.get("include") is True
+        exc = (flags.get("include") is False or flags.get("exclude_from_slideshow") is True
+               or flags.get("exclude_from_shuffle") is True)
+        if not (inc or exc):
+            return
+        if mid == -1:
+            mid = self._lookup(item_id)
+        if inc:
+            self._include.add(item_id)
+            if mid is not None: self._include_ids.add(mid)
+        if exc:
+            self._exclude.add(item_id)
+            if mid is not None: self._exclude_ids.add(mid)
+
+    def add(self, mid: int, path: str, kind: str) -> None:
+        """
+        Existing items keep their slot. A new item is appended; in shuffle mode
+        it then swaps with a random slot still ahead of the cursor, so it shows
+        up somewhere in the rest of this pass rather than always last.
+        """
+        mid = int(mid)
+        with self._lock:
+            self._grow(mid)
+            self._set_kind(mid, kind)
+            # flags may predate the file (e.g. re-uploaded under the same name)
+            if self._include or self._exclude:
+                iid = self.item_id(str(path))
+                if iid in self._include: self._include_ids.add(mid)
+                if iid in self._exclude: self._exclude_ids.add(mid)
+            if self._pos[mid] >= 0:
+                return
+            self._insert(mid)
+            self._count += 1
+            self.order_dirty = True
+
+    def _insert(self, mid: int) -> None:
+        n = len(self._order)
+        self._pos[mid] = n
+        self._order.append(mid)
+        if self.shuffle:
+            lo = self._cursor + 1
+            if lo < n:
+                self._swap(n, self._rng.randrange(lo, n + 1))
+
+    def remove(self, mid: int) -> None:
+        mid = int(mid)
+        with self._lock:
+            i = self._slot(mid)
+            if i < 0:
+                return
+            self._pos[mid] = -1
+            self._include_ids.discard(mid)
+            self._exclude_ids.discard(mid)
+            self._order[i] = _GONE
+            self._count -= 1
+            self._dead += 1
+            if self._dead >= _COMPACT_MIN and self._dead * 2 > len(self._order):
+                self._compact()
+                self.order_dirty = True
+
+    def _compact(self) -> None:
+        live_before = sum(1 for mid in self._order[:self._cursor + 1] if mid != _GONE)
+        self._order = array("q", (mid for mid in self._order if mid != _GONE))
+        self._index()
+        self._dead = 0
+        self._cursor = live_before - 1
+
+    # ---- walking ----
+    def eligible(self, mid: int) -> bool:
+        if self._slot(mid) < 0:
+            return False
+        if self._include and mid not in self._include_ids:
+            return False
+        return mid not in self._exclude_ids
+
+    def _row(self, mid: int) -> Row | None:
+        """Read the row back from the source; None if it vanished from the index."""
+        row = self.source.get_by_id(mid)
+        return (int(row[0]), str(row[1]), str(row[2])) if row else None
+
+    def _take(self, hits) -> Row | None:
+        """Move the cursor to the first hit that still resolves; drop stale ids on the way."""
+        stale = []
+        found = None
+        for i, mid in hits:
+            found = self._row(mid)
+            if found is not None:
+                self._cursor = i
+                break
+            stale.append(mid)
+        for mid in stale:
+            self.remove(mid)
+        return found
+
+    def current_id(self) -> int | None:
+        with self._lock:
+            if 0 <= self._cursor < len(self._order):
+                mid = self._order[self._cursor]
+                return mid if mid != _GONE else None
+            return None
+
+    def current(self) -> Row | None:
+        """Row under the cursor if it is still present and eligible."""
+        with self._lock:
+            mid = self.current_id()
+            return self._row(mid) if mid is not None and self.eligible(mid) else None
+
+    def seek(self, mid: int | None) -> bool:
+        with self._lock:
+            i = self._slot(int(mid)) if mid is not None else -1
+            if i < 0:
+                return False
+            self._cursor = i
+            return True
+
+    def rewind(self) -> None:
+        with self._lock:
+            self._cursor = -1
+
+    def _scan(self, start: int, step: int, count: int, wrap: bool | None = None):
+        """Yield (index, id) of eligible slots from start, wrapping if looping."""
+        wrap = self.loop if wrap is None else wrap
+        n = len(self._order)
+        i = start
+        for _ in range(n):
+            i += step
+            if i >= n or i < 0:
+                if not wrap:
+                    return
+                i %= n
+            mid = self._order[i]
+            if mid != _GONE and self.eligible(mid):
+                yield i, mid
+                count -= 1
+                if count <= 0:
+                    return
+
+    def advance(self) -> Row | None:
+        """Move to the next eligible item; None at the end (no loop) or if nothing is eligible."""
+        with self._lock:
+            row = self._take(self._scan(self._cursor, 1, self._count, wrap=False))
+            if row is not None:
+                return row
+            # end of pass
+            if not self.loop or not self._count:
+                return None
+            if self.shuffle:
+                self._new_cycle()
+            self._cursor = -1
+            return self._take(self._scan(-1, 1, self._count, wrap=False))
+
+    def prev(self) -> Row | None:
+        """Step back to the previous eligible item of the current order (no reshuffle)."""
+        with self._lock:
+            return self._take(self._scan(self._cursor, -1, self._count))
+
+    def upcoming(self, n: int = 1, kind: str | None = None) -> list[Row]:
+        """
+        The next n eligible rows after the cursor, without moving (for
+        prefetch). kind filters on the bitmap before anything is read back.
+        """
+        with self._lock:
+            # a shuffled pass ends in a fresh permutation, so don't peek across the seam
+            wrap = self.loop and not self.shuffle
+            cur = self.current_id()
+            out = []
+            for _, mid in self._scan(self._cursor, 1, n, wrap=wrap):
+                if mid == cur or (kind is not None and self.is_video(mid) != (kind == "video")):
+                    continue
+                row = self._row(mid)
+                if row is not None:
+                    out.append(row)
+            return out
+
+    # ---- persistence ----
+    def snapshot(self) -> dict:
+        """Small, frequently-saved part of the shuffle state (see order_bytes for the order)."""
+        with self._lock:
+            return {"seed": self.seed, "cycle": self.cycle, "shuffle": self.shuffle,
+                    "cursor_id": self.current_id(), "size": self._count}
+
+    def order_bytes(self) -> bytes:
+        """The live order as packed int64 ids; clears order_dirty."""
+        with self._lock:
+            self.order_dirty = False
+            if not self._dead:
+                return self._order.tobytes()
+            return array("q", (mid for mid in self._order if mid != _GONE)).tobytes()
+
+    def restore(self, snap: dict | None, order: bytes | None) -> bool:
+        """
+        Re-adopt a saved permutation after reset(): ids that no longer exist are
+        dropped, ids added while we were off go into random future slots.
+        """
+        if not snap or not order or not self.shuffle or not snap.get("shuffle"):
+            return False
+        with self._lock:
+            saved = array("q")
+            try:
+                saved.frombytes(order)
+            except ValueError:
+                return False
+            self.seed = int(snap.get("seed", self.seed))
+            self.cycle = int(snap.get("cycle", 0))
+            self._rng = random.Random(self.seed + self.cycle)
+            live = self._pos
+            seen = bytearray(len(live))
+            kept = array("q")
+            for mid in saved:
+                if 0 <= mid < len(live) and live[mid] >= 0 and not seen[mid]:
+                    seen[mid] = 1
+                    kept.append(mid)
+            added = [mid for mid in range(len(live)) if live[mid] >= 0 and not seen[mid]]
+            self._order = kept
+            self._index()
+            self._dead = 0
+            cur = snap.get("cursor_id")
+            self._cursor = self._slot(int(cur)) if cur is not None else -1
+            for mid in added:
+                self._insert(mid)
+            self.order_dirty = len(kept) != len(saved) or bool(added)
+            return True
@@ -0,0 +1,74 @@
+# photoframe/posters.py
+"""
+Poster-frame thumbnails for videos, for the API's /thumb endpoint.
+
+PosterPool extracts one keyframe per (clip content, width) with ffmpeg (see
+video.extract_poster) on a small bounded thread pool, so a grid full of new
+videos queues a few ffmpeg processes instead of forking one per request.
+Concurrent requests for the same poster share one job, finished posters live
+in the derivative cache next to the image variants, and a clip ffmpeg cannot
+read is remembered so it is not retried on every request (the caller serves
+a placeholder instead).
+"""
+from __future__ import annotations
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from .video import extract_poster
+
+# skip the usual fade-in; clips shorter than this fall back to the first keyframe
+POSTER_AT_S = 1.0
+
+class PosterPool:
+    def __init__(self, ffmpeg_bin: str = "ffmpeg", workers: int = 2, timeout_s: float = 20.0):
+        self.ffmpeg_bin = ffmpeg_bin
+        self.timeout_s = timeout_s
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="poster")
+        self._lock = threading.Lock()
+        self._inflight: dict[Path, Future] = {}
+        self._failed: set[Path] = set()
+        self.stats = {"made": 0, "cached": 0, "failed": 0, "shared": 0}
+
+    def get(self, src: Path, dst: Path, width: int) -> Future:
+        """Future resolving to dst, or to None if no poster can be made for src."""
+        dst = Path(dst)
+        with self._lock:
+            fut = self._inflight.get(dst)
+            if fut is not None:
+                self.stats["shared"] += 1
+                return fut
+            fut = Future()
+            if dst.exists():
+                self.stats["cached"] += 1
+                fut.set_result(dst)
+                return fut
+            if dst in self._failed:
+                fut.set_result(None)
+                return fut
+            fut = self._pool.submit(self._make, Path(src), dst, int(width))
+            self._inflight[dst] = fut
+        fut.add_done_callback(lambda _f, dst=dst: self._done(dst))
+        return fut
+
+    def _done(self, dst: Path) -> None:
+        with self._lock:
+            self._inflight.pop(dst, None)
+
+    def _make(self, src: Path, dst: Path, width: int) -> Path | None:
+        box = (width, width)
+        for at_s in (POSTER_AT_S, 0.0):
+            try:
+                extract_poster(self.ffmpeg_bin, src, dst, box, at_s=at_s, timeout_s=self.timeout_s)
+                self.stats["made"] += 1
+                return dst
+            except Exception as e:
+                err = e
+        print(f"[posters] no poster for {src.name}: {err}")
+        with self._lock:
+            self._failed.add(dst)  # keyed by content hash: an edited clip gets another try
+        self.stats["failed"] += 1
+        return None
+
+    def report(self) -> dict:
+        with self._lock:
+            return dict(self.stats, inflight=len(self._inflight), known_bad=len(self._failed))
@@ -0,0 +1,129 @@
+# photoframe/prewarm.py
+"""
+Eager derivative generation, so the first grid view after a sync and the
+first pass after a crop edit are cache hits instead of renders.
+
+DerivativeWarmer listens to the change log (changelog.ChangeLog.subscribe):
+indexer adds, uploads and crop edits all land there with a new "v", and each
+queues its item. A single low-priority thread then calls job(item_id) (the
+API's server.prewarm: standard thumbnail + screen-size render, or a poster
+for clips), one item at a time, waiting while the viewer is mid-transition.
+
+Nothing is persisted: on start the worker queues the whole library, newest
+first, and job() skips derivatives that already exist, so work cut short by
+a restart is picked up again and finished work costs a stat or two.
+"""
+from __future__ import annotations
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable
+from .changelog import MEDIA_DIRS, item_id_for
+from .constants import SUPPORTED_IMAGES, SUPPORTED_VIDEOS
+from .utils import ext, is_hidden
+
+# niceness of the worker thread (Linux schedules threads individually)
+NICE = 10
+
+class DerivativeWarmer:
+    def __init__(self, library_root: Path, idle: threading.Event | None = None, pause_s: float = 0.05):
+        self.root = Path(library_root)
+        self.idle = idle          # set while the viewer is not in a transition
+        self.pause_s = pause_s    # breather between items
+        self._lock = threading.Lock()
+        self._queue: deque[str] = deque()
+        self._queued: set[str] = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._job: Callable[[str], int] | None = None
+        self.current: str | None = None
+        self.stats = {"items": 0, "made": 0, "failed": 0, "swept": 0}
+
+    def enqueue(self, item_id: str, front: bool = False) -> None:
+        with self._lock:
+            if item_id in self._queued:
+                return
+            self._queued.add(item_id)
+            if front:
+                self._queue.appendleft(item_id)
+            else:
+                self._queue.append(item_id)
+        self._wake.set()
+
+    def on_change(self, entry: dict) -> None:
+        # ChangeLog listener: new files and crop edits carry a new version
+        if entry.get("op") in ("add", "update") and "v" in entry:
+            self.enqueue(entry["id"], front=True)
+
+    def start(self, job: Callable[[str], int]) -> "DerivativeWarmer":
+        """job(item_id) makes what is missing and returns how many derivatives it made."""
+        if self._thread is None:
+            self._job = job
+            self._thread = threading.Thread(target=self._run, daemon=True, name="prewarm")
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _next(self) -> str | None:
+        with self._lock:
+            if not self._queue:
+                return None
+            item_id = self._queue.popleft()
+            self._queued.discard(item_id)
+            return item_id
+
+    def _run(self) -> None:
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), NICE)
+        except (AttributeError, OSError):
+            pass
+        self._sweep()
+        while not self._stop.is_set():
+            item_id = self._next()
+            if item_id is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            if self.idle is not None:
+                self.idle.wait()
+            self.current = item_id
+            try:
+                self.stats["made"] += self._job(item_id)
+                self.stats["items"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"[prewarm] {item_id}: {e}")
+            finally:
+                self.current = None
+            self._stop.wait(self.pause_s)
+
+    def _sweep(self) -> None:
+        """Queue every library item, newest first (the app's grid order)."""
+        found = []
+        for sub in MEDIA_DIRS:
+            for r, dirs, files in os.walk(self.root / sub):
+                for f in files:
+                    p = Path(r) / f
+                    if is_hidden(p.relative_to(self.root)) or ext(p) not in SUPPORTED_IMAGES | SUPPORTED_VIDEOS:
+                        continue
+                    try:
+                        found.append((p.stat().st_mtime, p))
+                    except OSError:
+                        continue
+        found.sort(key=lambda x: x[0], reverse=True)
+        for _, p in found:
+            item_id = item_id_for(self.root, p)
+            if item_id is not None:
+                self.enqueue(item_id)
+        self.stats["swept"] = len(found)
+
+    def report(self) -> dict:
+        with self._lock:
+            queued = len(self._queue)
+        return dict(self.stats, queued=queued, current=self.current,
+                    paused=self.idle is not None and not self.idle.is_set())
@@ -0,0 +1,84 @@
+# photoframe/renderpool.py
+"""
+Bounded worker pool for the API's derivative rendering (/thumb, /render).
+
+Decode, crop, resize and JPEG encode are blocking; run inside the async
+handlers they stall the event loop, so one big thumbnail delays every other
+request (/library/rev included). RenderPool runs them on a few threads
+instead: libvips and Pillow release the GIL while they decode and resample,
+and threads share the in-process crop store and caches, which processes
+would not.
+
+Jobs are keyed by their output file. A second request for a derivative that
+is already being made waits for the same job. Past max_queue jobs in flight,
+submit() raises Busy and the handler answers 503 with Retry-After, so a grid
+burst queues a bounded amount of work instead of an unbounded backlog.
+"""
+from __future__ import annotations
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+class Busy(RuntimeError):
+    def __init__(self, retry_after_s: int):
+        super().__init__(f"render queue full, retry in {retry_after_s}s")
+        self.retry_after_s = retry_after_s
+
+class RenderPool:
+    def __init__(self, workers: int = 2, max_queue: int = 64):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+        self._lock = threading.Lock()
+        self._inflight: dict[Path, Future] = {}
+        self._job_s: deque[float] = deque(maxlen=128)
+        self.stats = {"rendered": 0, "shared": 0, "rejected": 0, "failed": 0}
+
+    def submit(self, key: Path, fn: Callable[..., Path], *args, **kwargs) -> Future:
+        """Future of fn(*args) (its output path); raises Busy when the queue is full."""
+        key = Path(key)
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.stats["shared"] += 1
+                return fut
+            if len(self._inflight) >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise Busy(self._retry_after())
+            fut = self._pool.submit(self._run, fn, args, kwargs)
+            self._inflight[key] = fut
+        fut.add_done_callback(lambda _f, key=key: self._done(key))
+        return fut
+
+    def _run(self, fn, args, kwargs):
+        t0 = time.perf_counter()
+        try:
+            out = fn(*args, **kwargs)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        dt = time.perf_counter() - t0
+        with self._lock:
+            self._job_s.append(dt)
+            self.stats["rendered"] += 1
+        return out
+
+    def _done(self, key: Path) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _retry_after(self) -> int:
+        # roughly how long the current backlog takes to drain
+        avg = (sum(self._job_s) / len(self._job_s)) if self._job_s else 0.5
+        return max(1, math.ceil(len(self._inflight) * avg / self.workers))
+
+    def report(self) -> dict:
+        with self._lock:
+            jobs = sorted(self._job_s)
+            p = (lambda q: round(jobs[min(len(jobs) - 1, int(q * len(jobs)))] * 1000.0, 1)) if jobs else (lambda q: 0.0)
+            return dict(self.stats, queued=len(self._inflight), workers=self.workers,
+                        max_queue=self.max_queue, job_p50_ms=p(0.5), job_p99_ms=p(0.99))
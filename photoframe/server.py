@@ -1,6 +1,6 @@
 # photoframe/server.py
-from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Depends, Query
-from fastapi.responses import JSONResponse, FileResponse 
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 import shutil
@@ -8,6 +8,17 @@ from typing import Any, Dict, Callable, List
 import yaml
 import threading
 from .config import AppCfg
+from . import stats
+from .bus import RuntimeBus, runtime_bus, library_bus, playback_bus
+from .changelog import ChangeLog, change_log, item_version
+from .crops import CropStore, crop_store
+from .derivcache import DerivativeCache, derivative_cache, derivatives_dir
+from .events import EventHub, HubFull, sse
+from .indexer import ContentHashes
+from .imaging import (SWAPS_AXES, DecodeBudgetError, budget_pixels, exif_orientation, fit_within,
+                      open_pillow_bounded)
+from .posters import PosterPool
+from .renderpool import Busy, RenderPool
 from fastapi import Path as FPath
 from fastapi.responses import Response
 from typing import Optional
@@ -20,6 +31,8 @@ from datetime import datetime
 from PIL import Image, ImageDraw, ExifTags
 from urllib.parse import quote, unquote
 import hashlib
+import asyncio
+import functools
 from pydantic import BaseModel, Field
 
 try:
@@ -31,8 +44,15 @@ except Exception:
 _IMG_EXT = { "jpg","jpeg","png","webp","bmp","heic","heif","dng","tif","tiff","avif" }
 _VID_EXT = { "mp4","mov","m4v","avi","mkv","webm","hevc","heif","heifv" }  # extend as you like
 
-_LIB_REV = 1
-_REV_LOCK = threading.RLock()
+# the change log's rev survives restarts, but files edited in place while we were
+# down don't move it; this keeps ETags from a previous run from matching
+_BOOT_TAG = hashlib.sha1(f"{os.getpid()}-{os.urandom(8).hex()}".encode()).hexdigest()[:8]
+
+# Listings and metadata: always revalidate (a 304 is headers only).
+# Derivatives requested with the item's current ?v= token can be kept for good,
+# since any change to the source or its crop changes the token.
+_CC_REVALIDATE = "private, no-cache"
+_CC_IMMUTABLE = "private, max-age=31536000, immutable"
 
 class CropSpec(BaseModel):
     # normalized [0..1] in *post-EXIF* upright coordinates
@@ -46,57 +66,80 @@ class CropSpec(BaseModel):
 
 # --- Crops cache + store ---
 def _cache_dir() -> Path:
-    d = _lib_root() / ".cache" / "derivatives"
+    d = derivatives_dir(_lib_root())
     d.mkdir(parents=True, exist_ok=True)
     return d
 
-class _CropStore:
-    """Thread-safe JSON dict id -> CropSpec."""
-    def __init__(self, root: Path):
-        self._path = root / ".crops.json"
-        self._lock = threading.RLock()
-        self._data: dict[str, dict] = {}
-        if self._path.exists():
-            try:
-                self._data = json.loads(self._path.read_text())
-            except Exception:
-                self._data = {}
-
-    def _save(self):
-        tmp = self._path.with_suffix(".tmp")
-        tmp.write_text(json.dumps(self._data, separators=(",", ":")))
-        tmp.replace(self._path)
-
-    def get(self, id_: str) -> CropSpec | None:
-        with self._lock:
-            rec = self._data.get(id_)
-        return CropSpec(**rec) if rec else None
-
-    def put(self, id_: str, spec: CropSpec):
-        with self._lock:
-            self._data[id_] = spec.model_dump()
-            self._save()
-
-    def delete(self, id_: str):
-        with self._lock:
-            if id_ in self._data:
-                del self._data[id_]
-                self._save()
-
-# instantiate lazily after cfg is injected; see _ensure_crops()
-_crops: _CropStore | None = None
-
-def _ensure_crops() -> _CropStore:
-    global _crops
-    if _crops is None:
-        _crops = _CropStore(_lib_root())
-    return _crops
-
-
-def _bump_rev():
-    global _LIB_REV
-    with _REV_LOCK:
-        _LIB_REV += 1
+_DCACHE: DerivativeCache | None = None
+_DCACHE_LOCK = threading.Lock()
+
+def _dcache() -> DerivativeCache:
+    global _DCACHE
+    with _DCACHE_LOCK:
+        if _DCACHE is None:
+            # nothing is purged on delete or crop edit: derivatives are keyed by content,
+            # so a moved or duplicated file still uses them; stale ones age out
+            # shared with the viewer's clip posters (one budget for the directory)
+            dc = derivative_cache(_cache_dir(), cfg.server.derivative_cache_mb << 20)
+            stats.register("derivatives", dc.report)
+            _DCACHE = dc
+        return _DCACHE
+
+# Sizes clients may ask for. /thumb widths snap up to the next allowed one,
+# /render boxes to multiples of _RENDER_STEP, so arbitrary ?w= values can't
+# multiply the variants kept per item.
+THUMB_WIDTHS = (120, 240, 360, 480, 720, 1080)
+_RENDER_STEP = 128
+_RENDER_MAX = 4096
+
+def _thumb_width(w: int | None) -> int:
+    w = int(w or 360)
+    return next((t for t in THUMB_WIDTHS if t >= w), THUMB_WIDTHS[-1])
+
+def _render_dim(d: int | None) -> int | None:
+    if not d:
+        return None
+    return min(_RENDER_MAX, -(-int(d) // _RENDER_STEP) * _RENDER_STEP)
+
+def _ensure_crops() -> CropStore:
+    # shared with the viewer (same process), see crops.crop_store()
+    return crop_store(_lib_root())
+
+def _crop_spec(item_id: str) -> CropSpec:
+    rec = _ensure_crops().get(item_id)
+    return CropSpec(**rec) if rec else CropSpec()
+
+def _changes() -> ChangeLog:
+    # shared with the indexer listeners set up in __main__, see changelog.change_log()
+    return change_log(cfg.paths.db, _lib_root())
+
+def _library_etag() -> str:
+    log = _changes()
+    return f'W/"librev-{_BOOT_TAG}-{log.epoch}-{log.rev}"'
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check (weak comparison, lists and * allowed)."""
+    if not if_none_match:
+        return False
+    tag = etag[2:] if etag.startswith("W/") else etag
+    for cand in if_none_match.split(","):
+        cand = cand.strip()
+        if cand == "*" or (cand[2:] if cand.startswith("W/") else cand) == tag:
+            return True
+    return False
+
+def _not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def _item_version(item_id: str, p: Path, st: os.stat_result | None = None) -> str:
+    """Changes whenever the file or (for images) its crop changes; the ?v= token of derivative URLs."""
+    return item_version(_lib_root(), item_id, p, st, cropped=_is_image(p))
+
+def _derivative_headers(item_id: str, p: Path, v: str | None, *size) -> tuple[str, dict]:
+    version = _item_version(item_id, p)
+    etag = '"' + "-".join([version] + [str(x or 0) for x in size]) + '"'
+    cc = _CC_IMMUTABLE if v == version else _CC_REVALIDATE
+    return etag, {"ETag": etag, "Cache-Control": cc}
 
 
 def _lib_root() -> Path:
@@ -227,27 +270,6 @@ def _save_yaml(data: Dict[str, Any]) -> None:
     p.parent.mkdir(parents=True, exist_ok=True)
     p.write_text(yaml.safe_dump(data, sort_keys=False))
 
-# In-process pub/sub (dynamic reconfigure)
-class RuntimeBus:
-    def __init__(self) -> None:
-        self._subs: List[Callable[[Dict[str, Any]], None]] = []
-        self._lock = threading.RLock()
-
-    def subscribe(self, cb: Callable[[Dict[str, Any]], None]) -> None:
-        with self._lock:
-            self._subs.append(cb)
-
-    def publish(self, payload: Dict[str, Any]) -> None:
-        with self._lock:
-            subs = list(self._subs)
-        for cb in subs:
-            try:
-                cb(payload)
-            except Exception:
-                pass
-
-runtime_bus = RuntimeBus()
-
 app = FastAPI(title="LeanFrame Server")
 
 # ADD CORS MIDDLEWARE AT IMPORT TIME (before startup)
@@ -267,8 +289,78 @@ async def auth(x_auth_token: str | None = Header(default=None)):
 
 @app.get("/library/rev", dependencies=[Depends(auth)])
 async def library_rev():
-    with _REV_LOCK:
-        return JSONResponse({"rev": _LIB_REV})
+    log = _changes()
+    return JSONResponse({"rev": log.rev, "epoch": log.epoch})
+
+@app.get("/library/changes", dependencies=[Depends(auth)])
+async def library_changes(since: int = Query(0, ge=0),
+                          limit: int = Query(1000, ge=1, le=10000),
+                          epoch: Optional[str] = None):
+    """
+    What changed after rev `since` (as returned by /library/rev or a previous
+    call), one folded entry per item. Keep the returned rev and epoch; follow
+    up while "more" is true. "reset": true means the log no longer reaches
+    back that far (or was recreated): refetch /library and /library/rev.
+    """
+    out = await asyncio.to_thread(_changes().changes_since, since, limit, epoch)
+    return JSONResponse(out, headers={"Cache-Control": _CC_REVALIDATE})
+
+_HUB: EventHub | None = None
+_HUB_LOCK = threading.Lock()
+
+def _hub() -> EventHub:
+    global _HUB
+    with _HUB_LOCK:
+        if _HUB is None:
+            hub = EventHub(max_clients=cfg.server.events_max_clients, queue_size=cfg.server.events_queue)
+            log = _changes()
+            log.subscribe(lambda e: hub.publish("library", dict(e, epoch=log.epoch), f"{log.epoch}-{e['rev']}"))
+            runtime_bus.subscribe(lambda ev: hub.publish("runtime", ev))
+            playback_bus.subscribe(lambda ev: hub.publish("now_playing", ev))
+            stats.register("events", hub.report)
+            _HUB = hub
+        return _HUB
+
+def _replay(since: int, epoch: str | None, limit: int) -> list[bytes]:
+    out = _changes().changes_since(since, limit, epoch)
+    if out["reset"] or out["more"]:
+        # too far behind to replay on the stream
+        return [sse("resync", {"reason": "reset" if out["reset"] else "behind",
+                               "rev": out["rev"], "epoch": out["epoch"]})]
+    return [sse("library", dict(c, epoch=out["epoch"]), f"{out['epoch']}-{c['rev']}")
+            for c in out["changes"]]
+
+@app.get("/events", dependencies=[Depends(auth)])
+async def events(request: Request,
+                 since: Optional[int] = Query(None, ge=0),
+                 epoch: Optional[str] = None,
+                 last_event_id: str | None = Header(default=None)):
+    """
+    Server-Sent Events: library changes, runtime config updates and
+    now-playing, pushed as they happen (see events.py). Pass since/epoch from
+    /library/rev to get what happened in between first; an EventSource
+    reconnect resumes from its Last-Event-ID ("<epoch>-<rev>").
+    """
+    if last_event_id:
+        ep, _, rev = last_event_id.rpartition("-")
+        if rev.isdigit():
+            since, epoch = int(rev), ep or None
+    hub = _hub()
+    try:
+        client = hub.connect()  # before the snapshot, so nothing falls in between
+    except HubFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "10"})
+    try:
+        log = _changes()
+        hello = [sse("hello", {"rev": log.rev, "epoch": log.epoch, "now_playing": playback_bus.last})]
+        if since is not None:
+            hello += await asyncio.to_thread(_replay, since, epoch, hub.queue_size)
+    except Exception:
+        hub.disconnect(client)
+        raise
+    return StreamingResponse(hub.stream(client, hello, request.is_disconnected),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/config/runtime")
 async def get_runtime():
@@ -321,7 +413,12 @@ async def upload(file: UploadFile = File(...)):
     (lib / sub).mkdir(parents=True, exist_ok=True)
     final = lib / sub / file.filename
     shutil.move(str(dest_tmp), str(final))
-    _bump_rev()  # bump library revision
+    # the indexer reports the same add later; the log drops the repeat
+    item_id = _id_from_path(final)
+    st = final.stat()
+    _changes().append("add", item_id, {"kind": "image" if sub == "images" else "video",
+                                       "bytes": int(st.st_size),
+                                       "v": _item_version(item_id, final, st)})
     return JSONResponse({"ok": True, "path": str(final)})
 
 @app.put("/config/runtime", dependencies=[Depends(auth)])
@@ -428,60 +525,87 @@ async def stats_storage():
             images_bytes += _file_size(p)
         elif _is_video(p):
             videos_bytes += _file_size(p)
+    cache_bytes = _dcache().bytes
     # "Other" = everything else used on the FS minus media we know about
-    other_bytes = max(0, used_fs - images_bytes - videos_bytes)
+    other_bytes = max(0, used_fs - images_bytes - videos_bytes - cache_bytes)
 
     return JSONResponse({
         "total_bytes": total,
         "used_bytes": used_fs,
         "images_bytes": images_bytes,
         "videos_bytes": videos_bytes,
+        "cache_bytes": cache_bytes,
         "other_bytes": other_bytes,
     })
 
+@app.get("/stats/runtime", dependencies=[Depends(auth)])
+async def stats_runtime(name: Optional[str] = None):
+    """Diagnostics registered by the running viewer (decoder routing, ...)."""
+    return JSONResponse(stats.snapshot(name))
+
 @app.get("/library", dependencies=[Depends(auth)])
-async def list_library():
+async def list_library(if_none_match: str | None = Header(default=None)):
+    # rev is read before the walk: a change landing mid-walk only makes the next poll refetch
+    etag = _library_etag()
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, _CC_REVALIDATE)
     meta = _load_meta()
     items = []
     for p in _iter_media():
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        item_id = _id_from_path(p)
         item = {
-            "id": _id_from_path(p),
+            "id": item_id,
             "kind": "image" if _is_image(p) else "video",
-            "bytes": _file_size(p),
+            "bytes": int(st.st_size),
+            "v": _item_version(item_id, p, st),  # pass as ?v= to /thumb and /render
         }
         # attach flags if exist
-        if item["id"] in meta:
-            item["flags"] = meta[item["id"]]
-        items.append(item)
-    # newest last modified first 
-    items.sort(key=lambda x: (_lib_root() / unquote(x["id"])).stat().st_mtime if (_lib_root() / unquote(x["id"])).exists() else 0, reverse=True)
-
-    # ETag from rev (fast) or from hash of ids (slower but precise)
-    with _REV_LOCK:
-        etag = f'W/"librev-{_LIB_REV}"'
-    resp = Response(
-        content=json.dumps({"items": items}),
-        media_type="application/json",
-    )
-    resp.headers["ETag"] = etag
-
-    return JSONResponse({ "items": items })
-
-def _thumb_for_image(p: Path, max_w: int) -> bytes:
-    with Image.open(p) as im:
-        im = im.convert("RGB")
-        # simple contain resize
-        w, h = im.size
-        if w > max_w:
-            new_h = max(1, math.floor(h * (max_w / float(w))))
-            im = im.resize((max_w, new_h), Image.LANCZOS)
-        buf = BytesIO()
-        im.save(buf, format="JPEG", quality=88)
-        return buf.getvalue()
+        if item_id in meta:
+            item["flags"] = meta[item_id]
+        items.append((st.st_mtime, item))
+    # newest last modified first
+    items.sort(key=lambda x: x[0], reverse=True)
+    return JSONResponse({"items": [it for _, it in items]},
+                        headers={"ETag": etag, "Cache-Control": _CC_REVALIDATE})
+
+_POSTERS: PosterPool | None = None
+_POSTERS_LOCK = threading.Lock()
+
+def _posters() -> PosterPool:
+    global _POSTERS
+    with _POSTERS_LOCK:
+        if _POSTERS is None:
+            conv = cfg.conversion
+            _POSTERS = PosterPool(conv.ffmpeg_bin, workers=conv.poster_workers)
+            stats.register("posters", _POSTERS.report)
+        return _POSTERS
+
+def _poster_path(chash: str, max_w: int) -> Path:
+    key = hashlib.sha1(f"poster,w={max_w}".encode()).hexdigest()
+    return _cache_dir() / f"{chash}__{key}.jpg"
+
+async def _thumb_for_video(item_id: str, p: Path, max_w: int) -> Path | None:
+    max_w = max(16, min(2048, max_w))
+    dst = _poster_path(await _content_hash(p), max_w)
+    if _dcache().hit(dst):
+        return dst
+    # shielded: the pool's future is shared with every request for this poster
+    out = await asyncio.shield(asyncio.wrap_future(_posters().get(p, dst, max_w)))
+    if out is not None:
+        _dcache().add(out)
+    return out
 
 def _thumb_for_video_placeholder(p: Path, max_w: int) -> bytes:
-    # A soft gray rectangle with a play triangle overlay (no ffmpeg dependency)
-    W = max(64, min(720, max_w))
+    # used when ffmpeg can't give us a frame (not installed, unreadable clip)
+    return _placeholder_png(max(64, min(720, max_w)))
+
+@functools.lru_cache(maxsize=8)
+def _placeholder_png(W: int) -> bytes:
+    # A soft gray rectangle with a play triangle overlay
     H = int(W * 9 / 16)
     img = Image.new("RGB", (W, H), (200, 205, 210))
     draw = ImageDraw.Draw(img)
@@ -503,47 +627,128 @@ async def get_media(item_id: str = FPath(...)):
     mime, _ = mimetypes.guess_type(str(p))
     return FileResponse(str(p), media_type=mime or "application/octet-stream")
 
+async def _thumb_body(item_id: str, p: Path, max_w: int) -> tuple[Path | bytes, str]:
+    """(cached JPEG, or placeholder PNG bytes for a clip without a poster; media type)."""
+    if _is_image(p):
+        spec = _crop_spec(item_id)
+        return await _render_async(p, spec, max_w=max_w, max_h=max_w), "image/jpeg"
+    if _is_video(p):
+        outp = await _thumb_for_video(item_id, p, max_w)
+        if outp is not None:
+            return outp, "image/jpeg"
+        return _thumb_for_video_placeholder(p, max_w), "image/png"
+    raise HTTPException(415, "unsupported media")
+
 @app.get("/thumb/{item_id:path}", dependencies=[Depends(auth)])
-async def get_thumb(item_id: str = FPath(..., description="library-relative id"), w: Optional[int] = None):
-    max_w = int(w or 360)
+async def get_thumb(item_id: str = FPath(..., description="library-relative id"), w: Optional[int] = None,
+                    v: Optional[str] = None, if_none_match: str | None = Header(default=None)):
+    max_w = _thumb_width(w)
     p = _path_from_id(item_id)
+    etag, headers = _derivative_headers(item_id, p, v, max_w)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, headers["Cache-Control"])
     try:
-        if _is_image(p):
-            spec = _ensure_crops().get(item_id) or CropSpec()
-            outp = _render_variant(item_id, p, spec, max_w=max_w, max_h=max_w)
-            return FileResponse(str(outp), media_type="image/jpeg")
-        elif _is_video(p):
-            data = _thumb_for_video_placeholder(p, max_w)
-            return Response(content=data, media_type="image/png")
-        else:
-            raise HTTPException(415, "unsupported media")
+        body, media_type = await _thumb_body(item_id, p, max_w)
     except HTTPException:
         raise
+    except DecodeBudgetError as e:
+        raise HTTPException(413, str(e))
     except Exception as e:
         raise HTTPException(500, f"thumb error: {e}")
+    if isinstance(body, Path):
+        return FileResponse(str(body), media_type=media_type, headers=headers)
+    # no ETag: a real poster should replace the placeholder once ffmpeg can make one
+    return Response(content=body, media_type=media_type, headers={"Cache-Control": _CC_REVALIDATE})
+
+_BATCH_MAX = 500
+
+class ThumbBatch(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=_BATCH_MAX)
+    w: int = Field(360, gt=0, le=2048)
+
+async def _thumb_part(item_id: str, max_w: int) -> tuple[dict, bytes]:
+    """Headers and body of one part of a /thumbs response; errors become parts too."""
+    headers = {"X-Item-Id": item_id}
+    try:
+        p = _path_from_id(item_id)
+        version = _item_version(item_id, p)
+        body, media_type = await _thumb_body(item_id, p, max_w)
+        if isinstance(body, Path):
+            body = await asyncio.to_thread(body.read_bytes)
+            headers["X-Version"] = version  # same bytes as /thumb?v=<version>
+        return dict(headers, **{"X-Status": "200", "Content-Type": media_type}), body
+    except HTTPException as e:
+        status, detail = e.status_code, str(e.detail)
+    except DecodeBudgetError as e:
+        status, detail = 413, str(e)
+    except Exception as e:
+        status, detail = 500, f"thumb error: {e}"
+    return dict(headers, **{"X-Status": str(status), "Content-Type": "text/plain"}), detail.encode()
+
+@app.post("/thumbs", dependencies=[Depends(auth)])
+async def get_thumbs(batch: ThumbBatch):
+    """
+    Many thumbnails in one request: a multipart/mixed stream with one part
+    per id, in the order they are ready (X-Item-Id says which). Each part
+    carries X-Status; failed ids (missing, 503 from a full render queue, ...)
+    come back as text parts and can be retried through /thumb.
+    Renders run in parallel on the render pool, a few at a time per batch.
+    """
+    boundary = os.urandom(12).hex()
+    sem = asyncio.Semaphore(2 * max(1, cfg.server.render_workers))
+    max_w = _thumb_width(batch.w)
+
+    async def one(item_id: str):
+        async with sem:
+            return await _thumb_part(item_id, max_w)
+
+    async def stream():
+        tasks = [asyncio.create_task(one(i)) for i in dict.fromkeys(batch.ids)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                headers, body = await fut
+                head = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+                yield (f"--{boundary}\r\n{head}Content-Length: {len(body)}\r\n\r\n".encode()
+                       + body + b"\r\n")
+            yield f"--{boundary}--\r\n".encode()
+        finally:
+            # client went away: drop the renders still waiting for a slot; started
+            # ones finish for the cache (and any /thumb sharing them), see _render_async
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(stream(), media_type=f"multipart/mixed; boundary={boundary}",
+                             headers={"Cache-Control": "no-store"})
 
 
 @app.get("/library/{item_id:path}", dependencies=[Depends(auth)])
-async def get_item_meta(item_id: str = FPath(...)):
+async def get_item_meta(item_id: str = FPath(...), if_none_match: str | None = Header(default=None)):
     """
     Return metadata + flags for one library item.
     """
     p = _path_from_id(item_id)
+    st = p.stat()
+    # flag edits move the rev; file edits change mtime/size
+    log = _changes()
+    etag = f'W/"item-{_BOOT_TAG}-{log.epoch}-{log.rev}-{st.st_mtime_ns}-{st.st_size}"'
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, _CC_REVALIDATE)
     kind = "image" if _is_image(p) else "video" if _is_video(p) else "other"
     meta_file = _load_meta()
     flags = meta_file.get(item_id, {})
     info = {
         "id": item_id,
         "kind": kind,
-        "bytes": _file_size(p),
-        "mtime": int(p.stat().st_mtime),
+        "bytes": int(st.st_size),
+        "mtime": int(st.st_mtime),
+        "v": _item_version(item_id, p, st),
         "flags": flags,
         "name": p.name,
         "relpath": p.relative_to(_lib_root()).as_posix(),
     }
     if _is_image(p):
         info.update(_image_meta_from_exif(p))
-    return JSONResponse(info)
+    return JSONResponse(info, headers={"ETag": etag, "Cache-Control": _CC_REVALIDATE})
 
 @app.delete("/library/{item_id:path}", dependencies=[Depends(auth)])
 async def delete_item(item_id: str = FPath(...)):
@@ -560,7 +765,8 @@ async def delete_item(item_id: str = FPath(...)):
         del meta[item_id]
         _save_meta(meta)
 
-    _bump_rev()  # bump library revision
+    _changes().append("delete", item_id)
+    library_bus.publish({"event": "delete", "id": item_id})
     return JSONResponse({"ok": True})
 
 @app.post("/library/{item_id:path}/flags", dependencies=[Depends(auth)])
@@ -593,7 +799,8 @@ async def set_flags(item_id: str = FPath(...), payload: Dict[str, Any] = None):
 
     meta[item_id] = rec
     _save_meta(meta)
-    _bump_rev()
+    _changes().append("flags", item_id, {"flags": dict(rec)})
+    library_bus.publish({"event": "flags", "id": item_id, "flags": dict(rec)})
     return JSONResponse({"ok": True, "flags": rec})
 
 @app.post("/library/{item_id:path}/replace", dependencies=[Depends(auth)])
@@ -606,33 +813,32 @@ async def replace_image(item_id: str = FPath(...), file: UploadFile = File(...))
 # Get current crop (or implicit full-frame)
 @app.get("/library/{id}/crop", dependencies=[Depends(auth)])
 def get_crop(id: str):
-    spec = _ensure_crops().get(id) or CropSpec()
-    return spec.model_dump()
+    return _crop_spec(id).model_dump()
 
 # Set/update crop (normalized rect)
 @app.put("/library/{id}/crop", dependencies=[Depends(auth)])
 def set_crop(id: str, spec: CropSpec):
-    _ensure_crops().put(id, spec)
-    _purge_variants_for(id)
-    # bump rev so clients can refetch list if needed
-    _bump_rev()
+    _changes()  # listening on the crop store before the first edit
+    _ensure_crops().put(id, spec.model_dump())  # logged as a "crop" change by the store listener
     return {"ok": True}
 
 # Optional: clear crop (back to full)
 @app.delete("/library/{id}/crop", dependencies=[Depends(auth)])
 def del_crop(id: str):
+    _changes()
     _ensure_crops().delete(id)
-    _purge_variants_for(id)
-    _bump_rev()
     return {"ok": True}
 
 
 @app.get("/render/{item_id:path}", dependencies=[Depends(auth)])
 async def render_media(item_id: str = FPath(...),
                        w: int | None = Query(None, gt=0),
-                       h: int | None = Query(None, gt=0)):
+                       h: int | None = Query(None, gt=0),
+                       v: Optional[str] = None,
+                       if_none_match: str | None = Header(default=None)):
     """
-    Cropped + resized image view (non-destructive). Use w/h to request a size.
+    Cropped + resized image view (non-destructive). Use w/h to request a size,
+    v (the item's version from /library) to make the response cacheable for good.
     For original bytes, call /media/{item_id}.
     """
     p = _path_from_id(item_id)
@@ -641,18 +847,39 @@ async def render_media(item_id: str = FPath(...),
     if not _is_image(p):
         raise HTTPException(415, "unsupported media")
 
-    spec = _ensure_crops().get(item_id) or CropSpec()
-    outp = _render_variant(item_id, p, spec, max_w=w, max_h=h)
-    return FileResponse(str(outp), media_type="image/jpeg")
+    w, h = _render_dim(w), _render_dim(h)
+    etag, headers = _derivative_headers(item_id, p, v, w, h)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, headers["Cache-Control"])
+    spec = _crop_spec(item_id)
+    try:
+        outp = await _render_async(p, spec, max_w=w, max_h=h)
+    except DecodeBudgetError as e:
+        raise HTTPException(413, str(e))
+    return FileResponse(str(outp), media_type="image/jpeg", headers=headers)
 
 # ---- On-the-fly crop + resize with caching ----
-def _safe_key(s: str) -> str:
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
-
-def _variant_key(item_id: str, spec: CropSpec, max_w: int | None, max_h: int | None, mtime: float) -> str:
+# Derivatives are named <content hash>__<render params hash>.jpg: the same
+# bytes under another name or folder (a move, a re-upload, a photo in both
+# drive/ and gphotos/) share one set, and an edit changes the hash.
+_HASHES: ContentHashes | None = None
+_HASHES_LOCK = threading.Lock()
+
+def _hashes() -> ContentHashes:
+    global _HASHES
+    with _HASHES_LOCK:
+        if _HASHES is None:
+            _HASHES = ContentHashes(cfg.paths.db)
+            stats.register("content_hashes", lambda: dict(_HASHES.stats))
+        return _HASHES
+
+async def _content_hash(p: Path) -> str:
+    # known hashes are a memo/sqlite lookup; a new file is read off the loop
+    return _hashes().cached(p) or await asyncio.to_thread(_hashes().get, p)
+
+def _variant_key(chash: str, spec: CropSpec, max_w: int | None, max_h: int | None) -> str:
     h = hashlib.sha1()
-    h.update(item_id.encode())
-    h.update(str(mtime).encode())
+    h.update(chash.encode())
     h.update(f"{spec.x:.6f},{spec.y:.6f},{spec.w:.6f},{spec.h:.6f},".encode())
     h.update(f"{spec.rotate_deg},{int(spec.hflip)},{int(spec.vflip)},".encode())
     h.update(f"w={max_w or 0},h={max_h or 0}".encode())
@@ -682,41 +909,129 @@ def _apply_crop_pillow(im: Image.Image, spec: CropSpec) -> Image.Image:
     if spec.hflip: im = ImageOps.mirror(im)
     if spec.vflip: im = ImageOps.flip(im)
     if spec.rotate_deg % 360:
-        im = im.rotate(spec.rotate_deg, expand=True, resample=Image.Resampling.BICUBIC)
+        # clockwise, matching libvips rot() and the viewer's loader
+        im = im.rotate(-spec.rotate_deg, expand=True, resample=Image.Resampling.BICUBIC)
     return im
 
-def _render_variant(item_id: str, orig_path: Path, spec: CropSpec,
-                    max_w: int | None, max_h: int | None) -> Path:
-    cdir = _cache_dir()
+def _shrink_box(size: tuple[int, int], spec: CropSpec,
+                max_w: int | None, max_h: int | None) -> tuple[int, int] | None:
+    """
+    Smallest whole-image size (upright, like size) whose crop still covers
+    max_w x max_h after the spec's quarter turns; None when that is full size.
+    """
+    W, H = size
+    if not (max_w or max_h):
+        return None
+    cw, ch = max(1.0, spec.w * W), max(1.0, spec.h * H)
+    if (spec.rotate_deg // 90) % 2:
+        cw, ch = ch, cw
+    scale = min((max_w / cw) if max_w else 1.0, (max_h / ch) if max_h else 1.0)
+    if scale >= 1.0:
+        return None
+    # +1 px: the crop's int() rounding must not leave the final resize short
+    return min(W, math.ceil(W * scale) + 1), min(H, math.ceil(H * scale) + 1)
+
+def _variant_path(chash: str, spec: CropSpec, max_w: int | None, max_h: int | None) -> Path:
+    return _cache_dir() / f"{chash}__{_variant_key(chash, spec, max_w, max_h)}.jpg"
+
+_RENDERS: RenderPool | None = None
+_RENDERS_LOCK = threading.Lock()
+
+def _renders() -> RenderPool:
+    global _RENDERS
+    with _RENDERS_LOCK:
+        if _RENDERS is None:
+            _RENDERS = RenderPool(workers=cfg.server.render_workers, max_queue=cfg.server.render_queue)
+            stats.register("renders", _RENDERS.report)
+        return _RENDERS
+
+async def _render_async(orig_path: Path, spec: CropSpec,
+                        max_w: int | None, max_h: int | None) -> Path:
+    """_render_variant on the render pool; cache hits never leave the event loop."""
+    chash = await _content_hash(orig_path)
+    outp = _variant_path(chash, spec, max_w, max_h)
+    if _dcache().hit(outp):
+        return outp
+    try:
+        fut = _renders().submit(outp, _render_variant, orig_path, spec, max_w, max_h, chash)
+    except Busy as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": str(e.retry_after_s)})
+    # shielded: the future is shared with every request for this derivative, and
+    # cancelling its asyncio wrapper (a dropped /thumbs stream) would cancel it for all
+    return await asyncio.shield(asyncio.wrap_future(fut))
+
+def _render_variant(orig_path: Path, spec: CropSpec, max_w: int | None, max_h: int | None,
+                    chash: str | None = None) -> Path:
     base = orig_path
-    mtime = base.stat().st_mtime
-    key = _variant_key(item_id, spec, max_w, max_h, mtime)
-    outp = cdir / f"{_safe_key(item_id)}__{key}.jpg"
+    outp = _variant_path(chash or _hashes().get(base), spec, max_w, max_h)
     if outp.exists():
         return outp
-
-    if _HAS_VIPS:
-        img = pyvips.Image.new_from_file(str(base), access="sequential")
-
-        img = _apply_crop_vips(img, spec)
-        if max_w or max_h:
-            sx = (max_w / img.width) if max_w else 1.0
-            sy = (max_h / img.height) if max_h else 1.0
-            scale = min(sx, sy)
-            if scale < 1.0:
-                img = img.resize(scale)
-        img.jpegsave(str(outp), Q=90, strip=True, optimize_coding=True)
-    else:
-        im = Image.open(base).convert("RGB")
-        im = _apply_crop_pillow(im, spec)
-        if max_w or max_h:
-            im.thumbnail((max_w or 1_000_000, max_h or 1_000_000), Image.Resampling.LANCZOS)
-        im.save(outp, "JPEG", quality=90, optimize=True)
+    # written aside and renamed: a concurrent request never serves half a JPEG
+    # (per thread: the prewarm worker may race a request for the same file)
+    tmp = outp.with_name(f"{outp.name}.{threading.get_native_id()}.part")
+    try:
+        max_px = budget_pixels(cfg.render.max_decode_mp if cfg else None)
+        # shrink-on-load: decode only as many pixels as the cropped output needs
+        # (JPEG DCT scaling / libvips thumbnail), not the full-resolution frame
+        if _HAS_VIPS:
+            hdr = pyvips.Image.new_from_file(str(base))
+            W, H = hdr.width, hdr.height
+            if hdr.get_typeof("orientation") and int(hdr.get("orientation")) in SWAPS_AXES:
+                W, H = H, W  # thumbnail() autorotates, so size the box upright
+            bw, bh = fit_within(*(_shrink_box((W, H), spec, max_w, max_h) or (W, H)), max_px)
+            if (bw, bh) != (W, H):
+                img = pyvips.Image.thumbnail(str(base), bw, height=bh, size="down")
+            else:
+                img = pyvips.Image.new_from_file(str(base), access="sequential")
+            img = _apply_crop_vips(img, spec)
+            if max_w or max_h:
+                sx = (max_w / img.width) if max_w else 1.0
+                sy = (max_h / img.height) if max_h else 1.0
+                scale = min(sx, sy)
+                if scale < 1.0:
+                    img = img.resize(scale)
+            img.jpegsave(str(tmp), Q=90, strip=True, optimize_coding=True)
+        else:
+            with Image.open(base) as probe:
+                W, H = probe.size
+                if exif_orientation(probe) in SWAPS_AXES:
+                    W, H = H, W
+            box = _shrink_box((W, H), spec, max_w, max_h)
+            im = open_pillow_bounded(base, box, max_px, upright=True).convert("RGB")
+            im = _apply_crop_pillow(im, spec)
+            if max_w or max_h:
+                im.thumbnail((max_w or 1_000_000, max_h or 1_000_000), Image.Resampling.LANCZOS)
+            im.save(tmp, "JPEG", quality=90, optimize=True)
+        tmp.replace(outp)
+    finally:
+        tmp.unlink(missing_ok=True)
+    _dcache().add(outp)
     return outp
 
-def _purge_variants_for(item_id: str):
-    cdir = _cache_dir()
-    prefix = _safe_key(item_id) + "__"
-    for f in cdir.glob(prefix + "*.jpg"):
-        try: f.unlink()
-        except: pass
+# what the app asks for first: the grid's /thumb default and a full-screen /render
+PREWARM_THUMB_W = 360
+
+def prewarm(item_id: str) -> int:
+    """
+    Make the standard derivatives of item_id that are missing; returns how
+    many were made. Run by the prewarm worker (prewarm.py), off the loop.
+    """
+    p = _lib_root() / unquote(item_id)
+    if not p.is_file() or not _dcache().has_room():
+        return 0  # a full cache keeps what requests used; don't churn it from here
+    made = 0
+    if _is_image(p):
+        spec = _crop_spec(item_id)
+        screen = (_render_dim(cfg.screen.width), _render_dim(cfg.screen.height))  # as /render keys it
+        chash = _hashes().get(p)
+        for w, h in ((PREWARM_THUMB_W, PREWARM_THUMB_W), screen):
+            if not _variant_path(chash, spec, w, h).exists():
+                _render_variant(p, spec, max_w=w, max_h=h, chash=chash)
+                made += 1
+    elif _is_video(p):
+        dst = _poster_path(_hashes().get(p), PREWARM_THUMB_W)
+        if not dst.exists() and _posters().get(p, dst, PREWARM_THUMB_W).result() is not None:
+            _dcache().add(dst)
+            made += 1
+    return made
+
@@ -0,0 +1,198 @@
+# photoframe/state.py
+"""
+Write-coalesced, crash-safe viewer state.
+
+The viewer updates its resume state (current id, shuffle position, playback
+counters) on every slide, but only in memory. StateManager writes it out
+when something changed and either the flush interval elapsed, a significant
+event asked for it (shuffle toggled, config pushed, ...) or the process is
+shutting down (SIGTERM / SIGINT / atexit). Writes go to a temp file that is
+fsync'ed and renamed over the old one, so a power cut leaves either the old
+or the new state, never a torn file.
+
+With one-second slides that is ~288 writes a day at the default 300 s
+interval instead of ~86k.
+"""
+from __future__ import annotations
+import atexit
+import json
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """tmp + fsync + rename (+ directory fsync so the rename itself is durable)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    try:
+        fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass  # not supported everywhere; the file itself is already durable
+
+class StateManager:
+    def __init__(self, path: Path, flush_s: float = 300.0):
+        self.path = Path(path)
+        self.flush_s = max(0.0, float(flush_s))
+        self._lock = threading.RLock()
+        self._data: dict = self._read()
+        self._data.setdefault("counters", {})
+        self._sidecars: dict[str, bytes] = {}   # suffix -> pending bytes
+        self._collectors: list[Callable[[], None]] = []
+        self._dirty = False
+        self._urgent = False
+        self._last_flush = time.monotonic()
+        self._writes = 0
+        self._bytes = 0
+        self._handlers_installed = False
+        self._flushing: int | None = None  # thread id inside flush()
+
+    def _read(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text())
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    # ---- reading ----
+    def get(self, key: str, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def sidecar_path(self, suffix: str) -> Path:
+        return self.path.with_suffix(suffix)
+
+    def read_sidecar(self, suffix: str) -> bytes | None:
+        with self._lock:
+            if suffix in self._sidecars:
+                return self._sidecars[suffix]
+        try:
+            return self.sidecar_path(suffix).read_bytes()
+        except Exception:
+            return None
+
+    # ---- updating (memory only) ----
+    def update(self, **fields) -> None:
+        with self._lock:
+            for k, v in fields.items():
+                if self._data.get(k) != v:
+                    self._data[k] = v
+                    self._dirty = True
+
+    def bump(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            c = self._data["counters"]
+            c[counter] = int(c.get(counter, 0)) + n
+            self._dirty = True
+
+    def put_sidecar(self, suffix: str, data: bytes) -> None:
+        """Large, rarely-changing blobs (e.g. the shuffle order) kept next to the state file."""
+        with self._lock:
+            self._sidecars[suffix] = bytes(data)
+            self._dirty = True
+
+    def collect(self, fn: Callable[[], None]) -> None:
+        """fn() runs right before each flush to push fresh values via update()/put_sidecar()."""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def mark_significant(self) -> None:
+        """Flush at the next maybe_flush() instead of waiting for the interval (any thread)."""
+        self._urgent = True
+
+    # ---- writing ----
+    def maybe_flush(self) -> bool:
+        """Cheap; call once per slide. Writes only if due."""
+        if not (self._urgent or time.monotonic() - self._last_flush >= self.flush_s):
+            return False
+        return self.flush()
+
+    def flush(self, force: bool = False) -> bool:
+        with self._lock:
+            if self._flushing == threading.get_ident():
+                # a signal landed mid-flush on this thread (the RLock lets it in):
+                # don't start a second pass over the same sidecars; the interrupted
+                # one still holds everything pending for the next flush (or atexit)
+                self._urgent = True
+                return False
+            self._flushing = threading.get_ident()
+            try:
+                return self._flush(force)
+            finally:
+                self._flushing = None
+
+    def _flush(self, force: bool) -> bool:
+        # under _lock
+        for fn in list(self._collectors):
+            try:
+                fn()
+            except Exception as e:
+                print("[state] collector error", e)
+        self._urgent = False
+        self._last_flush = time.monotonic()
+        if not (self._dirty or force):
+            return False
+        try:
+            for suffix, blob in self._sidecars.items():
+                atomic_write(self.sidecar_path(suffix), blob)
+                self._bytes += len(blob)
+                self._writes += 1
+            self._sidecars.clear()
+            self._data["saved_at"] = time.time()
+            payload = json.dumps(self._data, separators=(",", ":")).encode()
+            atomic_write(self.path, payload)
+            self._bytes += len(payload)
+            self._writes += 1
+            self._dirty = False
+            return True
+        except Exception as e:
+            # keep everything pending; the next flush retries
+            print(f"[state] write failed: {e}")
+            return False
+
+    def install_handlers(self) -> None:
+        """Flush on SIGTERM / SIGINT and at interpreter exit. Main thread only."""
+        if self._handlers_installed:
+            return
+        self._handlers_installed = True
+        atexit.register(self.flush)
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                prev = signal.getsignal(sig)
+                signal.signal(sig, lambda signum, frame, prev=prev: self._on_signal(signum, frame, prev))
+            except (ValueError, OSError):
+                pass  # not on the main thread (e.g. embedded); atexit still covers clean exits
+
+    def _on_signal(self, signum, frame, prev) -> None:
+        print(f"[state] signal {signum}: flushing")
+        self.flush()
+        if callable(prev):
+            prev(signum, frame)
+        elif signum == signal.SIGINT:
+            raise KeyboardInterrupt
+        else:
+            raise SystemExit(128 + signum)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "flush_s": self.flush_s,
+                "dirty": self._dirty,
+                "writes": self._writes,
+                "bytes_written": self._bytes,
+                "since_flush_s": round(time.monotonic() - self._last_flush, 1),
+                "counters": dict(self._data.get("counters") or {}),
+            }
@@ -0,0 +1,39 @@
+# photoframe/stats.py
+"""
+In-process diagnostics registry.
+
+Components living in the viewer (loader, transitions, ...) register a
+callable returning a JSON-able dict; the API server reads them on demand.
+"""
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, Sequence
+
+_lock = threading.RLock()
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def register(name: str, fn: Callable[[], Dict[str, Any]]) -> None:
+    with _lock:
+        _sources[name] = fn
+
+def unregister(name: str) -> None:
+    with _lock:
+        _sources.pop(name, None)
+
+def snapshot(name: str | None = None) -> Dict[str, Any]:
+    with _lock:
+        items = [(name, _sources[name])] if name in _sources else ([] if name else list(_sources.items()))
+    out: Dict[str, Any] = {}
+    for key, fn in items:
+        try:
+            out[key] = fn()
+        except Exception as e:
+            out[key] = {"error": str(e)}
+    return out
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 1]; 0.0 for no samples."""
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
@@ -0,0 +1,155 @@
+# photoframe/transcode.py
+"""
+Background display proxies for videos.
+
+Phone clips (4K, HEVC, 10-bit) stutter on a Pi. ProxyTranscoder walks the
+index for videos whose proxy_state is still NULL, probes each one and, unless
+it is already screen-sized 8-bit H.264, makes a screen-resolution H.264 copy
+under <state dir>/proxies with a nice'd, thread-limited ffmpeg, one job at a
+time with a pause between jobs. A job running past proxy_timeout_x times the
+clip's duration is killed and the clip marked failed, so one malformed file
+can't stall the worker. The result is recorded in the index
+(proxy_state 'ready' / 'skip' / 'failed') and the viewer plays
+Library.proxy_for(id) when there is one.
+
+The proxy is written as .part and renamed when ffmpeg succeeds, and
+proxy_for() only returns 'ready' rows whose file exists, so a failed or
+interrupted transcode is never played. The indexer deletes a proxy when its
+clip is edited or removed; the sweep at worker start catches the rest. The worker uses its own Library
+connection (sqlite objects stay on the thread that made them).
+"""
+from __future__ import annotations
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from .config import AppCfg
+from .convert import probe_video, transcode_proxy
+from .indexer import Library
+
+# already fine for the display: played as is
+_PLAYABLE_CODECS = {"h264"}
+_PLAYABLE_PIX_FMTS = {"yuv420p", "yuvj420p", "nv12"}
+
+def proxies_dir(cfg: AppCfg) -> Path:
+    return cfg.paths.state.parent / "proxies"
+
+class ProxyTranscoder:
+    IDLE_POLL_S = 300.0  # rescan for work even without a poke
+    # bounds of the per-clip ffmpeg timeout (conversion.proxy_timeout_x x duration);
+    # a clip whose duration can't be probed gets the maximum
+    MIN_TIMEOUT_S = 120.0
+    MAX_TIMEOUT_S = 4 * 3600.0
+
+    def __init__(self, cfg: AppCfg):
+        self.cfg = cfg
+        self.box = (cfg.screen.width, cfg.screen.height)
+        self.dir = proxies_dir(cfg)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.current: str | None = None
+        self.stats = {"ready": 0, "skipped": 0, "failed": 0, "last_job_s": 0.0}
+
+    def start(self) -> "ProxyTranscoder":
+        if self._thread is None and self.cfg.conversion.proxy_enabled:
+            if shutil.which(self.cfg.conversion.ffmpeg_bin) is None:
+                # don't mark every clip failed; they are picked up once ffmpeg exists
+                print(f"[proxy] {self.cfg.conversion.ffmpeg_bin} not found; video proxies disabled")
+                return self
+            self._thread = threading.Thread(target=self._run, daemon=True, name="proxy-transcoder")
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def poke(self) -> None:
+        self._wake.set()
+
+    def on_library_change(self, op: str, mid: int, path: str, kind: str) -> None:
+        # Library listener: new and edited clips get a proxy soon after they appear
+        if op in ("add", "update") and kind == "video":
+            self.poke()
+
+    def needs_proxy(self, info: dict | None) -> bool:
+        if info is None:
+            return True  # can't tell; a proxy is the safe bet
+        return (info["codec"] not in _PLAYABLE_CODECS
+                or info["pix_fmt"] not in _PLAYABLE_PIX_FMTS
+                or info["width"] > self.box[0] or info["height"] > self.box[1])
+
+    def timeout_for(self, info: dict | None) -> float:
+        duration = (info or {}).get("duration")
+        if not duration:
+            return self.MAX_TIMEOUT_S
+        return min(self.MAX_TIMEOUT_S,
+                   max(self.MIN_TIMEOUT_S, duration * float(self.cfg.conversion.proxy_timeout_x)))
+
+    def _run(self) -> None:
+        lib = Library(self.cfg.paths.db, self.cfg.paths.library)
+        try:
+            self._sweep(lib)
+            while not self._stop.is_set():
+                job = lib.next_proxy_job()
+                if job is None:
+                    self._wake.wait(self.IDLE_POLL_S)
+                    self._wake.clear()
+                    continue
+                self._do(lib, *job)
+                # bounded rate: never transcode back to back
+                self._stop.wait(max(0.0, float(self.cfg.conversion.proxy_pause_s)))
+        except Exception as e:
+            print(f"[proxy] worker stopped: {e}")
+        finally:
+            lib.close()
+
+    def _do(self, lib: Library, mid: int, path: str, mtime: float) -> None:
+        conv = self.cfg.conversion
+        src = Path(path)
+        if not src.exists():
+            # the indexer drops the row; until then don't pick it again
+            lib.set_proxy(mid, "failed", None, mtime)
+            return
+        info = probe_video(src, conv.ffmpeg_bin)
+        if not self.needs_proxy(info):
+            lib.set_proxy(mid, "skip", None, mtime)
+            self.stats["skipped"] += 1
+            return
+        dst = self.dir / f"{mid}-{int(mtime)}.mp4"
+        self.current = path
+        t0 = time.monotonic()
+        try:
+            transcode_proxy(src, dst, self.box, ffmpeg=conv.ffmpeg_bin, vcodec=conv.video_codec,
+                            crf=conv.crf, preset=conv.proxy_preset, threads=conv.proxy_threads,
+                            timeout_s=self.timeout_for(info))
+        except Exception as e:
+            print(f"[proxy] failed for {path}: {e}")
+            lib.set_proxy(mid, "failed", None, mtime)
+            self.stats["failed"] += 1
+            return
+        finally:
+            self.current = None
+            self.stats["last_job_s"] = round(time.monotonic() - t0, 1)
+        if lib.set_proxy(mid, "ready", str(dst), mtime):
+            self.stats["ready"] += 1
+            print(f"[proxy] ready {dst.name} for {path} in {self.stats['last_job_s']}s")
+        else:
+            dst.unlink(missing_ok=True)  # source changed or vanished meanwhile
+
+    def _sweep(self, lib: Library) -> None:
+        """Drop proxies no row points at (deleted or re-made videos) and stray .part files."""
+        if not self.dir.exists():
+            return
+        keep = lib.proxy_paths()
+        for p in self.dir.iterdir():
+            if str(p) not in keep:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    def report(self) -> dict:
+        return dict(self.stats, current=self.current, enabled=self.cfg.conversion.proxy_enabled)
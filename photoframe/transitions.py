@@ -0,0 +1,248 @@
+# photoframe/transitions.py
+"""
+Frame-paced slide presentation.
+
+TransitionEngine owns the window and puts composed slides on screen, either
+as a plain cut (show) or a crossfade. Two backends:
+
+  sdl2      pygame._sdl2 Renderer: each slide is uploaded once as a texture
+            and the blend is the texture's alpha mod, done by the GPU. "auto"
+            only takes it with a hardware renderer; forcing "sdl2" also
+            accepts SDL's software renderer, which is slower than the
+            display-surface path at full HD.
+  software  classic display surface: the outgoing frame is pre-composed once
+            into the dirty area (union of the old and new image rects), the
+            incoming one is blended over it with surface alpha and only that
+            area is pushed with display.update().
+
+Both walk a precomputed table of alpha steps on a fixed frame clock: if a
+frame runs late the steps it missed are skipped (and counted as dropped)
+instead of stretching the transition. Works headless with
+SDL_VIDEODRIVER=dummy, which is what the benchmarks use.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+import pygame
+from .stats import percentile
+
+BACKENDS = ("auto", "sdl2", "software")
+
+def alpha_steps(duration_ms: int, fps: int) -> bytes:
+    """Blend table: one alpha per frame, ending fully opaque."""
+    n = max(1, round(duration_ms * fps / 1000.0))
+    return bytes(round(255 * (i + 1) / n) for i in range(n))
+
+class TransitionEngine:
+    def __init__(self, size: tuple[int, int], fullscreen: bool = False,
+                 backend: str = "auto", fps: int = 60, title: str = "LeanFrame"):
+        self.fps = max(1, int(fps))
+        self.fullscreen = bool(fullscreen)
+        self.title = title
+        self._req_size = tuple(size)
+        self._lock = threading.Lock()
+        self._history: deque[dict] = deque(maxlen=20)
+        self._totals = {"transitions": 0, "frames": 0, "dropped": 0}
+        self._cur_surface: pygame.Surface | None = None   # what is on screen
+        self._cur_rect: pygame.Rect | None = None
+        self._cur_tex = None
+        # presents of the latest show()/crossfade(): first-pixel time and time spent flipping
+        self.first_pixel_at: float | None = None
+        self.present_s = 0.0
+        self.presented = threading.Event()  # set once the first frame is on screen
+        self.idle = threading.Event()       # cleared during a crossfade (background work waits)
+        self.idle.set()
+        self.backend = ""
+        self._open(backend if backend in BACKENDS else "auto")
+
+    # ---- window ----
+    def _open(self, backend: str) -> None:
+        if backend in ("auto", "sdl2"):
+            try:
+                self._open_renderer(accelerated=1 if backend == "auto" else -1)
+                return
+            except Exception as e:
+                print(f"[transitions] sdl2 renderer unavailable ({e}); using software")
+        self._open_software()
+
+    def _open_renderer(self, accelerated: int) -> None:
+        from pygame._sdl2 import video
+        self._video = video
+        if self.fullscreen:
+            window = video.Window(self.title, size=self._req_size, fullscreen=True)
+        else:
+            window = video.Window(self.title, size=self._req_size)
+        try:
+            # paced by our own frame clock, so no vsync
+            self.renderer = video.Renderer(window, accelerated=accelerated, vsync=False)
+        except Exception:
+            window.destroy()
+            raise
+        self.window = window
+        self.renderer.logical_size = self._req_size
+        self.renderer.draw_color = (0, 0, 0, 255)
+        self.screen = None
+        self.size = self._req_size
+        self.backend = "sdl2"
+
+    def _open_software(self) -> None:
+        flags = pygame.FULLSCREEN if self.fullscreen else 0
+        self.window = None
+        self.renderer = None
+        self.screen = pygame.display.set_mode(self._req_size, flags)
+        self.size = self.screen.get_size()
+        self.backend = "software"
+
+    def suspend(self) -> None:
+        """Get out of the way of an external player."""
+        if self.backend == "sdl2":
+            self.window.hide()
+        else:
+            pygame.display.iconify()
+
+    def resume(self) -> None:
+        if self.backend == "sdl2":
+            self.window.show()
+            self._cur_tex = None
+        else:
+            self._open_software()
+        if self._cur_surface is not None:
+            self.show(self._cur_surface, self._cur_rect)
+
+    # ---- presenting ----
+    def _texture(self, surface: pygame.Surface):
+        tex = self._video.Texture.from_surface(self.renderer, surface)
+        tex.blend_mode = 1  # SDL_BLENDMODE_BLEND, so alpha mod fades
+        return tex
+
+    def _presented(self, t0: float) -> None:
+        now = time.perf_counter()
+        if self.first_pixel_at is None:
+            self.first_pixel_at = now
+        self.present_s += now - t0
+        self.presented.set()
+
+    def show(self, surface: pygame.Surface, rect: pygame.Rect | None = None) -> None:
+        """Hard cut to surface (black around it)."""
+        rect = pygame.Rect(rect) if rect is not None else surface.get_rect()
+        self.first_pixel_at, self.present_s = None, 0.0
+        if self.backend == "sdl2":
+            tex = self._texture(surface)
+            self.renderer.clear()
+            tex.draw(dstrect=rect)
+            t = time.perf_counter()
+            self.renderer.present()
+            self._cur_tex = tex
+        else:
+            self.screen.fill((0, 0, 0))
+            self.screen.blit(surface, rect.topleft)
+            t = time.perf_counter()
+            pygame.display.flip()
+        self._presented(t)
+        self._cur_surface, self._cur_rect = surface, rect
+
+    def crossfade(self, surface: pygame.Surface, rect: pygame.Rect, duration_ms: int) -> dict:
+        """Blend from what is on screen to surface; returns this transition's metrics."""
+        rect = pygame.Rect(rect)
+        if duration_ms <= 0 or self._cur_surface is None:
+            self.show(surface, rect)
+            return {}
+        steps = alpha_steps(duration_ms, self.fps)
+        self.first_pixel_at, self.present_s = None, 0.0
+        frame_s = 1.0 / self.fps
+        if self.backend == "sdl2":
+            draw, finish = self._renderer_frames(surface, rect)
+        else:
+            draw, finish = self._software_frames(surface, rect)
+        frame_ms: list[float] = []
+        dropped = 0
+        shown = -1
+        t0 = time.perf_counter()
+        last = t0
+        self.idle.clear()
+        try:
+            while shown < len(steps) - 1:
+                # which step the clock says we should be on; skip the ones we missed
+                due = min(len(steps) - 1, max(shown + 1, int((time.perf_counter() - t0) / frame_s)))
+                dropped += due - shown - 1
+                draw(steps[due])
+                shown = due
+                now = time.perf_counter()
+                frame_ms.append((now - last) * 1000.0)
+                last = now
+                wait = t0 + (shown + 1) * frame_s - now
+                if wait > 0 and shown < len(steps) - 1:
+                    time.sleep(wait)
+                for event in pygame.event.get(pygame.QUIT):
+                    pygame.quit(); raise SystemExit
+        finally:
+            finish()
+            self.idle.set()
+        self._cur_surface, self._cur_rect = surface, rect
+        rec = {
+            "backend": self.backend,
+            "duration_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+            "planned_frames": len(steps),
+            "frames": len(frame_ms),
+            "dropped": dropped,
+            "frame_p50_ms": round(percentile(frame_ms, 0.50), 3),
+            "frame_p95_ms": round(percentile(frame_ms, 0.95), 3),
+            "frame_max_ms": round(max(frame_ms), 3) if frame_ms else 0.0,
+        }
+        with self._lock:
+            self._history.append(rec)
+            self._totals["transitions"] += 1
+            self._totals["frames"] += rec["frames"]
+            self._totals["dropped"] += dropped
+        return rec
+
+    def _renderer_frames(self, surface, rect):
+        old_tex, old_rect = self._cur_tex, self._cur_rect
+        if old_tex is None:
+            old_tex = self._texture(self._cur_surface)
+        new_tex = self._texture(surface)
+        r = self.renderer
+
+        def draw(alpha: int) -> None:
+            r.clear()
+            old_tex.draw(dstrect=old_rect)
+            new_tex.alpha = alpha
+            new_tex.draw(dstrect=rect)
+            t = time.perf_counter()
+            r.present()
+            self._presented(t)
+
+        def finish() -> None:
+            new_tex.alpha = 255
+            self._cur_tex = new_tex
+        return draw, finish
+
+    def _software_frames(self, surface, rect):
+        scr = self.screen
+        dirty = rect.union(self._cur_rect).clip(scr.get_rect())
+        # outgoing frame composed once; per frame it is a single opaque blit
+        base = pygame.Surface(dirty.size).convert()
+        base.fill((0, 0, 0))
+        base.blit(self._cur_surface, self._cur_rect.move(-dirty.x, -dirty.y).topleft)
+        prev_alpha = surface.get_alpha()
+
+        def draw(alpha: int) -> None:
+            scr.blit(base, dirty.topleft)
+            surface.set_alpha(alpha)
+            scr.blit(surface, rect.topleft)
+            t = time.perf_counter()
+            pygame.display.update(dirty)
+            self._presented(t)
+
+        def finish() -> None:
+            surface.set_alpha(prev_alpha)  # frames are cached by the loader; leave them as found
+        return draw, finish
+
+    def stats(self) -> dict:
+        with self._lock:
+            hist = list(self._history)
+            tot = dict(self._totals)
+        tot["drop_rate"] = round(tot["dropped"] / max(1, tot["frames"] + tot["dropped"]), 4)
+        return {"backend": self.backend, "fps": self.fps, "size": list(self.size),
+                "totals": tot, "recent": hist}
@@ -0,0 +1,266 @@
+# photoframe/video.py
+"""
+Video playback through one long-lived mpv, driven over its JSON IPC socket.
+
+Spawning mpv per clip cost a black gap plus the full player start-up every
+time. MpvPlayer starts mpv once (--idle) and then only sends commands:
+"loadfile <path> replace" to play, "loadfile <path> append" to queue the next
+clip so mpv can prefetch it and cut over without a gap. mpv only opens its
+window while something plays (--force-window=no), on top of the slideshow,
+so the pygame display is never torn down.
+
+The socket path is injectable and spawn=False connects to whatever already
+listens there, which is how the protocol is exercised against a stub server.
+"""
+from __future__ import annotations
+import itertools
+import json
+import queue
+import socket
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable
+
+class MpvError(RuntimeError):
+    pass
+
+def extract_poster(ffmpeg_bin: str, src: Path, dst: Path, box: tuple[int, int],
+                   at_s: float = 0.0, timeout_s: float = 20.0) -> Path:
+    """
+    Keyframe nearest at_s, fitted into box, as a JPEG at dst (written via .part).
+
+    -ss before -i seeks in the demuxer and -skip_frame nokey makes the decoder
+    drop everything but keyframes, so this never decodes a run of frames up to
+    the exact timestamp; one frame goes through the scaler.
+    """
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(dst.name + ".part")
+    w, h = box
+    cmd = [ffmpeg_bin, "-v", "error", "-y", "-noaccurate_seek", "-ss", f"{max(0.0, at_s):.3f}",
+           "-skip_frame", "nokey", "-i", str(src), "-an", "-sn", "-dn",
+           "-frames:v", "1", "-vf", f"scale={w}:{h}:force_original_aspect_ratio=decrease",
+           "-c:v", "mjpeg", "-q:v", "3", "-f", "image2", str(tmp)]
+    try:
+        subprocess.run(cmd, check=True, timeout=timeout_s,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        tmp.replace(dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return dst
+
+class MpvPlayer:
+    ARGS = ("--idle=yes", "--fs", "--ontop", "--force-window=no", "--keep-open=no",
+            "--prefetch-playlist=yes", "--no-input-default-bindings", "--no-terminal",
+            "--really-quiet")
+
+    def __init__(self, socket_path: Path, bin: str = "mpv", spawn: bool = True,
+                 extra_args: tuple[str, ...] = (), connect_timeout_s: float = 5.0):
+        self.socket_path = Path(socket_path)
+        self.bin = bin
+        self.spawn = spawn
+        self.extra_args = tuple(extra_args)
+        self.connect_timeout_s = connect_timeout_s
+        self._proc: subprocess.Popen | None = None
+        self._sock: socket.socket | None = None
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._replies: dict[int, queue.Queue] = {}
+        self._events: queue.Queue = queue.Queue()
+        # (path, entry id, key) behind the current one
+        self._queued: deque[tuple[str, int | None, object]] = deque()
+        self.current: str | None = None
+        self._key = None                     # caller's id of the current clip (see play())
+        self._entry: int | None = None       # mpv playlist_entry_id of current, if reported
+        self._stats = {"starts": 0, "clips": 0, "gapless": 0, "errors": 0, "start_ms": 0.0}
+
+    # ---- process / connection ----
+    @property
+    def alive(self) -> bool:
+        return self._sock is not None and (self._proc is None or self._proc.poll() is None)
+
+    def start(self) -> None:
+        if self.alive:
+            return
+        self.close()
+        t0 = time.perf_counter()
+        if self.spawn:
+            self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+            self.socket_path.unlink(missing_ok=True)
+            try:
+                self._proc = subprocess.Popen(
+                    [self.bin, f"--input-ipc-server={self.socket_path}", *self.ARGS, *self.extra_args],
+                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                raise MpvError(f"cannot start {self.bin}: {e}") from e
+        deadline = time.monotonic() + self.connect_timeout_s
+        while True:
+            try:
+                s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                s.connect(str(self.socket_path))
+                break
+            except OSError:
+                s.close()
+                if (self._proc is not None and self._proc.poll() is not None) or time.monotonic() > deadline:
+                    self.close()
+                    raise MpvError(f"cannot reach mpv IPC at {self.socket_path}")
+                time.sleep(0.05)
+        self._sock = s
+        threading.Thread(target=self._reader, args=(s,), daemon=True, name="mpv-ipc").start()
+        self._stats["starts"] += 1
+        self._stats["start_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    def close(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.sendall(b'{"command":["quit"]}\n')
+            except OSError:
+                pass
+            sock.close()
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            try:
+                proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self._queued.clear()
+        self.current = self._entry = self._key = None
+
+    def _reader(self, sock: socket.socket) -> None:
+        buf = b""
+        try:
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                buf += chunk
+                while b"\n" in buf:
+                    line, buf = buf.split(b"\n", 1)
+                    try:
+                        msg = json.loads(line)
+                    except ValueError:
+                        continue
+                    rid = msg.get("request_id")
+                    if "event" in msg:
+                        self._events.put(msg)
+                    elif rid in self._replies:
+                        self._replies[rid].put(msg)
+        except OSError:
+            pass
+        finally:
+            if self._sock is sock:
+                self._sock = None
+            self._events.put({"event": "_disconnected"})
+            for q in list(self._replies.values()):
+                q.put({"error": "disconnected"})
+
+    # ---- commands ----
+    def command(self, *args, timeout_s: float = 5.0):
+        """Send one IPC command and return its "data" (raises MpvError on failure)."""
+        sock = self._sock
+        if sock is None:
+            raise MpvError("mpv not connected")
+        rid = next(self._ids)
+        q: queue.Queue = queue.Queue(maxsize=1)
+        self._replies[rid] = q
+        try:
+            payload = json.dumps({"command": list(args), "request_id": rid}).encode() + b"\n"
+            with self._send_lock:
+                sock.sendall(payload)
+            reply = q.get(timeout=timeout_s)
+        except (OSError, queue.Empty) as e:
+            raise MpvError(f"mpv command {args[0]!r} failed: {e}") from e
+        finally:
+            self._replies.pop(rid, None)
+        if reply.get("error") not in (None, "success"):
+            raise MpvError(f"mpv command {args[0]!r}: {reply.get('error')}")
+        return reply.get("data")
+
+    def _drain_events(self) -> None:
+        while True:
+            try:
+                self._events.get_nowait()
+            except queue.Empty:
+                return
+
+    def play(self, path: str, key=None) -> None:
+        """
+        Start path now unless it is already playing because it was queued.
+        key identifies the item (the viewer passes its media id): a clip
+        queued under the same key counts even if the path to play changed
+        since, e.g. its display proxy finished while the one before played.
+        """
+        self.start()
+        path = str(path)
+        if self.current is not None and (self.current == path or (key is not None and key == self._key)):
+            self._stats["gapless"] += 1
+            return
+        self._drain_events()
+        self._queued.clear()
+        data = self.command("loadfile", path, "replace")
+        self.current, self._entry, self._key = path, self._entry_id(data), key
+        self._stats["clips"] += 1
+
+    @staticmethod
+    def _entry_id(data) -> int | None:
+        # mpv >= 0.33 answers loadfile with {"playlist_entry_id": n}
+        return data.get("playlist_entry_id") if isinstance(data, dict) else None
+
+    def queue(self, path: str, key=None) -> None:
+        """Append path behind the current clip (mpv prefetches it); key as for play()."""
+        path = str(path)
+        if self.current is None or path == self.current or \
+                any(p == path or (key is not None and k == key) for p, _, k in self._queued):
+            return
+        data = self.command("loadfile", path, "append")
+        self._queued.append((path, self._entry_id(data), key))
+
+    def wait_end(self, tick: Callable[[], None] | None = None, poll_s: float = 0.25) -> str:
+        """
+        Block until the current clip ends; returns mpv's end-file reason
+        ("eof", "error", ...). tick() runs every poll_s (e.g. to pump SDL).
+        A queued clip becomes current as mpv moves on to it.
+        """
+        while True:
+            try:
+                ev = self._events.get(timeout=poll_s)
+            except queue.Empty:
+                if tick is not None:
+                    tick()
+                continue
+            name = ev.get("event")
+            if name == "_disconnected":
+                self.current = self._entry = self._key = None
+                self._queued.clear()
+                self._stats["errors"] += 1
+                raise MpvError("mpv went away during playback")
+            if name != "end-file":
+                continue
+            reason = ev.get("reason", "eof")
+            eid = ev.get("playlist_entry_id")
+            # late end-file of a clip we replaced
+            if (eid is not None and self._entry is not None and eid != self._entry) or \
+                    (eid is None and reason == "stop"):
+                continue
+            if reason == "error":
+                self._stats["errors"] += 1
+            if reason == "eof" and self._queued:
+                self.current, self._entry, self._key = self._queued.popleft()
+            else:
+                self.current = self._entry = self._key = None
+                self._queued.clear()
+            return reason
+
+    def stop(self) -> None:
+        if self.alive:
+            self.command("stop")
+        self._queued.clear()
+        self.current = self._entry = self._key = None
+
+    def stats(self) -> dict:
+        return dict(self._stats, alive=self.alive, current=self.current,
+                    queued=[p for p, _, _ in self._queued])
@@ -1,46 +1,112 @@
 from logging import root
-import os, json, time, subprocess, random
+import os, json, time, subprocess, threading, atexit, hashlib, shutil
+from collections import deque
 from pathlib import Path
 import pygame
-from pygame.locals import FULLSCREEN
 # from .utils import load_image_surface
-from .indexer import Library
+from .indexer import Library, IndexWorker
 from .config import AppCfg
 from .constants import SUPPORTED_IMAGES, SUPPORTED_VIDEOS
 from .fast_image_loader import FastImageLoader
-from .server import runtime_bus
-from urllib.parse import quote
-import requests
-from io import BytesIO
+from .imaging import DecodeBudgetError
+from . import calibrate, stats
+from .bus import runtime_bus, library_bus, playback_bus
+from .playlist import Playlist
+from .crops import crop_store, crop_key
+from .derivcache import DerivativeCache, derivative_cache, derivatives_dir
+from .transitions import TransitionEngine
+from .state import StateManager
+from .video import MpvPlayer, MpvError, extract_poster
+from urllib.parse import quote, unquote
+
+# SDL's WaitEventTimeout falls back to a 1 ms poll on several drivers (dummy,
+# kmsdrm), so the hold blocks on _Waker instead and pumps input at this rate
+INPUT_POLL_S = 0.25
+
+class _Waker:
+    """Combined wake-up source for the idle hold (config push, flag edit, watcher)."""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._reasons: list[str] = []
+
+    def ring(self, reason: str) -> None:
+        with self._cond:
+            self._reasons.append(reason)
+            self._cond.notify_all()
+
+    def wait(self, timeout: float) -> list[str]:
+        with self._cond:
+            if not self._reasons:
+                self._cond.wait(timeout)
+            out, self._reasons = self._reasons, []
+            return out
+
+_waker = _Waker()
 
+def post_wake(reason: str = "") -> None:
+    """Cut the viewer's idle hold short; safe to call from any thread."""
+    _waker.ring(reason)
 
 class Viewer:
-    def __init__(self, cfg: AppCfg, lib: Library, watch_flag=None):
+    def __init__(self, cfg: AppCfg, lib: Library, indexer: IndexWorker | None = None,
+                 video: MpvPlayer | None = None):
         self.cfg = cfg
         self.lib = lib
-        self.watch_flag = watch_flag
+        # rescans run on the worker; we only apply its deltas between slides
+        self.indexer = indexer
         self.state_path = cfg.paths.state
+        # clip posters used to pile up here unbounded; they live in the derivative cache now
+        shutil.rmtree(self.state_path.parent / ".posters", ignore_errors=True)
         self.W, self.H = cfg.screen.width, cfg.screen.height
-        flags = FULLSCREEN if cfg.screen.fullscreen else 0
         pygame.init()
-        self.screen = pygame.display.set_mode((self.W, self.H), flags)
-        self.loader = FastImageLoader(self.screen.get_size(), self.cfg.render)
+        # owns the window: SDL2 renderer if available, display surface otherwise
+        self.engine = TransitionEngine((self.W, self.H), fullscreen=cfg.screen.fullscreen,
+                                       backend=cfg.render.renderer)
+        stats.register("transitions", self.engine.stats)
+        # one mpv for the whole session, started at the first clip
+        # injectable (e.g. MpvPlayer(sock, spawn=False) against a stub IPC server)
+        self.video = video or MpvPlayer(cfg.paths.state.parent / "mpv.sock",
+                                        bin=os.environ.get("LEANFRAME_MPV", "mpv"))
+        atexit.register(self.video.close)
+        stats.register("video", self.video.stats)
+        # per-format decoder routing, calibrated once per screen size / backend set
+        routing = calibrate.load_or_calibrate(self.engine.size, cfg.paths.state)
+        self.loader = FastImageLoader(self.engine.size, self.cfg.render, routing=routing)
+        stats.register("decoders", self.loader.decoder_report)
+        self._update_frame_budget()
+        stats.register("render", self.loader.stats)
         pygame.mouse.set_visible(not cfg.screen.cursor_hidden)
-        self.clock = pygame.time.Clock()
         self.crossfade_ms = cfg.playback.crossfade_ms if cfg.playback.transitions_crossfade else 0
-        self.current_id = self._load_resume_id() if cfg.playback.resume_on_start else None
-        if not self.current_id:
-            rows = self.lib.list_ids()
-            self.current_id = rows[0][0] if rows else None
         # dynamic reconfigure: subscribe once
         runtime_bus.subscribe(self._on_runtime_update)
+        # crops are read in-process; edits from the API just evict stale surfaces
+        self.crops = crop_store(cfg.paths.library)
+        self.crops.subscribe(self._on_crop_changed)
         # -------- Flags-aware playlist state --------
         self._meta_cache: dict[str, dict] = {}
         self._meta_mtime: float = 0.0
-        # self._meta_path = Path(self.cfg.paths.library) / ".meta.json"
-        self._playlist: list[tuple[int, str, str]] = []  # [(id, path, kind)]
-        self._id_index: dict[int, int] = {}              # id -> index in _playlist
+        self.playlist = Playlist(self.lib, shuffle=cfg.playback.shuffle, loop=cfg.playback.loop)
+        # resume state lives in memory and is flushed on an interval / events / shutdown
+        self.state = StateManager(self.state_path, flush_s=cfg.playback.state_flush_s)
+        self.state.collect(self._collect_state)
+        self.state.install_handlers()
+        stats.register("state", self.state.stats)
         self._rebuild_playlist()  # build initial playlist using flags
+        if cfg.playback.resume_on_start:
+            self._restore_playlist()
+        # from here on the playlist is maintained by deltas, never rebuilt per slide
+        self.lib.subscribe(self._on_library_change)
+        self._pending_events: deque[dict] = deque()
+        library_bus.subscribe(self._on_library_event)
+        self._index_deltas: deque[tuple] = deque()
+        if indexer is not None:
+            indexer.subscribe(self._on_index_change)
+        # per-slide stage timings, recorded only while this is a list (bench.py)
+        self.slide_trace: list[dict] | None = None
+
+    def _update_frame_budget(self) -> None:
+        # decode+compose of the next slide should fit in half of a hold
+        self.loader.frame_budget_s = max(0.05, float(self.cfg.playback.slide_duration_s) * 0.5)
 
     @staticmethod
     def _id_from_library_path(root: Path, path: Path) -> str:
@@ -74,114 +140,44 @@ class Viewer:
             # Keep last good cache on any read/parse error
             pass
 
-    def _eligible_filter(self, rows: list[tuple[int, str, str]]) -> list[tuple[int, str, str]]:
-        self._load_meta_if_changed()
-
-        inc_set: set[str] = set()
-        exc_set: set[str] = set()
-        for item_id, flags in self._meta_cache.items():
-            if not isinstance(flags, dict):
-                continue
-            if flags.get("include") is True:
-                inc_set.add(item_id)
-            if flags.get("exclude_from_slideshow") is True or flags.get("exclude_from_shuffle") is True:
-                exc_set.add(item_id)
-
-        lib_root = Path(self.cfg.paths.library)
-
-        def id_for_path(p_str: str) -> str:
-            # exact same id scheme as the server
-            p = Path(p_str)
-            rel = os.path.relpath(p, lib_root)
-            return quote(rel, safe="/-._~")
-
-        # If any includes exist -> whitelist then subtract exclusions
-        if inc_set:
-            out = []
-            for (mid, path, kind) in rows:
-                iid = id_for_path(path)
-                if iid in inc_set and iid not in exc_set:
-                    out.append((mid, path, kind))
-            return out
-
-        # Otherwise -> global list minus exclusions
-        out = []
-        for (mid, path, kind) in rows:
-            iid = id_for_path(path)
-            if iid in exc_set:
-                continue
-            out.append((mid, path, kind))
-        return out
-
     def _rebuild_playlist(self) -> None:
         """
-        Build self._playlist ([(id, path, kind), ...]) and id->index map
-        honoring include / exclude flags and shuffle preference.
-        """
-        # Pull raw ordered rows from DB
-        rows = self.lib.list_ids()  # [(id, path, kind)]
-        norm: list[tuple[int, str, str]] = []
-        for r in rows:
-            if len(r) == 3:
-                norm.append((int(r[0]), str(r[1]), str(r[2])))
-            else:
-                # In case list_ids ever returns [id] form, normalize
-                mid = int(r[0])
-                rb = self.lib.get_by_id(mid)
-                if rb:
-                    norm.append((int(rb[0]), str(rb[1]), str(rb[2])))
-
-        # Filter according to flags
-        eligible = self._eligible_filter(norm)
-
-        # If shuffle mode is on, randomize *but* keep a stable seed per boot for nice behavior
-        if self.cfg.playback.shuffle:
-            tmp = eligible[:]
-            random.shuffle(tmp)
-            self._playlist = tmp
-        else:
-            self._playlist = eligible
-
-        # Rebuild index map
-        self._id_index = {mid: i for i, (mid, _, _) in enumerate(self._playlist)}
-
-        # If current isn't eligible anymore, move to the first eligible
-        if self.current_id is not None and self.current_id not in self._id_index:
-            self.current_id = self._playlist[0][0] if self._playlist else None
-
-    def _next_play_id(self, after_id: int | None) -> int | None:
-        """
-        Return the next id to play based on current playlist and loop setting.
-        In shuffle mode, walk the shuffled list (no immediate repeats).
+        Full build of the flags-aware playlist from the DB. Only needed at
+        startup; afterwards it is kept current by _on_library_change and
+        _on_library_event deltas.
         """
-        if not self._playlist:
-            return None
-        if after_id is None:
-            return self._playlist[0][0]
-
-        i = self._id_index.get(after_id, None)
-        if i is None:
-            return self._playlist[0][0]
-
-        j = i + 1
-        if j < len(self._playlist):
-            return self._playlist[j][0]
-        # End reached
-        return self._playlist[0][0] if self.cfg.playback.loop else None
-
-    def _row_for_id(self, mid: int | None) -> tuple[int, str, str] | None:
-        if mid is None:
-            return None
-        # Fast path: index lookup then tuple
-        i = self._id_index.get(mid)
-        if i is not None and 0 <= i < len(self._playlist):
-            return self._playlist[i]
-        # Fallback to DB (should be rare)
-        rb = self.lib.get_by_id(mid)
-        if rb:
-            return (int(rb[0]), str(rb[1]), str(rb[2]))
-        return None
-
+        self._load_meta_if_changed()
+        self.playlist.reset(self.lib.iter_id_kinds(), self._meta_cache)
+
+    def _on_library_change(self, op: str, mid: int, path: str, kind: str) -> None:
+        # indexer delta (scan_once / delete_id / purge_missing); an "update"
+        # needs nothing here: surfaces are cached by mtime
+        if op == "add":
+            self.playlist.add(mid, path, kind)
+        elif op == "remove":
+            self.playlist.remove(mid)
+
+    def _on_index_change(self, op: str, mid: int, path: str, kind: str) -> None:
+        # IndexWorker thread; applied at the next slide boundary
+        self._index_deltas.append((op, mid, path, kind))
+        post_wake("scan")
+
+    def _apply_index_deltas(self) -> None:
+        while self._index_deltas:
+            self._on_library_change(*self._index_deltas.popleft())
+
+    def _on_library_event(self, ev: dict) -> None:
+        # API delta, on the server thread; file deletions arrive through the
+        # indexer like any other. Applied by the viewer thread, which owns the
+        # Library connection the playlist resolves ids through.
+        if ev.get("event") == "flags":
+            self._pending_events.append(ev)
+            post_wake("library")
+
+    def _apply_pending_events(self) -> None:
+        while self._pending_events:
+            ev = self._pending_events.popleft()
+            self.playlist.set_flags(ev["id"], ev.get("flags"))
 
     def _on_runtime_update(self, data: dict) -> None:
         """
@@ -203,10 +199,14 @@ class Viewer:
             pb = data.get("playback", {})
             if "slide_duration_s" in pb:
                 self.cfg.playback.slide_duration_s = float(pb["slide_duration_s"])
+                self._update_frame_budget()
             if "shuffle" in pb:
                 self.cfg.playback.shuffle = bool(pb["shuffle"])
+                self.playlist.set_shuffle(self.cfg.playback.shuffle)
+                self.state.mark_significant()
             if "loop" in pb:
                 self.cfg.playback.loop = bool(pb["loop"])
+                self.playlist.loop = self.cfg.playback.loop
             if "crossfade_ms" in pb:
                 # you use crossfade only if transitions_crossfade is True
                 self.cfg.playback.crossfade_ms = int(pb["crossfade_ms"])
@@ -215,247 +215,251 @@ class Viewer:
             # If you cache anything else (e.g., timers), refresh here if needed.
         except Exception:
             pass
+        post_wake("config")
+
+
+    # packed shuffle permutation lives next to state.json; rewritten only when it changes
+    ORDER_SUFFIX = ".order"
+
+    def _restore_playlist(self) -> None:
+        """Resume the saved shuffle permutation and position (survives reboots)."""
+        order = self.state.read_sidecar(self.ORDER_SUFFIX)
+        if self.playlist.restore(self.state.get("shuffle"), order):
+            print(f"[viewer] resumed shuffle pass {self.playlist.cycle} ({len(self.playlist)} items)")
+        self.playlist.seek(self.state.get("last_id"))
+
+    def _collect_state(self) -> None:
+        # runs right before each state flush
+        self.state.update(shuffle=self.playlist.snapshot())
+        if self.playlist.shuffle and self.playlist.order_dirty:
+            self.state.put_sidecar(self.ORDER_SUFFIX, self.playlist.order_bytes())
+
+    def _save_resume_id(self, mid: int, counter: str):
+        # memory only; StateManager decides when it reaches the disk
+        self.state.update(last_id=mid)
+        self.state.bump(counter)
+        if self.playlist.cycle != (self.state.get("shuffle") or {}).get("cycle"):
+            self.state.mark_significant()  # new shuffle pass: persist the fresh permutation
+        self.state.maybe_flush()
+
+    def _derivatives(self) -> DerivativeCache:
+        # the API's byte-bounded cache, so clip posters are evicted like thumbnails
+        return derivative_cache(derivatives_dir(self.cfg.paths.library),
+                                self.cfg.server.derivative_cache_mb << 20)
+
+    def _poster_path(self, path: str) -> Path:
+        st = os.stat(path)
+        # path + mtime, not the content hash: that would read the clip on the playback path
+        key = hashlib.sha1(f"{path}|{st.st_mtime_ns}".encode()).hexdigest()[:20]
+        return self._derivatives().dir / f"{key}__screen-poster-{self.W}x{self.H}.jpg"
+
+    def _ensure_poster(self, path: str) -> Path | None:
+        """First frame of the clip, fitted to the screen; kept in the derivative cache."""
+        try:
+            dc = self._derivatives()
+            dst = self._poster_path(path)
+            if dc.hit(dst) is None:
+                extract_poster(self.cfg.conversion.ffmpeg_bin, Path(path), dst, (self.W, self.H))
+                dc.add(dst)
+            return dst
+        except Exception as e:  # incl. no ffmpeg; the clip itself is checked by the caller
+            print(f"[viewer] no poster for {path}: {e}")
+            return None
 
-
-    def _is_in_slideshow(self, path: Path) -> bool:
+    def _play_video(self, path: str, mid: int):
         """
-        Honor both 'include' and 'exclude_from_slideshow'.
-        Default behavior:
-        - If include == False -> skip
-        - Else if exclude_from_slideshow == True -> skip
-        - Else -> show
+        Fade to the clip's poster frame, then let the long-lived mpv play it on
+        top of our window and wait for the end. The display proxy is played
+        instead of the original once the transcoder has finished one. If the
+        next item is a clip as well it is queued in mpv, which prefetches it
+        and cuts over gaplessly.
         """
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        poster = self._ensure_poster(path)
+        if poster is not None:
+            surf = pygame.image.load(str(poster))
+            if pygame.display.get_surface() is not None:
+                surf = surf.convert()
+            rect = surf.get_rect(center=(self.W // 2, self.H // 2))
+            if self.crossfade_ms > 0:
+                self.engine.crossfade(surf, rect, self.crossfade_ms)
+            else:
+                self.engine.show(surf, rect)
         try:
-            self._load_meta_if_changed()
-            item_id = self._id_from_library_path(Path(self.cfg.paths.library), path)
-            flags = self._meta_cache.get(item_id) or {}
-            if flags.get("include") is False:
-                return False
-            if flags.get("exclude_from_slideshow") is True or flags.get("exclude_from_shuffle") is True:
-                return False
-            return True
-        except Exception as e:
-            print(e)
-            return True
-
-
-    def _load_resume_id(self):
-        try:
-            if self.state_path.exists():
-                state = json.loads(self.state_path.read_text())
-                return state.get("last_id")
-        except Exception: pass
-        return None
-
-    def _save_resume_id(self, mid: int):
-        self.state_path.parent.mkdir(parents=True, exist_ok=True)
-        self.state_path.write_text(json.dumps({"last_id": mid}))
-
-    def _play_video(self, path: str):
-        # Prefer mpv for low CPU and good scaling
-        bin = os.environ.get("LEANFRAME_MPV", "mpv")
-        try:
-            subprocess.run([bin, "--fs", "--no-input-default-bindings", "--really-quiet", path], check=True)
-        except Exception:
-            # Fallback to ffplay
-            subprocess.run(["ffplay", "-autoexit", "-fs", "-hide_banner", "-loglevel", "error", path])
+            # keyed by id: if the proxy finished since this clip was queued, the
+            # queued original still counts and the cut stays gapless
+            self.video.play(self.lib.proxy_for(mid) or path, key=mid)
+            for nmid, nxt, _kind in self.playlist.upcoming(1, kind="video"):
+                self.video.queue(self.lib.proxy_for(nmid) or nxt, key=nmid)  # only when the very next item is a clip
+            reason = self.video.wait_end(tick=self._pump_input)
+            if reason == "error":
+                print(f"[viewer] mpv could not play {path}")
+        except MpvError as e:
+            print(f"[viewer] mpv unavailable ({e}); falling back to ffplay")
+            self.engine.suspend()
+            try:
+                subprocess.run(["ffplay", "-autoexit", "-fs", "-hide_banner", "-loglevel", "error", path])
+            except OSError as e:  # no ffplay either; not the clip's fault
+                print(f"[viewer] cannot play {path}: {e}")
+            finally:
+                self.engine.resume()
+
+    def _stop_video(self) -> None:
+        # a clip was queued in mpv but the playlist moved on to something else
+        if self.video.current is not None:
+            try:
+                self.video.stop()
+            except MpvError:
+                pass
 
-    def loop(self):
+    def loop(self, max_slides: int | None = None):
+        """Run the slideshow; forever unless max_slides is given (benchmarks)."""
         font = pygame.font.SysFont(None, 36)
-        while True:
-            # If watcher signaled changes, rescan here on the main thread
-            if self.watch_flag is not None and self.watch_flag.is_set():
-                print("[watchdog] running scan_once on viewer thread ...")
-                self.lib.scan_once(recursive=self.cfg.indexer.recursive,
-                                   ignore_hidden=self.cfg.indexer.ignore_hidden)
-                # rebuild playlist according to flags
-                self._rebuild_playlist()
-                self.watch_flag.clear()
-
-            row = self._row_for_id(self.current_id)
+        slides = 0
+        while max_slides is None or slides < max_slides:
+            # slide boundary: fold in what the indexer found meanwhile
+            self._apply_index_deltas()
+            self._service_background()
+
+            # current item unless it was removed or flagged out meanwhile
+            row = self.playlist.current() or self.playlist.advance()
             if not row:
+                if max_slides is not None:
+                    return
                 # draw message
-                self.screen.fill((0,0,0))
                 msg = font.render("No media found in data/library", True, (200,200,200))
-                rect = msg.get_rect(center=(self.W//2, self.H//2))
-                self.screen.blit(msg, rect)
-                pygame.display.flip()
-                # Try rescanning & rebuilding occasionally
-                self.lib.scan_once(recursive=self.cfg.indexer.recursive, ignore_hidden=self.cfg.indexer.ignore_hidden)
-                self._rebuild_playlist()
-                self.current_id = self._next_play_id(None)
-                time.sleep(2)
+                self.engine.show(msg, msg.get_rect(center=(self.W//2, self.H//2)))
+                # ask the indexer to look again and wait for it (or 2 s); start over from the top
+                if self.indexer is not None:
+                    self.indexer.request_scan()
+                _waker.wait(2.0)
+                self._pump_input()
+                self._apply_index_deltas()
+                self.playlist.rewind()
                 continue
 
             mid, path, kind = row
-
-            # respect "In Slideshow" flag
-            if not self._is_in_slideshow(path):
-                # skip to next immediately (do not display)
-                self.current_id = self.lib.next_id(mid, loop=self.cfg.playback.loop)
-                continue
+            slides += 1
 
             print(f"[viewer] showing id={mid} kind={kind} path={path}")
             path = Path(path)
+            playback_bus.publish({"event": "now_playing", "kind": kind, "at": time.time(),
+                                  "id": self._id_from_library_path(Path(self.cfg.paths.library), path)})
             try:
                 if path.suffix.lower() in SUPPORTED_IMAGES:
+                    self._stop_video()
                     self._show_image(str(path))
-                    self._save_resume_id(mid)
+                    self._save_resume_id(mid, "images_shown")
                 else:
-                    # let external player own the screen
-                    pygame.display.iconify()
-                    self._play_video(str(path))
-                    pygame.display.set_mode((self.W, self.H), FULLSCREEN if self.cfg.screen.fullscreen else 0)
-                    self._save_resume_id(mid)
+                    self._play_video(str(path), mid)
+                    self._save_resume_id(mid, "videos_played")
             except FileNotFoundError:
                 print(f"[viewer] missing; removing from DB and skipping: {path}")
-                # remove stale row and continue
+                # remove stale row (the listener drops it from the playlist) and continue
                 self.lib.delete_id(mid)
-                # try the next id immediately
-                self.current_id = self.lib.next_id(mid, loop=self.cfg.playback.loop)
+                self.state.bump("missing_removed")
+                self.playlist.advance()
                 continue
-            # next
-            self._load_meta_if_changed()
-            self._rebuild_playlist()
-            # next according to flags-aware playlist
-            self.current_id = self._next_play_id(mid)
+            except DecodeBudgetError as e:
+                # too large to decode safely on this device; leave it in the library
+                print(f"[viewer] skipping: {e}")
+                self.state.bump("decode_skipped")
+            # next according to flags-aware playlist (O(1), order preserved)
+            self.playlist.advance()
 
 
     def _show_image(self, path: str):
         """
-        If a non-default crop is stored, fetch a sized render from the server.
-        Otherwise, keep the fast local load.
+        Decode, crop and compose locally. The crop comes from the in-process
+        crop store (shared with the API), so cropped items take the same fast
+        path and padding modes as everything else.
         """
         W, H = self.W, self.H
+        t0 = time.perf_counter()
         lib_root = Path(self.cfg.paths.library)
         item_id = self._id_from_library_path(lib_root, Path(path))
-
-        spec = self._fetch_crop_spec(item_id)  # {} or full/partial crop
-
-        def _is_default_crop(s: dict) -> bool:
-            # same defaults as CropSpec
-            return (
-                not s or
-                (float(s.get("x", 0)) == 0 and float(s.get("y", 0)) == 0 and
-                float(s.get("w", 1)) == 1 and float(s.get("h", 1)) == 1 and
-                int(s.get("rotate_deg", 0)) % 360 == 0 and
-                not bool(s.get("hflip", False)) and
-                not bool(s.get("vflip", False)))
-            )
-
-        if _is_default_crop(spec):
-            # No crop → use local fast path (turbojpeg pipeline)
-            frame = self.loader.load_surface(path)
-        else:
-            # Have a crop → ask server to render cropped + sized
-            frame = self._load_surface_via_render(item_id, W, H)
-            if frame is None:
-                # fallback to local if server render fails
-                frame = self.loader.load_surface(path)
+        crop = crop_key(self.crops.get(item_id))
+        t1 = time.perf_counter()
+        frame = self.loader.load_surface(path, crop=crop)
+        t2 = time.perf_counter()
 
         dst_rect = frame.get_rect(center=(W // 2, H // 2))
         if self.crossfade_ms > 0:
-            self._crossfade(frame, dst_rect)
+            self.engine.crossfade(frame, dst_rect, self.crossfade_ms)
         else:
-            self.screen.fill((0, 0, 0))
-            self.screen.blit(frame, dst_rect.topleft)
-            pygame.display.flip()
-            self._sleep_with_events(self.cfg.playback.slide_duration_s)
+            self.engine.show(frame, dst_rect)
+        if self.slide_trace is not None:
+            self._trace_slide(path, t0, t1, t2, time.perf_counter())
+        self._hold(self.cfg.playback.slide_duration_s)
+
+    def _trace_slide(self, path: str, t0: float, t1: float, t2: float, t3: float) -> None:
+        built = self.loader.build_times(path) or {}
+        first = self.engine.first_pixel_at
+        self.slide_trace.append({
+            "path": path,
+            "crop_lookup_s": t1 - t0,
+            "load_wait_s": t2 - t1,  # ~0 when the preloader already had it
+            # stage times of the build that produced this frame (maybe on the preload pool)
+            "decode_s": built.get("decode_s", 0.0),
+            "compose_s": built.get("compose_s", 0.0),
+            "convert_s": built.get("convert_s", 0.0),
+            "transition_s": t3 - t2,
+            "flip_s": self.engine.present_s,
+            "time_to_pixel_s": (first - t0) if first is not None else t3 - t0,
+            "prefetched": built.get("done_at", t1) < t1,
+        })
+
+    def _on_crop_changed(self, item_id: str, _rec: dict | None) -> None:
+        # runs on the API thread; the new crop is in the cache key anyway,
+        # this only frees surfaces that can no longer be shown
+        self.loader.invalidate(Path(self.cfg.paths.library) / unquote(item_id))
+
+    def _preload_neighbors(self):
+        """
+        Warm the upcoming item in the flags-aware playlist: the composed
+        frame of an image, the poster frame of a clip.
+        """
+        lib_root = Path(self.cfg.paths.library)
+        for _mid, path, kind in self.playlist.upcoming(1):
+            if Path(path).suffix.lower() in SUPPORTED_IMAGES:
+                crop = crop_key(self.crops.get(self._id_from_library_path(lib_root, Path(path))))
+                self.loader.pool.submit(self.loader.load_surface, path, crop)
+            elif kind == "video":
+                self.loader.pool.submit(self._ensure_poster, path)
 
+    def _pump_input(self) -> None:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit(); raise SystemExit
 
-    def _server_base(self) -> str:
-        # You likely already have host/port in cfg.server; if not, 127.0.0.1:8765 is your default from logs.
-        # Adjust if your FastAPI binds elsewhere.
-        host = getattr(self.cfg.server, "host", "127.0.0.1")
-        port = int(getattr(self.cfg.server, "port", 8765))
-        return f"http://{host}:{port}"
 
-    def _fetch_crop_spec(self, item_id: str) -> dict:
-        """
-        GET /library/{id}/crop — returns {'x','y','w','h','rotate_deg','hflip','vflip'}
-        """
-        url = f"{self._server_base()}/library/{item_id}/crop"
-        headers = {"x-auth-token": self.cfg.server.auth_token}
-        try:
-            r = requests.get(url, headers=headers, timeout=2.0)
-            r.raise_for_status()
-            return r.json() or {}
-        except Exception:
-            return {}
+    def _service_background(self) -> None:
+        """Viewer-thread chores: queued API flag edits (cheap; also run mid-hold)."""
+        self._apply_pending_events()
 
-    def _load_surface_via_render(self, item_id: str, w: int, h: int) -> "pygame.Surface | None":
+    def _hold(self, seconds: float):
         """
-        GET /render/{id}?w=...&h=... and turn bytes into a pygame Surface.
+        Keep the current frame up without spinning: sleep until the deadline
+        or a wake-up (config push, flag edit, watcher), pumping SDL input a
+        few times a second. The next image is decoded on the loader pool
+        meanwhile.
         """
-        url = f"{self._server_base()}/render/{item_id}?w={w}&h={h}"
-        headers = {"x-auth-token": self.cfg.server.auth_token}
-        try:
-            r = requests.get(url, headers=headers, timeout=5.0)
-            r.raise_for_status()
-            return pygame.image.load(BytesIO(r.content))
-        except Exception as e:
-            print("[viewer] render fetch failed:", e)
-            return None
-
-    def _crossfade(self, new_surface: pygame.Surface, dst_rect: pygame.Rect):
-        start = pygame.time.get_ticks()
-        snapshot = self.screen.copy()
+        shown = self.playlist.current_id()
+        self._preload_neighbors()
+        end = time.monotonic() + seconds
         while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit(); raise SystemExit
-            t = pygame.time.get_ticks() - start
-            alpha = min(255, int(255 * t / self.crossfade_ms))
-            # draw previous frame snapshot as background
-            self.screen.blit(snapshot, (0,0))
-            # crossfade the centered image
-            new_surface.set_alpha(alpha)
-            self.screen.blit(new_surface, dst_rect.topleft)
-            pygame.display.flip()
-            self.clock.tick(60)
-            if t >= self.crossfade_ms:
-                # hold
-                self.screen.fill((0,0,0))
-                self.screen.blit(new_surface, dst_rect.topleft)
-                pygame.display.flip()
-                self._sleep_with_events(self.cfg.playback.slide_duration_s)
-                break
-
-    def _preload_neighbors(self, current_id: int):
-        """
-        Warm prev/next **images** around the current item within the flags-aware playlist.
-        """
-        if not self._playlist or current_id not in self._id_index:
-            return
-        i = self._id_index[current_id]
-        n = len(self._playlist)
-        prev_i = (i - 1) % n
-        next_i = (i + 1) % n
-
-        def is_img(tup: tuple[int, str, str]) -> bool:
-            _id, _p, _k = tup
-            return Path(_p).suffix.lower() in SUPPORTED_IMAGES
-
-        # Collect current lane: prev, curr, next if they are images
-        lane = []
-        for idx in (prev_i, i, next_i):
-            tup = self._playlist[idx]
-            if is_img(tup):
-                lane.append(str(tup[1]))
-
-        if lane:
-            # idx of current within lane if present
-            try:
-                cur_idx = lane.index(str(self._playlist[i][1]))
-            except ValueError:
-                cur_idx = 0
-            self.loader.preload_neighbors(lane, cur_idx)
-
-
-    def _sleep_with_events(self, seconds: float):
-        end = time.time() + seconds
-        while time.time() < end:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit(); raise SystemExit
-            self.clock.tick(60)
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            reasons = _waker.wait(min(remaining, INPUT_POLL_S))
+            self._pump_input()
+            if not reasons:
+                continue
+            if "config" in reasons:
+                # slide duration may have changed; keep the time already shown
+                end += self.cfg.playback.slide_duration_s - seconds
+                seconds = self.cfg.playback.slide_duration_s
+            self._service_background()
+            if shown is not None and self.playlist.current() is None:
+                return  # deleted or flagged out while on screen
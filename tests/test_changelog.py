@@ -0,0 +1,65 @@
+import os
+import time
+
+from photoframe.changelog import ChangeLog
+from photoframe.indexer import Library
+
+
+def _touch(p, data: bytes, at: float):
+    p.write_bytes(data)
+    os.utime(p, (at, at))
+
+
+def _setup(tmp_path):
+    root = tmp_path / "library"
+    (root / "images").mkdir(parents=True)
+    lib = Library(tmp_path / "index.db", root)
+    log = ChangeLog(tmp_path / "changes.db", root)
+    lib.subscribe(log.on_index_change)
+    return root, lib, log
+
+
+def test_edit_in_place_advances_rev_and_shows_in_changes(tmp_path):
+    root, lib, log = _setup(tmp_path)
+    f = root / "images" / "a.jpg"
+    _touch(f, b"one", time.time() - 60)
+    lib.scan_once()
+    rev = log.rev
+    v0 = log.changes_since(0)["changes"][0]["v"]
+
+    seen = []
+    log.subscribe(seen.append)
+    _touch(f, b"edited", time.time())
+    assert lib.scan_once() == [("update", 1, str(f), "image")]
+
+    assert log.rev > rev
+    out = log.changes_since(rev)
+    assert not out["reset"]
+    [entry] = out["changes"]
+    assert entry["id"] == "images/a.jpg"
+    assert entry["op"] == "update"
+    assert entry["bytes"] == len(b"edited")
+    assert entry["v"] != v0
+    # listeners (SSE, prewarm) get the same folded entry
+    assert seen == [entry]
+
+
+def test_unchanged_rescan_logs_nothing(tmp_path):
+    root, lib, log = _setup(tmp_path)
+    _touch(root / "images" / "a.jpg", b"one", time.time() - 60)
+    lib.scan_once()
+    rev = log.rev
+    assert lib.scan_once() == []
+    assert log.rev == rev
+
+
+def test_update_after_add_folds_into_add(tmp_path):
+    root, lib, log = _setup(tmp_path)
+    f = root / "images" / "a.jpg"
+    _touch(f, b"one", time.time() - 60)
+    lib.scan_once()
+    _touch(f, b"two!", time.time())
+    lib.scan_once()
+    [entry] = log.changes_since(0)["changes"]
+    # a client that never saw the add still learns the kind, and the new version
+    assert entry["op"] == "add" and entry["kind"] == "image" and entry["bytes"] == 4
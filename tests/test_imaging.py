@@ -0,0 +1,139 @@
+"""Decode budget on synthetic huge images: loader, /thumb and /render."""
+import asyncio
+import os
+import struct
+import zlib
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from photoframe import fast_image_loader, imaging, server
+from photoframe.config import AppCfg, RenderCfg
+from photoframe.imaging import DecodeBudgetError, budget_pixels, open_pillow_bounded
+
+BUDGET_MP = 2.0  # 2 MP: the 8 MP panorama is four times over it
+REPO = Path(__file__).resolve().parents[1]
+
+
+def _panorama(path: Path, size=(20000, 400)) -> Path:
+    Image.new("RGB", size, (40, 90, 160)).save(path, quality=80)
+    return path
+
+
+def _png_bomb(path: Path, w=100_000, h=100_000) -> Path:
+    """A PNG whose header claims w x h (10 gigapixels); no pixel data follows."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IEND", b""))
+    return path
+
+
+def _record_opens(monkeypatch, module) -> list:
+    """Sizes of everything module opens through open_pillow_bounded."""
+    sizes = []
+
+    def spy(*args, **kwargs):
+        im = open_pillow_bounded(*args, **kwargs)
+        sizes.append(im.size)
+        return im
+    monkeypatch.setattr(module, "open_pillow_bounded", spy)
+    return sizes
+
+
+# ---- imaging ----
+def test_open_pillow_bounded_shrinks_panorama_under_budget(tmp_path):
+    max_px = budget_pixels(BUDGET_MP)
+    im = open_pillow_bounded(_panorama(tmp_path / "pano.jpg"), None, max_px)
+    w, h = im.size
+    assert w * h <= max_px
+    assert w / h == pytest.approx(50, rel=0.05)
+
+
+def test_open_pillow_bounded_refuses_bomb_header(tmp_path):
+    with pytest.raises(DecodeBudgetError):
+        open_pillow_bounded(_png_bomb(tmp_path / "bomb.png"), (1920, 1080), budget_pixels(BUDGET_MP))
+
+
+def test_fit_within_stays_under_budget():
+    w, h = imaging.fit_within(20000, 400, budget_pixels(BUDGET_MP))
+    assert w * h <= budget_pixels(BUDGET_MP)
+
+
+# ---- viewer loader ----
+@pytest.fixture
+def loader(monkeypatch):
+    ld = fast_image_loader.FastImageLoader((320, 240), RenderCfg(max_decode_mp=BUDGET_MP))
+    monkeypatch.setattr(ld, "backend_for", lambda p: "pillow")
+    return ld
+
+
+def test_load_surface_decodes_panorama_within_budget(tmp_path, monkeypatch, loader):
+    sizes = _record_opens(monkeypatch, fast_image_loader)
+    surf = loader.load_surface(_panorama(tmp_path / "pano.jpg"))
+    assert surf.get_size() == (320, 240)
+    assert sizes and all(w * h <= budget_pixels(BUDGET_MP) for w, h in sizes)
+
+
+def test_load_surface_raises_budget_error_for_bomb(tmp_path, loader):
+    # the viewer catches this and skips the slide (Viewer.loop)
+    with pytest.raises(DecodeBudgetError):
+        loader.load_surface(_png_bomb(tmp_path / "bomb.png"))
+
+
+# ---- API ----
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    cfg = AppCfg.load(REPO / "config" / "leanframe.yaml")
+    cfg.paths.library = tmp_path / "library"
+    cfg.paths.db = tmp_path / "index.db"
+    cfg.render.max_decode_mp = BUDGET_MP
+    (cfg.paths.library / "images").mkdir(parents=True)
+    monkeypatch.setattr(server, "cfg", cfg)
+    monkeypatch.setattr(server, "_HAS_VIPS", False)
+    # per-library singletons
+    for name in ("_DCACHE", "_HASHES", "_RENDERS"):
+        monkeypatch.setattr(server, name, None)
+    return cfg.paths.library
+
+
+def test_render_variant_decodes_panorama_within_budget(api, monkeypatch):
+    sizes = _record_opens(monkeypatch, server)
+    src = _panorama(api / "images" / "pano.jpg")
+    out = server._render_variant(src, server.CropSpec(), 1024, None)
+    with Image.open(out) as im:
+        assert im.width == 1024
+    assert sizes and all(w * h <= budget_pixels(BUDGET_MP) for w, h in sizes)
+
+
+def test_render_and_thumb_answer_413_for_bomb(api):
+    _png_bomb(api / "images" / "bomb.png")
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(server.render_media(item_id="images/bomb.png", w=1024, h=None, v=None,
+                                        if_none_match=None))
+    assert e.value.status_code == 413
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(server.get_thumb(item_id="images/bomb.png", w=360, v=None, if_none_match=None))
+    assert e.value.status_code == 413
+
+
+def test_thumb_of_panorama_is_served(api):
+    _panorama(api / "images" / "pano.jpg")
+    resp = asyncio.run(server.get_thumb(item_id="images/pano.jpg", w=360, v=None, if_none_match=None))
+    with Image.open(resp.path) as im:
+        assert im.width == 360
+
+
+def test_render_variant_follows_exif_orientation(api):
+    src = api / "images" / "portrait.jpg"
+    im = Image.new("RGB", (4000, 3000), (200, 30, 30))
+    exif = im.getexif()
+    exif[0x0112] = 6  # stored landscape, shown portrait
+    im.save(src, quality=80, exif=exif)
+    out = server._render_variant(src, server.CropSpec(), 360, None)
+    with Image.open(out) as im:
+        assert im.size == (360, 480)
@@ -0,0 +1,162 @@
+"""MpvPlayer against a stub JSON-IPC server on a UNIX socket; the viewer's ffplay fallback."""
+import json
+import queue
+import socket
+import threading
+import types
+
+import pytest
+
+from photoframe import viewer as viewer_module
+from photoframe.video import MpvError, MpvPlayer
+
+
+class StubMpv:
+    """Speaks just enough of mpv's IPC: replies to commands, lets the test send events."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.commands: "queue.Queue[list]" = queue.Queue()
+        self._srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._srv.bind(self.path)
+        self._srv.listen(1)
+        self._conn = None
+        self._connected = threading.Event()
+        self._entries = 0
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        self._conn, _ = self._srv.accept()
+        self._connected.set()
+        buf = b""
+        while True:
+            try:
+                chunk = self._conn.recv(65536)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                msg = json.loads(line)
+                cmd = msg["command"]
+                self.commands.put(cmd)
+                data = None
+                if cmd[0] == "loadfile":
+                    self._entries += 1
+                    data = {"playlist_entry_id": self._entries}
+                if "request_id" in msg:
+                    self._send({"request_id": msg["request_id"], "error": "success", "data": data})
+
+    def _send(self, msg):
+        self._conn.sendall(json.dumps(msg).encode() + b"\n")
+
+    def end_file(self, entry, reason="eof"):
+        self._connected.wait(2)
+        self._send({"event": "end-file", "reason": reason, "playlist_entry_id": entry})
+
+    def sent(self, n):
+        return [self.commands.get(timeout=2) for _ in range(n)]
+
+    def drop(self):
+        self._conn.shutdown(socket.SHUT_RDWR)
+        self._conn.close()
+
+    def close(self):
+        self._srv.close()
+
+
+@pytest.fixture
+def stub(tmp_path):
+    s = StubMpv(tmp_path / "mpv.sock")
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def player(stub):
+    p = MpvPlayer(stub.path, spawn=False, connect_timeout_s=2)
+    yield p
+    p.close()
+
+
+def test_play_replaces_and_queue_appends(stub, player):
+    player.play("/a.mp4")
+    player.queue("/b.mp4")
+    player.queue("/b.mp4")        # already queued
+    player.queue("/a.mp4")        # already playing
+    assert stub.sent(2) == [["loadfile", "/a.mp4", "replace"], ["loadfile", "/b.mp4", "append"]]
+    assert stub.commands.empty()
+    assert player.stats()["queued"] == ["/b.mp4"]
+
+
+def test_wait_end_moves_to_queued_clip_gaplessly(stub, player):
+    player.play("/a.mp4")
+    player.queue("/b.mp4")
+    stub.sent(2)
+    stub.end_file(1)
+    assert player.wait_end(poll_s=0.05) == "eof"
+    assert player.current == "/b.mp4"
+    player.play("/b.mp4")         # mpv already moved on: no new loadfile
+    assert player.stats()["gapless"] == 1
+    stub.end_file(2)
+    assert player.wait_end(poll_s=0.05) == "eof"
+    assert player.current is None
+    assert stub.commands.empty()
+
+
+def test_queued_clip_matches_by_key_when_path_changed(stub, player):
+    player.play("/a.mp4", key=1)
+    player.queue("/b.mp4", key=2)
+    stub.sent(2)
+    stub.end_file(1)
+    player.wait_end(poll_s=0.05)
+    player.play("/proxies/2.mp4", key=2)  # its proxy finished meanwhile
+    assert player.stats()["gapless"] == 1
+    assert stub.commands.empty()
+
+
+def test_wait_end_ignores_late_end_of_replaced_clip(stub, player):
+    player.play("/a.mp4")
+    player.play("/b.mp4")
+    stub.sent(2)
+    stub.end_file(1, reason="stop")   # /a.mp4, replaced
+    stub.end_file(2, reason="error")
+    assert player.wait_end(poll_s=0.05) == "error"
+    assert player.stats()["errors"] == 1
+
+
+def test_wait_end_raises_when_mpv_goes_away(stub, player):
+    player.play("/a.mp4")
+    stub.sent(1)
+    stub.drop()
+    with pytest.raises(MpvError):
+        player.wait_end(poll_s=0.05)
+    assert player.current is None
+
+
+def test_unreachable_mpv_raises(tmp_path):
+    p = MpvPlayer(tmp_path / "nobody.sock", spawn=False, connect_timeout_s=0.2)
+    with pytest.raises(MpvError):
+        p.play("/a.mp4")
+
+
+def test_viewer_falls_back_to_ffplay(tmp_path, monkeypatch):
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"\0")
+    ran = []
+    monkeypatch.setattr(viewer_module.subprocess, "run", lambda cmd, *a, **k: ran.append(cmd))
+    engine = types.SimpleNamespace(suspend=lambda: ran.append("suspend"),
+                                   resume=lambda: ran.append("resume"))
+    # just what _play_video touches; the player can't reach an mpv
+    v = object.__new__(viewer_module.Viewer)
+    v.video = MpvPlayer(tmp_path / "nobody.sock", spawn=False, connect_timeout_s=0.2)
+    v.engine = engine
+    v.lib = types.SimpleNamespace(proxy_for=lambda mid: None)
+    v.playlist = types.SimpleNamespace(upcoming=lambda n, kind=None: [])
+    v._ensure_poster = lambda path: None
+    v._pump_input = lambda: None
+    v._play_video(str(clip), 1)
+    assert ran[0] == "suspend" and ran[-1] == "resume"
+    assert ran[1][0] == "ffplay" and ran[1][-1] == str(clip)